@@ -0,0 +1,75 @@
+"""
+Concurrent workflow runs against a local fake LLM provider.
+
+    python benchmarks/bench_async_llm.py --runs 1 8 32 --latency 0.5
+
+With the async LLM path, N concurrent runs (two LLM calls each: classify and
+draft) should take roughly as long as a single run.
+"""
+import argparse
+import asyncio
+import contextlib
+import io
+import os
+import sys
+import tempfile
+import time
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'src'))
+sys.path.append(os.path.dirname(__file__))
+
+from fake_llm import FakeLLMServer
+
+
+def make_messages(count: int):
+    from ai_agent.state import Message, InputType
+    return [
+        Message(
+            sender=f"customer{i}@example.com",
+            recipient="agent@company.com",
+            subject=f"System outage follow-up {i}",
+            body="Please provide an update on the root cause analysis for last week's outage.",
+            input_type=InputType.EMAIL,
+            source="gmail",
+        )
+        for i in range(count)
+    ]
+
+
+async def run(count: int) -> float:
+    from ai_agent.workflow import run_workflow
+    messages = make_messages(count)
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        await asyncio.gather(*(
+            run_workflow({"input_mode": "gmail", "gmail_message": message}) for message in messages
+        ))
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Async LLM concurrency benchmark")
+    parser.add_argument("--runs", type=int, nargs="+", default=[1, 8, 32])
+    parser.add_argument("--latency", type=float, default=0.5,
+                        help="Fake provider latency per request in seconds")
+    parser.add_argument("--provider", choices=["openai", "anthropic"], default="openai")
+    args = parser.parse_args()
+
+    with FakeLLMServer(latency=args.latency) as server:
+        os.environ["LLM_PROVIDER"] = args.provider
+        os.environ["OPENAI_API_KEY"] = "fake"
+        os.environ["ANTHROPIC_API_KEY"] = "fake"
+        os.environ["OPENAI_BASE_URL"] = f"{server.url}/v1"
+        os.environ["ANTHROPIC_BASE_URL"] = server.url
+        os.environ["DRAFT_STORE_PATH"] = os.path.join(tempfile.mkdtemp(), "drafts.sqlite3")
+
+        print(f"{'concurrent runs':>15} {'wall (s)':>9} {'requests':>9} {'max in flight':>14}")
+        for count in args.runs:
+            server.reset_stats()
+            elapsed = asyncio.run(run(count))
+            print(f"{count:>15} {elapsed:>9.2f} {server.stats['requests']:>9} "
+                  f"{server.stats['max_in_flight']:>14}")
+
+
+if __name__ == "__main__":
+    main()
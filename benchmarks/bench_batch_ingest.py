@@ -0,0 +1,73 @@
+"""
+Throughput of run_workflow_batch at different concurrency levels with the mock LLM.
+
+    python benchmarks/bench_batch_ingest.py --messages 40 --llm-latency 0.2 --concurrency 1 4 16
+
+Messages are spread over --threads conversations; each conversation is
+processed in order, so concurrency beyond the thread count does not help.
+The mock classifies every message as EMAIL_REPLY so each one is drafted and
+waits on --llm-latency; otherwise classification falls back to NO_OP and
+nothing waits on the LLM.
+"""
+import argparse
+import asyncio
+import contextlib
+import io
+import os
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+
+def synthetic_messages(count: int, threads: int):
+    from ai_agent.state import Message, InputType
+    return [
+        Message(
+            sender=f"sender{i % threads}@example.com",
+            recipient="agent@company.com",
+            subject=f"Re: Ticket {i % threads}",
+            body=f"Please provide an update on ticket {i % threads}.",
+            input_type=InputType.EMAIL,
+            source="gmail",
+        )
+        for i in range(count)
+    ]
+
+
+async def run(messages, concurrency: int) -> float:
+    from ai_agent.workflow import run_workflow_batch
+    asyncio.get_running_loop().set_default_executor(ThreadPoolExecutor(max_workers=concurrency + 4))
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        await run_workflow_batch(messages, concurrency=concurrency)
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Batch ingestion throughput benchmark")
+    parser.add_argument("--messages", type=int, default=40)
+    parser.add_argument("--threads", type=int, default=40,
+                        help="Number of distinct conversations among the messages")
+    parser.add_argument("--llm-latency", type=float, default=0.2,
+                        help="Simulated mock LLM latency per call in seconds")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 2, 4, 8, 16])
+    args = parser.parse_args()
+
+    os.environ["LLM_PROVIDER"] = "mock"
+    os.environ["MOCK_LLM_LATENCY"] = str(args.llm_latency)
+    os.environ["MOCK_LLM_CLASSIFICATION"] = "EMAIL_REPLY:0.90"
+    os.environ["HEADER_PREFILTER"] = "0"
+    os.environ["DRAFT_STORE_PATH"] = os.path.join(tempfile.mkdtemp(), "drafts.sqlite3")
+    messages = synthetic_messages(args.messages, args.threads)
+
+    print(f"{'concurrency':>11} {'wall (s)':>9} {'messages/min':>13}")
+    for concurrency in args.concurrency:
+        elapsed = asyncio.run(run(messages, concurrency))
+        print(f"{concurrency:>11} {elapsed:>9.2f} {len(messages) / elapsed * 60:>13.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,65 @@
+"""
+Peak memory and time of body extraction for a large message with attachments.
+
+    python benchmarks/bench_body_extract.py --attachment-mb 25 --body-bytes 5000
+
+"legacy" is the previous GmailIMAPTool._extract_body: email.message_from_bytes
+on the whole message, then get_payload(decode=True) on the first text/plain
+part. "bounded" is the current GmailIMAPTool._parse_email. Peaks are traced
+allocations on top of the raw message, which both start from.
+"""
+import argparse
+import email
+import os
+import sys
+import time
+import tracemalloc
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'src'))
+sys.path.append(os.path.dirname(__file__))
+
+from fake_imap import make_message
+from ai_agent.tools.gmail_imap_tool import GmailIMAPTool
+
+
+def legacy_extract(raw: bytes) -> str:
+    email_msg = email.message_from_bytes(raw)
+    body = ""
+    if email_msg.is_multipart():
+        for part in email_msg.walk():
+            if part.get_content_type() == "text/plain":
+                body = part.get_payload(decode=True).decode('utf-8', errors='ignore')
+                break
+    elif email_msg.get_content_type() == "text/plain":
+        body = email_msg.get_payload(decode=True).decode('utf-8', errors='ignore')
+    return body.strip()
+
+
+def measure(extract, raw: bytes):
+    tracemalloc.start()
+    start = time.perf_counter()
+    body = extract(raw)
+    elapsed = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return body, peak, elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Body extraction memory benchmark")
+    parser.add_argument("--attachment-mb", type=float, default=25)
+    parser.add_argument("--body-bytes", type=int, default=5000)
+    args = parser.parse_args()
+
+    raw = make_message(1, args.body_bytes, mime="mixed", attachment_bytes=int(args.attachment_mb * 1e6))
+    tool = GmailIMAPTool("", "")
+    print(f"message {len(raw) / 1e6:.1f} MB, text part {args.body_bytes} bytes, "
+          f"cap {tool.body_max_bytes} bytes")
+    print(f"{'extractor':>10} {'peak MB':>9} {'time (ms)':>10} {'body bytes':>11}")
+    for label, extract in (("legacy", legacy_extract), ("bounded", lambda r: tool._parse_email(r).body)):
+        body, peak, elapsed = measure(extract, raw)
+        print(f"{label:>10} {peak / 1e6:>9.2f} {elapsed * 1000:>10.1f} {len(body.encode()):>11}")
+
+
+if __name__ == "__main__":
+    main()
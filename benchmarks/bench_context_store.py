@@ -0,0 +1,88 @@
+"""
+Context lookup latency: inverted index vs the previous full scan.
+
+    python benchmarks/bench_context_store.py --entries 1000 10000 50000 --queries 200
+
+Each store is filled with synthetic two- or three-word keys; queries are
+email-sized snippets mixing key words with filler.
+"""
+import argparse
+import os
+import random
+import re
+import sys
+import time
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from ai_agent.utils.context_store import ContextIndex, MockContextStore
+
+WORDS = [f"term{i}" for i in range(5000)]
+FILLER = "please could you send an update on the status of this when you have a moment".split()
+
+
+def build_context(count: int, rng: random.Random):
+    context = {}
+    while len(context) < count:
+        key = " ".join(rng.sample(WORDS, rng.choice((2, 3))))
+        context[key] = [f"{key} note {n}" for n in range(3)]
+    return context
+
+
+def make_queries(count: int, rng: random.Random):
+    return [" ".join(rng.sample(WORDS, 4) + FILLER) for _ in range(count)]
+
+
+def legacy_search(context, query: str, threshold: float = 0.3):
+    """The scan fuzzy_search used before the index, kept for comparison"""
+    query_lower = query.lower()
+    results = []
+    for key, contexts in context.items():
+        if any(word in query_lower for word in key.split()):
+            results.extend(contexts)
+    query_words = set(re.findall(r'\w+', query_lower))
+    for key, contexts in context.items():
+        key_words = set(re.findall(r'\w+', key.lower()))
+        overlap = len(query_words.intersection(key_words))
+        if overlap >= max(1, len(key_words) * threshold):
+            results.extend(contexts)
+    return list(set(results))
+
+
+def time_per_query(search, queries) -> float:
+    start = time.perf_counter()
+    for query in queries:
+        search(query)
+    return (time.perf_counter() - start) / len(queries) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Context store lookup benchmark")
+    parser.add_argument("--entries", type=int, nargs="+", default=[1000, 10000, 50000])
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--skip-legacy-above", type=int, default=20000,
+                        help="Skip the slow full scan for stores larger than this")
+    args = parser.parse_args()
+
+    rng = random.Random(42)
+    queries = make_queries(args.queries, rng)
+
+    print(f"{'entries':>8} {'build (ms)':>11} {'index (ms/query)':>17} {'scan (ms/query)':>16}")
+    for count in args.entries:
+        context = build_context(count, rng)
+
+        start = time.perf_counter()
+        store = MockContextStore()
+        store.email_index = ContextIndex(context)
+        build_ms = (time.perf_counter() - start) * 1000
+
+        indexed = time_per_query(lambda q: store.fuzzy_search(q), queries)
+        if count <= args.skip_legacy_above:
+            scan = f"{time_per_query(lambda q: legacy_search(context, q), queries):>16.3f}"
+        else:
+            scan = f"{'skipped':>16}"
+        print(f"{count:>8} {build_ms:>11.1f} {indexed:>17.3f} {scan}")
+
+
+if __name__ == "__main__":
+    main()
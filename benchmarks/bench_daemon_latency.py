@@ -0,0 +1,105 @@
+"""
+CLI command latency while the daemon works through a Gmail backlog.
+
+    python benchmarks/bench_daemon_latency.py --messages 200 --llm-latency 0.2 --commands 10
+
+main.py runs as a subprocess against the local IMAP and LLM stand-ins with
+--messages unread emails waiting. Once the first email has been drafted,
+--commands CLI commands are typed into its stdin --interval seconds apart.
+A command's latency runs from the moment it is written to the end of its
+workflow run (from the JSONL traces); "service" is the run itself, so
+latency minus service is time spent waiting behind mail.
+"""
+import argparse
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'src'))
+sys.path.append(os.path.dirname(__file__))
+
+from bench_e2e import ROOT, child_env, percentiles, read_traces
+from fake_imap import FakeIMAPServer, Mailbox, synthetic_mailbox
+from fake_llm import FakeLLMServer
+
+
+def wait_for(predicate, timeout: float, process: subprocess.Popen) -> bool:
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if predicate():
+            return True
+        if process.poll() is not None:
+            return False
+        time.sleep(0.01)
+    return False
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Daemon CLI latency under a mail backlog")
+    parser.add_argument("--messages", type=int, default=200)
+    parser.add_argument("--llm-latency", type=float, default=0.2)
+    parser.add_argument("--concurrency", type=int, default=4, help="main.py --gmail-concurrency")
+    parser.add_argument("--commands", type=int, default=10)
+    parser.add_argument("--interval", type=float, default=0.5, help="Seconds between CLI commands")
+    parser.add_argument("--timeout", type=float, default=600)
+    args = parser.parse_args()
+
+    mailbox = Mailbox(synthetic_mailbox(args.messages, body_bytes=1000, mime="plain"))
+    with tempfile.TemporaryDirectory() as workdir, FakeIMAPServer(mailbox) as imap, \
+            FakeLLMServer(latency=args.llm_latency) as llm:
+        env = child_env(args, imap.port, llm.url, workdir)
+        trace_path = env["AGENT_TRACE_PATH"]
+        log = open(os.path.join(workdir, "daemon.log"), "w")
+        process = subprocess.Popen(
+            [sys.executable, os.path.join(ROOT, "main.py"), "--gmail-interval", "3600",
+             "--gmail-concurrency", str(args.concurrency)],
+            env=env, cwd=ROOT, stdin=subprocess.PIPE, stdout=log, stderr=log, text=True
+        )
+
+        def traces(input_mode):
+            return [record for record in read_traces(trace_path) if record.get("input_mode") == input_mode]
+
+        try:
+            if not wait_for(lambda: traces("gmail"), args.timeout, process):
+                raise RuntimeError("daemon never drafted an email")
+            started = time.time()
+            sent_at = []
+            for index in range(args.commands):
+                time.sleep(max(0.0, started + index * args.interval - time.time()))
+                sent_at.append(time.time())
+                process.stdin.write(f"Reply to bench{index}@example.com that the deployment is done\n")
+                process.stdin.flush()
+            wait_for(lambda: len(traces("cli")) >= args.commands, args.timeout, process)
+            backlog_done = wait_for(lambda: len(traces("gmail")) >= args.messages, args.timeout, process)
+            process.stdin.write("quit\n")
+            process.stdin.close()
+            process.wait(timeout=60)
+        finally:
+            if process.poll() is None:
+                process.kill()
+            log.close()
+
+        cli_runs = sorted(traces("cli"), key=lambda record: record["started_at"])
+        gmail_runs = traces("gmail")
+        if len(cli_runs) < args.commands:
+            with open(os.path.join(workdir, "daemon.log")) as f:
+                raise RuntimeError(f"only {len(cli_runs)} of {args.commands} commands ran:\n{f.read()[-2000:]}")
+
+    latency = [run["started_at"] + run["seconds"] - sent for run, sent in zip(cli_runs, sent_at)]
+    service = [run["seconds"] for run in cli_runs]
+    mail_seconds = (max(run["started_at"] + run["seconds"] for run in gmail_runs)
+                    - min(run["started_at"] for run in gmail_runs))
+    print(f"{args.messages} backlog emails, {args.llm_latency * 1000:.0f} ms LLM latency, "
+          f"gmail concurrency {args.concurrency}, {args.commands} CLI commands every {args.interval}s")
+    print(f"{'':>10} {'p50 (s)':>8} {'p95 (s)':>8} {'max (s)':>8}")
+    for label, values in (("latency", latency), ("service", service)):
+        stats = percentiles(values)
+        print(f"{label:>10} {stats['p50']:>8.2f} {stats['p95']:>8.2f} {max(values):>8.2f}")
+    print(f"mail: {len(gmail_runs)} drafted in {mail_seconds:.1f}s ({len(gmail_runs) / mail_seconds:.1f} msg/s)"
+          + ("" if backlog_done else " (backlog not finished before timeout)"))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,110 @@
+"""
+Draft upload throughput: ways of APPENDing generated replies to [Gmail]/Drafts
+against the local IMAP stand-in.
+
+    python benchmarks/bench_draft_append.py --drafts 200 --latency 0.02
+
+"per_connection" logs in, appends and logs out for every draft. "sequential"
+reuses one connection but waits for each imaplib.append (two round trips per
+draft: the literal continuation, then the completion). "pipelined" is
+GmailIMAPTool.append_messages with synchronizing literals (one round trip per
+draft for the continuation, completions overlap) and "literal_plus" is the
+same against a server advertising LITERAL+ (one round trip for the batch).
+"""
+import argparse
+import imaplib
+import os
+import sys
+import time
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'src'))
+sys.path.append(os.path.dirname(__file__))
+
+from fake_imap import FakeIMAPServer, Mailbox
+from ai_agent.tools.gmail_drafts import build_draft_message
+from ai_agent.tools.gmail_imap_tool import DEFAULT_DRAFTS_MAILBOX, GmailIMAPTool
+
+FROM_ADDR = "bench@example.com"
+FLAGS = '(\\Draft \\Seen)'
+
+
+def make_results(count: int, body_bytes: int):
+    line = "Thanks for the update, I will follow up on this shortly.\n"
+    body = (line * (body_bytes // len(line) + 1))[:body_bytes]
+    return [{
+        "type": "email", "to": f"sender{i}@example.com", "subject": f"Re: Synthetic message {i}",
+        "body": body, "original_message_id": f"<synthetic-{i}@example.com>",
+        "references": f"<thread-{i}@example.com>",
+    } for i in range(1, count + 1)]
+
+
+def new_tool(server: FakeIMAPServer) -> GmailIMAPTool:
+    tool = GmailIMAPTool(FROM_ADDR, "secret", host="127.0.0.1", port=server.port, use_ssl=False)
+    tool.connect()
+    return tool
+
+
+def per_connection(server, raw_drafts):
+    for raw in raw_drafts:
+        tool = new_tool(server)
+        tool.imap.append(f'"{DEFAULT_DRAFTS_MAILBOX}"', FLAGS, imaplib.Time2Internaldate(time.time()), raw)
+        tool.imap.logout()
+
+
+def sequential(server, raw_drafts):
+    tool = new_tool(server)
+    for raw in raw_drafts:
+        tool.imap.append(f'"{DEFAULT_DRAFTS_MAILBOX}"', FLAGS, imaplib.Time2Internaldate(time.time()), raw)
+    tool.imap.logout()
+
+
+def pipelined(server, raw_drafts):
+    tool = new_tool(server)
+    uids = tool.append_messages(raw_drafts)
+    assert all(uid is not None for uid in uids), "APPEND failed"
+    tool.imap.logout()
+
+
+MODES = (
+    ("per_connection", per_connection, False),
+    ("sequential", sequential, False),
+    ("pipelined", pipelined, False),
+    ("literal_plus", pipelined, True),
+)
+
+
+def run(mode, raw_drafts, latency: float, literal_plus: bool):
+    with FakeIMAPServer(Mailbox(), latency=latency, literal_plus=literal_plus) as server:
+        start = time.perf_counter()
+        mode(server, raw_drafts)
+        elapsed = time.perf_counter() - start
+        drafts = server.folders[DEFAULT_DRAFTS_MAILBOX].messages
+        round_trips = server.stats["round_trips"]
+
+    assert len(drafts) == len(raw_drafts), f"{len(drafts)} of {len(raw_drafts)} drafts stored"
+    first = drafts[0]["parsed"]
+    assert first["In-Reply-To"] == "<synthetic-1@example.com>"
+    assert "\\Draft" in drafts[0]["flags"]
+    return elapsed, round_trips
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Gmail draft APPEND benchmark")
+    parser.add_argument("--drafts", type=int, default=200)
+    parser.add_argument("--body-bytes", type=int, default=1500)
+    parser.add_argument("--latency", type=float, default=0.02,
+                        help="Simulated round trip latency in seconds")
+    args = parser.parse_args()
+
+    raw_drafts = [build_draft_message(result, FROM_ADDR) for result in make_results(args.drafts, args.body_bytes)]
+    print(f"{args.drafts} drafts of ~{sum(map(len, raw_drafts)) // len(raw_drafts)} bytes, "
+          f"{args.latency * 1000:.0f} ms RTT")
+    print(f"{'mode':>15} {'total (s)':>10} {'ms/draft':>9} {'drafts/s':>9} {'commands':>9}")
+    for label, mode, literal_plus in MODES:
+        elapsed, round_trips = run(mode, raw_drafts, args.latency, literal_plus)
+        print(f"{label:>15} {elapsed:>10.3f} {elapsed * 1000 / args.drafts:>9.2f} "
+              f"{args.drafts / elapsed:>9.1f} {round_trips:>9}")
+
+
+if __name__ == "__main__":
+    main()
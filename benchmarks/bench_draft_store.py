@@ -0,0 +1,79 @@
+"""
+Draft store write throughput: group commit vs one transaction per draft.
+
+    python benchmarks/bench_draft_store.py --drafts 20000 --threads 1 8 32
+
+Every writer thread saves drafts with wait=True, the way save_draft_node
+does, so each save returns only once its draft is committed. max_batch=1
+commits every draft on its own; "queued" saves with wait=False and flushes
+once at the end, as a bulk backfill can. Query latency for the pending-drafts API is
+measured on the resulting table.
+"""
+import argparse
+import os
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from ai_agent.utils.draft_store import DraftStore
+
+
+def make_result(index: int):
+    return {
+        "type": "email",
+        "to": f"sender{index % 500}@example.com",
+        "subject": f"Re: Ticket {index}",
+        "body": f"Thanks for the update on ticket {index}. " * 20,
+        "original_message_id": f"<synthetic-{index}@example.com>",
+    }
+
+
+def run(drafts: int, threads: int, max_batch: int, wait: bool):
+    path = os.path.join(tempfile.mkdtemp(), "drafts.sqlite3")
+    store = DraftStore(path, max_batch=max_batch)
+    per_thread = drafts // threads
+
+    def writer(offset: int):
+        for index in range(offset, offset + per_thread):
+            store.save(make_result(index), wait=wait)
+
+    workers = [threading.Thread(target=writer, args=(n * per_thread,)) for n in range(threads)]
+    start = time.perf_counter()
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    store.flush()
+    elapsed = time.perf_counter() - start
+
+    assert store.counts().get("pending") == per_thread * threads
+    query_start = time.perf_counter()
+    for n in range(100):
+        store.pending(recipient=f"sender{n}@example.com", limit=20)
+        store.for_message(f"<synthetic-{n}@example.com>")
+    query_ms = (time.perf_counter() - query_start) * 1000 / 200
+    stats = dict(store.stats)
+    store.close()
+    return per_thread * threads / elapsed, stats["saved"] / max(stats["commits"], 1), query_ms
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Draft store benchmark")
+    parser.add_argument("--drafts", type=int, default=20000)
+    parser.add_argument("--threads", type=int, nargs="+", default=[1, 8, 32])
+    args = parser.parse_args()
+
+    print(f"{'threads':>8} {'commit':>10} {'drafts/s':>10} {'drafts/commit':>14} {'query ms':>9}")
+    for threads in args.threads:
+        for label, max_batch, wait in (("per-draft", 1, True), ("group", 1000, True), ("queued", 1000, False)):
+            # One commit per draft is slow; keep its run short
+            drafts = args.drafts if max_batch > 1 else min(args.drafts, 2000)
+            rate, per_commit, query_ms = run(drafts, threads, max_batch, wait)
+            print(f"{threads:>8} {label:>10} {rate:>10.0f} {per_commit:>14.1f} {query_ms:>9.3f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,297 @@
+"""
+End-to-end benchmark: the real pipeline against a local IMAP stand-in and a
+fake OpenAI-compatible endpoint.
+
+    python benchmarks/bench_e2e.py --messages 200 --mime mixed --attachment-bytes 200000 \\
+        --llm-latency 0.2 --output results/$(git rev-parse --short HEAD).json
+    python benchmarks/bench_e2e.py --compare results/old.json results/new.json
+
+Modes, each run in a fresh child process against a freshly seeded mailbox:
+  workflow  run_workflow() in a loop; every run scrapes one message itself
+  batch     fetch_new_gmail_messages() once, then run_workflow_batch()
+  daemon    main.py as a subprocess, stopped with "quit" once every message is traced
+
+Per-node latencies come from the JSONL run traces (AGENT_METRICS=1). batch
+and daemon throughput is measured over the Gmail batch trace records, i.e.
+from batched classification to the last draft; workflow throughput includes
+its per-run IMAP fetches. Peak RSS is the child's ru_maxrss. Results are written as JSON with the commit they
+were measured at; the synthetic mailbox is deterministic, so two result files
+with the same config compare like for like.
+"""
+import argparse
+import asyncio
+import contextlib
+import io
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Dict, List
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'src'))
+sys.path.append(os.path.dirname(__file__))
+
+from fake_imap import FakeIMAPServer, Mailbox, MIME_KINDS, synthetic_mailbox
+from fake_llm import FakeLLMServer
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+MODES = ("workflow", "batch", "daemon")
+NODES = ("receive_message", "classify_action", "retrieve_context", "gmail_draft",
+         "meeting_draft", "no_op", "save_draft")
+
+
+def percentiles(values: List[float]) -> Dict[str, float]:
+    if not values:
+        return {}
+    ordered = sorted(values)
+
+    def pick(pct: float) -> float:
+        return ordered[min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))]
+
+    return {"count": len(ordered), "p50": pick(50), "p95": pick(95), "p99": pick(99)}
+
+
+def read_traces(trace_path: str) -> List[Dict]:
+    if not os.path.exists(trace_path):
+        return []
+    with open(trace_path) as f:
+        return [json.loads(line) for line in f]
+
+
+def summarize_traces(traces: List[Dict]) -> Dict:
+    runs, nodes, llm = [], {}, {}
+    for trace in traces:
+        # Batch records only carry the up-front classification calls
+        if trace.get("input_mode") != "gmail_batch":
+            runs.append(trace)
+        for span in trace["spans"]:
+            if span["metric"] == "agent_node_seconds":
+                nodes.setdefault(span["node"], []).append(span["seconds"])
+            elif span["metric"] in ("agent_llm_request_seconds", "agent_batch_classify_seconds"):
+                llm.setdefault(span.get("namespace", "batch_classify"), []).append(span["seconds"])
+    return {
+        "runs": runs,
+        "run": percentiles([run["seconds"] for run in runs]),
+        "nodes": {node: percentiles(values) for node, values in sorted(nodes.items())},
+        "llm": {namespace: percentiles(values) for namespace, values in sorted(llm.items())},
+    }
+
+
+def child_env(args, imap_port: int, llm_url: str, workdir: str) -> Dict[str, str]:
+    env = dict(os.environ)
+    env.update({
+        "GMAIL_EMAIL": "bench@example.com",
+        "GMAIL_APP_PASSWORD": "secret",
+        "GMAIL_IMAP_HOST": "127.0.0.1",
+        "GMAIL_IMAP_PORT": str(imap_port),
+        "GMAIL_IMAP_SSL": "0",
+        "GMAIL_SYNC_STATE_PATH": os.path.join(workdir, "sync_state.json"),
+        "MESSAGE_LEDGER_PATH": os.path.join(workdir, "message_ledger.sqlite3"),
+        "DRAFT_STORE_PATH": os.path.join(workdir, "drafts.sqlite3"),
+        "LLM_PROVIDER": "openai",
+        "OPENAI_API_KEY": "fake",
+        "OPENAI_BASE_URL": f"{llm_url}/v1",
+        "LLM_CACHE": "0",
+        "AGENT_METRICS": "1",
+        "AGENT_TRACE_PATH": os.path.join(workdir, "traces.jsonl"),
+        "AGENT_METRICS_PATH": os.path.join(workdir, "metrics.prom"),
+        "CONTEXT_DOCS_DIR": os.path.join(workdir, "no_context_docs"),
+        "CONTEXT_INDEX_DIR": os.path.join(workdir, "context_index"),
+        "PYTHONUNBUFFERED": "1",
+    })
+    return env
+
+
+def wait_with_rusage(process: subprocess.Popen):
+    """Wait for a child and return its peak RSS in MB"""
+    _, status, rusage = os.wait4(process.pid, 0)
+    process.returncode = os.waitstatus_to_exitcode(status)
+    # ru_maxrss is KiB on Linux, bytes on macOS
+    return rusage.ru_maxrss / (1024 * 1024 if sys.platform == "darwin" else 1024)
+
+
+def run_mode(mode: str, args, llm_url: str) -> Dict:
+    mailbox = Mailbox(synthetic_mailbox(
+        args.messages, body_bytes=args.body_bytes, bulk_ratio=args.bulk_ratio,
+        mime=args.mime, attachment_bytes=args.attachment_bytes
+    ))
+    with tempfile.TemporaryDirectory() as workdir, FakeIMAPServer(mailbox, latency=args.imap_latency) as imap:
+        env = child_env(args, imap.port, llm_url, workdir)
+        trace_path = env["AGENT_TRACE_PATH"]
+        log = open(os.path.join(workdir, "child.log"), "w")
+
+        if mode == "daemon":
+            command = [sys.executable, os.path.join(ROOT, "main.py"),
+                       "--gmail-interval", "3600", "--gmail-concurrency", str(args.concurrency)]
+        else:
+            command = [sys.executable, os.path.abspath(__file__), "--worker", mode,
+                       "--concurrency", str(args.concurrency)]
+
+        started = time.perf_counter()
+        process = subprocess.Popen(command, env=env, cwd=ROOT, stdin=subprocess.PIPE,
+                                   stdout=subprocess.PIPE if mode != "daemon" else log,
+                                   stderr=log, text=True)
+        if mode == "daemon":
+            deadline = time.time() + args.timeout
+            while _batched_messages(trace_path) < args.messages and time.time() < deadline:
+                if process.poll() is not None:
+                    break
+                time.sleep(0.05)
+            if process.poll() is None:
+                process.stdin.write("quit\n")
+                process.stdin.close()
+            worker_result = {}
+        else:
+            worker_result = json.loads(process.stdout.read().strip().splitlines()[-1] or "{}")
+        peak_rss_mb = wait_with_rusage(process)
+        wall = time.perf_counter() - started
+        log.close()
+
+        if process.returncode != 0:
+            with open(os.path.join(workdir, "child.log")) as f:
+                raise RuntimeError(f"{mode} exited with {process.returncode}:\n{f.read()[-2000:]}")
+
+        records = read_traces(trace_path)
+        traces = summarize_traces(records)
+        runs = traces.pop("runs")
+        drafted = [run for run in runs if run.get("action_type")]
+        batches = [record for record in records if record.get("input_mode") == "gmail_batch"]
+        if batches:
+            seconds = (max(batch["started_at"] + batch["seconds"] for batch in batches)
+                       - min(batch["started_at"] for batch in batches))
+        else:
+            seconds = worker_result.get("seconds", wall)
+
+        return {
+            "messages": len(drafted),
+            "seconds": seconds,
+            "messages_per_sec": len(drafted) / seconds if seconds else 0.0,
+            "peak_rss_mb": peak_rss_mb,
+            "imap_round_trips": imap.stats["round_trips"],
+            "imap_bytes_sent": imap.stats["bytes_sent"],
+            **traces,
+        }
+
+
+def _batched_messages(trace_path: str) -> int:
+    """Messages covered by completed Gmail batches so far"""
+    return sum(record.get("messages", 0) for record in read_traces(trace_path)
+               if record.get("input_mode") == "gmail_batch")
+
+
+async def worker(mode: str, concurrency: int) -> Dict:
+    from concurrent.futures import ThreadPoolExecutor
+    from ai_agent.workflow import get_compiled_workflow, run_workflow, run_workflow_batch
+    from ai_agent.nodes.receive_message import commit_gmail_sync, fetch_new_gmail_messages
+
+    asyncio.get_running_loop().set_default_executor(ThreadPoolExecutor(max_workers=concurrency + 4))
+    get_compiled_workflow()
+    start = time.perf_counter()
+    if mode == "workflow":
+        while True:
+            final_state = await run_workflow({"input_mode": "gmail"})
+            if final_state.get("input_message") is None:
+                break
+    else:
+        messages, sync_point = await asyncio.to_thread(fetch_new_gmail_messages)
+        await run_workflow_batch(messages, concurrency=concurrency)
+        commit_gmail_sync(sync_point)
+    return {"seconds": time.perf_counter() - start}
+
+
+def git_revision() -> Dict[str, object]:
+    def git(*command):
+        return subprocess.run(["git", *command], cwd=ROOT, capture_output=True, text=True).stdout.strip()
+    return {"commit": git("rev-parse", "HEAD"), "dirty": bool(git("status", "--porcelain", "--untracked-files=no"))}
+
+
+def print_report(results: Dict):
+    print(f"commit {results['commit'][:10]}{' (dirty)' if results['dirty'] else ''}  config {results['config']}")
+    for mode, result in results["modes"].items():
+        print(f"\n[{mode}] {result['messages']} messages in {result['seconds']:.2f}s = "
+              f"{result['messages_per_sec']:.1f} msg/s, peak RSS {result['peak_rss_mb']:.0f} MB, "
+              f"{result['imap_round_trips']} IMAP round trips")
+        print(f"  {'node':<18} {'count':>6} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9}")
+        rows = list(result["nodes"].items()) + [("(whole run)", result["run"])]
+        rows += [(f"llm {namespace}", stats) for namespace, stats in result["llm"].items()]
+        for node, stats in rows:
+            if stats:
+                print(f"  {node:<18} {stats['count']:>6} {stats['p50'] * 1000:>9.2f} "
+                      f"{stats['p95'] * 1000:>9.2f} {stats['p99'] * 1000:>9.2f}")
+
+
+def compare(old_path: str, new_path: str):
+    with open(old_path) as f:
+        old = json.load(f)
+    with open(new_path) as f:
+        new = json.load(f)
+    if old["config"] != new["config"]:
+        print(f"warning: configs differ\n  old {old['config']}\n  new {new['config']}")
+
+    def delta(before: float, after: float) -> str:
+        return f"{(after - before) / before:+.1%}" if before else "n/a"
+
+    print(f"{'':<28} {old['commit'][:10]:>10} {new['commit'][:10]:>10} {'change':>8}")
+    for mode in new["modes"]:
+        if mode not in old["modes"]:
+            continue
+        before, after = old["modes"][mode], new["modes"][mode]
+        rows = [("msg/s", before["messages_per_sec"], after["messages_per_sec"]),
+                ("peak RSS MB", before["peak_rss_mb"], after["peak_rss_mb"])]
+        for node in NODES:
+            if node in before["nodes"] and node in after["nodes"]:
+                rows.append((f"{node} p95 ms", before["nodes"][node]["p95"] * 1000, after["nodes"][node]["p95"] * 1000))
+        for label, a, b in rows:
+            print(f"{mode + ' ' + label:<28} {a:>10.2f} {b:>10.2f} {delta(a, b):>8}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="End-to-end pipeline benchmark")
+    parser.add_argument("--messages", type=int, default=100)
+    parser.add_argument("--body-bytes", type=int, default=2000)
+    parser.add_argument("--mime", choices=MIME_KINDS, default="alternative")
+    parser.add_argument("--attachment-bytes", type=int, default=100_000,
+                        help="Size of the PDF attachment when --mime mixed")
+    parser.add_argument("--bulk-ratio", type=float, default=0.0,
+                        help="Share of newsletter-style messages the header rules skip")
+    parser.add_argument("--llm-latency", type=float, default=0.1)
+    parser.add_argument("--imap-latency", type=float, default=0.0, help="Simulated RTT per IMAP command")
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--modes", nargs="+", choices=MODES, default=list(MODES))
+    parser.add_argument("--timeout", type=float, default=600, help="Give up on the daemon after this long")
+    parser.add_argument("--output", help="Write results as JSON")
+    parser.add_argument("--compare", nargs=2, metavar=("OLD", "NEW"), help="Compare two result files")
+    parser.add_argument("--worker", choices=("workflow", "batch"), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        with contextlib.redirect_stdout(io.StringIO()):
+            result = asyncio.run(worker(args.worker, args.concurrency))
+        print(json.dumps(result))
+        return
+    if args.compare:
+        compare(*args.compare)
+        return
+
+    config = {key: getattr(args, key) for key in (
+        "messages", "body_bytes", "mime", "attachment_bytes", "bulk_ratio",
+        "llm_latency", "imap_latency", "concurrency")}
+    results = {**git_revision(), "timestamp": time.time(), "python": platform.python_version(),
+               "platform": platform.platform(), "config": config, "modes": {}}
+    with FakeLLMServer(latency=args.llm_latency) as llm:
+        for mode in args.modes:
+            results["modes"][mode] = run_mode(mode, args, llm.url)
+
+    print_report(results)
+    if args.output:
+        os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+        print(f"\nResults written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
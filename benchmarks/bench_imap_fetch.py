@@ -0,0 +1,52 @@
+"""
+Per-message vs batched IMAP FETCH against the local IMAP stand-in.
+
+    python benchmarks/bench_imap_fetch.py --sizes 10 50 200 --latency 0.02
+
+batch_size=1 reproduces the old one-FETCH-per-message behaviour.
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'src'))
+sys.path.append(os.path.dirname(__file__))
+
+from ai_agent.tools.gmail_imap_tool import GmailIMAPTool
+from fake_imap import FakeIMAPServer, Mailbox, synthetic_mailbox
+
+
+def run(server: FakeIMAPServer, count: int, batch_size: int):
+    tool = GmailIMAPTool("bench@example.com", "secret", host="127.0.0.1",
+                         port=server.port, use_ssl=False)
+    tool.connect()
+    tool.imap.select('INBOX')
+    server.reset_stats()
+
+    start = time.perf_counter()
+    fetched = sum(1 for _ in tool.fetch_messages(range(1, count + 1), batch_size=batch_size))
+    elapsed = time.perf_counter() - start
+
+    round_trips = server.stats["round_trips"]
+    tool.disconnect()
+    return fetched, round_trips, elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description="IMAP fetch benchmark")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10, 50, 200])
+    parser.add_argument("--latency", type=float, default=0.02,
+                        help="Simulated per-command round trip latency in seconds")
+    args = parser.parse_args()
+
+    print(f"{'mailbox':>8} {'mode':>10} {'fetched':>8} {'round trips':>12} {'wall (s)':>9}")
+    for size in args.sizes:
+        with FakeIMAPServer(Mailbox(synthetic_mailbox(size)), latency=args.latency) as server:
+            for label, batch_size in (("per-msg", 1), ("batched", GmailIMAPTool.FETCH_BATCH_SIZE)):
+                fetched, round_trips, elapsed = run(server, size, batch_size)
+                print(f"{size:>8} {label:>10} {fetched:>8} {round_trips:>12} {elapsed:>9.3f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,119 @@
+"""
+LLM latency across several providers: one provider, routed, and hedged.
+
+    python benchmarks/bench_llm_router.py --requests 600 --concurrency 10
+
+Two fake providers: "openai" answers in --fast-latency but a --spike-rate
+share of its requests take --spike-latency; "anthropic" always answers in
+--steady-latency. Each mode sends --requests prompts through
+LLMClient.agenerate_response, --concurrency at a time, alternating
+classification prompts (fast tier) and draft prompts (quality tier).
+
+"openai only" is the old single-provider client. "routed" sends each
+request to the backend with the lower rolling p50. "hedged" also re-sends a
+request to the other provider once it has waited the chosen backend's p95.
+Halfway through each mode the fast provider degrades to --degraded-latency;
+the "after" columns show whether traffic moved off it.
+"""
+import argparse
+import asyncio
+import contextlib
+import io
+import os
+import sys
+import time
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'src'))
+sys.path.append(os.path.dirname(__file__))
+
+from bench_e2e import percentiles
+from fake_llm import FakeLLMServer
+
+CLASSIFY_PROMPT = "Classify this email: 'Can you send me the Q3 report?' Answer with the action type."
+DRAFT_PROMPT = "Please draft a short reply confirming that the deployment finished."
+
+MODES = (
+    ("openai only", {"LLM_PROVIDERS": "openai", "LLM_HEDGE": "0"}),
+    ("routed", {"LLM_PROVIDERS": "openai,anthropic", "LLM_HEDGE": "0"}),
+    ("hedged", {"LLM_PROVIDERS": "openai,anthropic", "LLM_HEDGE": "1"}),
+)
+
+
+async def run_requests(llm, count: int, concurrency: int, offset: int = 0):
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies = []
+
+    async def one(index: int):
+        prompt, namespace = ((CLASSIFY_PROMPT, "classification") if index % 2
+                             else (DRAFT_PROMPT, "draft"))
+        async with semaphore:
+            started = time.perf_counter()
+            await llm.agenerate_response(f"{prompt} #{index}", namespace)
+            latencies.append(time.perf_counter() - started)
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        await asyncio.gather(*(one(offset + index) for index in range(count)))
+    return latencies
+
+
+async def run_mode(llm, fast: FakeLLMServer, steady: FakeLLMServer, args):
+    """Latencies before and after fast degrades, and requests each provider got before"""
+    half = args.requests // 2
+    before = await run_requests(llm, half, args.concurrency)
+    sent_before = fast.stats["requests"], steady.stats["requests"]
+    fast.latency = args.degraded_latency
+    fast.spike_rate = 0.0
+    after = await run_requests(llm, args.requests - half, args.concurrency, offset=half)
+    return before, after, sent_before
+
+
+async def run_all(args):
+    # One event loop for all modes: the SDK clients are bound to the loop that created them
+    from ai_agent.utils.llm_client import LLMClient
+
+    print(f"{args.requests} requests, {args.concurrency} at a time; openai {args.fast_latency * 1000:.0f} ms "
+          f"with {args.spike_rate:.0%} spikes of {args.spike_latency:.1f}s, anthropic "
+          f"{args.steady_latency * 1000:.0f} ms; openai degrades to {args.degraded_latency * 1000:.0f} ms halfway")
+    print(f"{'mode':>12} {'p50 (s)':>8} {'p95 (s)':>8} {'p99 (s)':>8} {'after p50':>10} {'after p95':>10} "
+          f"{'sent':>6} {'openai/anthropic after':>23}")
+    models = {}
+    for label, env in MODES:
+        with FakeLLMServer(latency=args.fast_latency, spike_rate=args.spike_rate,
+                           spike_latency=args.spike_latency) as fast, \
+                FakeLLMServer(latency=args.steady_latency) as steady:
+            os.environ.update(env, OPENAI_BASE_URL=f"{fast.url}/v1", ANTHROPIC_BASE_URL=steady.url)
+            llm = LLMClient()
+            llm.router = llm.create_router()
+            await llm.aclose()  # new base URLs: rebuild the SDK clients
+            before, after, (fast_before, steady_before) = await run_mode(llm, fast, steady, args)
+            stats, later = percentiles(before), percentiles(after)
+            sent = fast.stats["requests"] + steady.stats["requests"]
+            print(f"{label:>12} {stats['p50']:>8.3f} {stats['p95']:>8.3f} {stats['p99']:>8.3f} "
+                  f"{later['p50']:>10.3f} {later['p95']:>10.3f} {sent:>6} "
+                  f"{fast.stats['requests'] - fast_before:>11}/{steady.stats['requests'] - steady_before}")
+            for model, count in {**fast.stats["models"], **steady.stats["models"]}.items():
+                models[model] = models.get(model, 0) + count
+    print("requests per model: " + ", ".join(f"{model} {count}" for model, count in sorted(models.items())))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Multi-provider LLM routing and hedging benchmark")
+    parser.add_argument("--requests", type=int, default=600)
+    parser.add_argument("--concurrency", type=int, default=10)
+    parser.add_argument("--fast-latency", type=float, default=0.05)
+    parser.add_argument("--spike-rate", type=float, default=0.03)
+    parser.add_argument("--spike-latency", type=float, default=1.0)
+    parser.add_argument("--steady-latency", type=float, default=0.12)
+    parser.add_argument("--degraded-latency", type=float, default=0.5)
+    parser.add_argument("--window", type=float, default=60.0, help="LLM_ROUTER_WINDOW_SECONDS")
+    args = parser.parse_args()
+
+    os.environ.update({
+        "OPENAI_API_KEY": "fake", "ANTHROPIC_API_KEY": "fake",
+        "LLM_ROUTER_WINDOW_SECONDS": str(args.window), "LLM_MAX_CONNECTIONS": str(args.concurrency * 2),
+    })
+    asyncio.run(run_all(args))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,95 @@
+"""
+Processed-message ledger at scale: Bloom filter build time and size, lookup
+latency for new and known Message-IDs, and the measured false-positive rate.
+
+    python benchmarks/bench_message_ledger.py --ids 1000000 --probes 100000
+
+The ledger is filled with --ids synthetic Message-IDs in bulk, then reopened
+so the filter is rebuilt from SQLite as it would be after a restart. "bloom
+miss" probes are new IDs (the daemon's common case), "known" probes are
+stored IDs, "filter only" is the bare Bloom check without the ledger's lock,
+and "sqlite only" is the primary-key lookup the filter avoids (here against
+a warm page cache, its best case).
+"""
+import argparse
+import os
+import resource
+import sys
+import tempfile
+import time
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from ai_agent.utils.message_ledger import MessageLedger
+
+
+def message_id(index: int, namespace: str = "stored") -> str:
+    return f"<{namespace}-{index:09d}.{index * 2654435761 % 2 ** 32:08x}@mail.example.com>"
+
+
+def fill(path: str, count: int):
+    ledger = MessageLedger(path)
+    now = time.time()
+    with ledger._lock:
+        ledger._db.execute("BEGIN")
+        ledger._db.executemany(
+            "INSERT INTO processed (message_id, status, action, claimed_at, completed_at) VALUES (?, 'done', 'no_op', ?, ?)",
+            ((message_id(i), now, now) for i in range(count))
+        )
+        ledger._db.execute("COMMIT")
+    ledger.close()
+
+
+def time_per_call(function, keys) -> float:
+    start = time.perf_counter()
+    for key in keys:
+        function(key)
+    return (time.perf_counter() - start) / len(keys)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Processed-message ledger benchmark")
+    parser.add_argument("--ids", type=int, default=1_000_000)
+    parser.add_argument("--probes", type=int, default=100_000)
+    parser.add_argument("--capacity", type=int, default=1_000_000,
+                        help="Initial Bloom filter capacity (the ledger's MESSAGE_LEDGER_CAPACITY)")
+    parser.add_argument("--error-rate", type=float, default=0.001)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as workdir:
+        path = os.path.join(workdir, "ledger.sqlite3")
+        start = time.perf_counter()
+        fill(path, args.ids)
+        print(f"{args.ids} IDs written in {time.perf_counter() - start:.1f}s, "
+              f"database {os.path.getsize(path) / 1e6:.0f} MB")
+
+        rss_before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        ledger = MessageLedger(path, capacity=args.capacity, error_rate=args.error_rate)
+        start = time.perf_counter()
+        bloom = ledger.bloom
+        build = time.perf_counter() - start
+        rss_after = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        print(f"filter rebuilt in {build:.1f}s: {len(bloom.slices)} slice(s), {bloom.nbytes / 1e6:.1f} MB "
+              f"({bloom.nbytes / max(1, len(bloom)):.2f} bytes/ID), peak RSS +{(rss_after - rss_before) / 1024:.0f} MB")
+
+        new_ids = [message_id(i, "new") for i in range(args.probes)]
+        known_ids = [message_id(i * max(1, args.ids // args.probes)) for i in range(min(args.probes, args.ids))]
+
+        def sqlite_only(key):
+            return ledger._db.execute("SELECT 1 FROM processed WHERE message_id = ?", (key,)).fetchone()
+
+        ledger.stats["lookups"] = 0
+        print(f"{'lookup':>12} {'us/op':>8}")
+        print(f"{'filter only':>12} {time_per_call(bloom.__contains__, new_ids) * 1e6:>8.2f}")
+        print(f"{'bloom miss':>12} {time_per_call(ledger.seen, new_ids) * 1e6:>8.2f}")
+        false_positives = ledger.stats["lookups"]
+        print(f"{'known':>12} {time_per_call(ledger.seen, known_ids) * 1e6:>8.2f}")
+        print(f"{'sqlite only':>12} {time_per_call(sqlite_only, new_ids) * 1e6:>8.2f}")
+        print(f"false positives: {false_positives}/{len(new_ids)} = {false_positives / len(new_ids):.3%} "
+              f"(target {args.error_rate:.3%})")
+        assert all(ledger.seen(key) for key in known_ids[:1000])
+        ledger.close()
+
+
+if __name__ == "__main__":
+    main()
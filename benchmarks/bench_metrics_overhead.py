@@ -0,0 +1,87 @@
+"""
+Per-run cost of the instrumentation, disabled vs enabled.
+
+    python benchmarks/bench_metrics_overhead.py --runs 300
+
+Runs the full workflow (mock LLM, every message drafted) sequentially with
+metrics off and on, alternating to cancel warm-up effects, then prints an
+excerpt of the Prometheus export.
+"""
+import argparse
+import asyncio
+import contextlib
+import io
+import os
+import sys
+import tempfile
+import time
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+os.environ["LLM_PROVIDER"] = "mock"
+os.environ["MOCK_LLM_CLASSIFICATION"] = "EMAIL_REPLY:0.90"
+os.environ["DRAFT_STORE_PATH"] = os.path.join(tempfile.mkdtemp(), "drafts.sqlite3")
+os.environ["HEADER_PREFILTER"] = "0"
+
+from ai_agent import workflow
+from ai_agent.state import Message, InputType
+from ai_agent.utils import metrics as metrics_module
+from ai_agent.utils.metrics import MetricsRegistry
+
+
+def make_message(i: int) -> Message:
+    return Message(
+        sender=f"customer{i}@example.com",
+        recipient="agent@company.com",
+        subject=f"System outage follow-up {i}",
+        body="Please provide an update on the root cause analysis for last week's outage.",
+        input_type=InputType.EMAIL,
+        source="gmail",
+    )
+
+
+async def run(count: int) -> float:
+    messages = [make_message(i) for i in range(count)]
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        for message in messages:
+            await workflow.run_workflow({"input_mode": "gmail", "gmail_message": message})
+    return (time.perf_counter() - start) / count * 1e6
+
+
+def measure(registry: MetricsRegistry, count: int) -> float:
+    metrics_module._metrics = registry
+    workflow._compiled_workflow = None
+    asyncio.run(run(10))  # warm up
+    return asyncio.run(run(count))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Instrumentation overhead benchmark")
+    parser.add_argument("--runs", type=int, default=300)
+    parser.add_argument("--rounds", type=int, default=3,
+                        help="Alternate off/on this many times and keep the best of each")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        enabled_registry = MetricsRegistry(
+            enabled=True,
+            prometheus_path=os.path.join(tmp, "metrics.prom"),
+            trace_path=os.path.join(tmp, "traces.jsonl")
+        )
+        disabled = enabled = float("inf")
+        for _ in range(args.rounds):
+            disabled = min(disabled, measure(MetricsRegistry(enabled=False), args.runs))
+            enabled = min(enabled, measure(enabled_registry, args.runs))
+        enabled_registry.export_prometheus()
+        with open(enabled_registry.prometheus_path) as f:
+            exported = [line for line in f if "_count" in line or line.startswith("# TYPE")]
+
+    print(f"metrics disabled: {disabled:8.0f} us/run")
+    print(f"metrics enabled:  {enabled:8.0f} us/run ({(enabled - disabled) / disabled:+.1%})")
+    print("\nPrometheus export (counts only):")
+    print("".join(exported), end="")
+
+
+if __name__ == "__main__":
+    main()
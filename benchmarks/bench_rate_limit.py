@@ -0,0 +1,149 @@
+"""
+LLM calls against a provider that rate-limits, spikes and goes down.
+
+    python benchmarks/bench_rate_limit.py --requests 200 --capacity 8 --latency 0.2
+
+"overload": --requests completions are started at once against a fake
+provider that accepts --capacity requests in flight (429 with Retry-After
+beyond that, plus --error-rate random 429s) and takes --spike-latency for a
+--spike-rate share of requests. "sdk retries" is the old path: the OpenAI
+SDK's own two retries under the LLM_MAX_CONNECTIONS semaphore; every request
+that still failed used to become the mock's canned draft. "limiter" is
+LLMClient.agenerate_response with its ProviderLimiter.
+
+"outage": the provider answers 503 to everything. Once the circuit breaker
+opens, calls fail in microseconds instead of each retrying against a dead
+provider; after the outage ends, the next probe closes the circuit.
+"""
+import argparse
+import asyncio
+import contextlib
+import io
+import os
+import sys
+import time
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'src'))
+sys.path.append(os.path.dirname(__file__))
+
+from bench_e2e import percentiles
+from fake_llm import FakeLLMServer
+
+PROMPT = "Please draft a short reply confirming that the deployment finished."
+
+
+async def sdk_retries(server: FakeLLMServer, count: int, max_connections: int):
+    from openai import AsyncOpenAI
+    client = AsyncOpenAI(api_key="fake", base_url=f"{server.url}/v1")
+    semaphore = asyncio.Semaphore(max_connections)
+
+    async def one():
+        async with semaphore:
+            await client.chat.completions.create(
+                model="gpt-4o", messages=[{"role": "user", "content": PROMPT}], max_tokens=500
+            )
+
+    return await timed_calls(one, count)
+
+
+async def limiter(server: FakeLLMServer, count: int, max_connections: int):
+    from ai_agent.utils.llm_client import LLMClient
+    llm = LLMClient()
+    return await timed_calls(lambda: llm.agenerate_response(PROMPT), count)
+
+
+async def timed_calls(call, count: int):
+    latencies, failures = [], 0
+
+    async def one():
+        nonlocal failures
+        started = time.perf_counter()
+        try:
+            await call()
+            latencies.append(time.perf_counter() - started)
+        except Exception:
+            failures += 1
+
+    started = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        await asyncio.gather(*(one() for _ in range(count)))
+    return time.perf_counter() - started, latencies, failures
+
+
+async def outage(server: FakeLLMServer, calls: int, reset_seconds: float):
+    from ai_agent.utils.llm_client import LLMClient, LLMUnavailableError
+    llm = LLMClient()
+    breaker = llm.router.tiers["quality"][0].limiter.breaker
+    server.outage = True
+    durations = []
+    with contextlib.redirect_stdout(io.StringIO()):
+        for _ in range(calls):
+            started = time.perf_counter()
+            with contextlib.suppress(LLMUnavailableError):
+                await llm.agenerate_response(PROMPT)
+            durations.append(time.perf_counter() - started)
+    sent = server.stats["requests"]
+    state = breaker.state
+
+    server.outage = False
+    await asyncio.sleep(reset_seconds)
+    started = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        await llm.agenerate_response(PROMPT)
+    recovered_in = time.perf_counter() - started
+    return durations, sent, state, recovered_in, breaker.state
+
+
+def main():
+    parser = argparse.ArgumentParser(description="LLM rate limiting and circuit breaker benchmark")
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--latency", type=float, default=0.2)
+    parser.add_argument("--capacity", type=int, default=8, help="Requests the fake provider accepts in flight")
+    parser.add_argument("--error-rate", type=float, default=0.02, help="Share of requests answered 429 at random")
+    parser.add_argument("--retry-after", type=float, default=1.0)
+    parser.add_argument("--spike-rate", type=float, default=0.05)
+    parser.add_argument("--spike-latency", type=float, default=2.0)
+    parser.add_argument("--max-connections", type=int, default=20, help="LLM_MAX_CONNECTIONS")
+    parser.add_argument("--outage-calls", type=int, default=20)
+    parser.add_argument("--breaker-reset", type=float, default=2.0, help="LLM_BREAKER_RESET_SECONDS")
+    args = parser.parse_args()
+
+    faults = dict(latency=args.latency, capacity=args.capacity, error_rate=args.error_rate,
+                  retry_after=args.retry_after, spike_rate=args.spike_rate, spike_latency=args.spike_latency)
+    os.environ.update({
+        "LLM_PROVIDER": "openai", "OPENAI_API_KEY": "fake", "LLM_MAX_CONNECTIONS": str(args.max_connections),
+        "LLM_BREAKER_RESET_SECONDS": str(args.breaker_reset),
+    })
+    from ai_agent.utils.llm_client import LLMClient
+
+    print(f"{args.requests} requests at once; provider: {args.capacity} in flight, "
+          f"{args.latency * 1000:.0f} ms, {args.error_rate:.0%} random 429s, "
+          f"{args.spike_rate:.0%} spikes of {args.spike_latency:.1f}s")
+    print(f"{'mode':>12} {'ok':>5} {'failed':>7} {'429s':>6} {'total (s)':>10} {'p50 (s)':>8} {'p95 (s)':>8}")
+    for label, mode in (("sdk retries", sdk_retries), ("limiter", limiter)):
+        with FakeLLMServer(**faults) as server:
+            os.environ["OPENAI_BASE_URL"] = f"{server.url}/v1"
+            LLMClient().router = LLMClient().create_router()
+            elapsed, latencies, failures = asyncio.run(mode(server, args.requests, args.max_connections))
+            stats = percentiles(latencies) if latencies else {"p50": 0.0, "p95": 0.0}
+            print(f"{label:>12} {len(latencies):>5} {failures:>7} {server.stats['rate_limited']:>6} "
+                  f"{elapsed:>10.2f} {stats['p50']:>8.2f} {stats['p95']:>8.2f}")
+            if mode is limiter:
+                concurrency = LLMClient().router.tiers["quality"][0].limiter.concurrency
+                print(f"{'':>12} concurrency limit settled at {concurrency.limit:.1f} "
+                      f"(provider max in flight {server.stats['max_in_flight']})")
+
+    with FakeLLMServer(latency=args.latency) as server:
+        os.environ["OPENAI_BASE_URL"] = f"{server.url}/v1"
+        LLMClient().router = LLMClient().create_router()
+        durations, sent, state, recovered_in, final_state = asyncio.run(
+            outage(server, args.outage_calls, args.breaker_reset)
+        )
+    print(f"outage: {args.outage_calls} calls sent {sent} requests, circuit {state}; "
+          f"first call failed after {durations[0]:.2f}s, "
+          f"later calls in {percentiles(durations[-5:])['p50'] * 1e6:.0f} us")
+    print(f"after the outage: probe succeeded in {recovered_in:.2f}s, circuit {final_state}")
+
+
+if __name__ == "__main__":
+    main()
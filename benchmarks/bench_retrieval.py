@@ -0,0 +1,94 @@
+"""
+BM25 index build, load and query latency on a synthetic passage corpus.
+
+    python benchmarks/bench_retrieval.py --passages 100000 --queries 200
+
+Passages draw words from a Zipf-like vocabulary so posting lists have a
+realistic mix of very common and rare terms. Load time is measured in a
+fresh interpreter so it reflects opening the memory-mapped index.
+"""
+import argparse
+import itertools
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import time
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from ai_agent.utils.retrieval import BM25Index
+
+LOAD_SNIPPET = """
+import sys, time
+sys.path.insert(0, {src!r})
+start = time.perf_counter()
+from ai_agent.utils.retrieval import BM25Index
+index = BM25Index.load({index_dir!r})
+print(time.perf_counter() - start, len(index))
+"""
+
+
+def make_vocabulary(size: int):
+    return [f"w{i}" for i in range(size)]
+
+
+def make_passages(count: int, vocabulary, rng: random.Random, words_per_passage: int = 80):
+    cum_weights = list(itertools.accumulate(1 / (rank + 1) for rank in range(len(vocabulary))))
+    return [
+        (f"doc{i // 10}.md", " ".join(rng.choices(vocabulary, cum_weights=cum_weights, k=words_per_passage)))
+        for i in range(count)
+    ]
+
+
+def percentile(values, pct: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="BM25 retrieval benchmark")
+    parser.add_argument("--passages", type=int, default=100000)
+    parser.add_argument("--vocabulary", type=int, default=50000)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--query-words", type=int, default=40,
+                        help="Words per query, roughly an email subject plus body")
+    parser.add_argument("-k", type=int, default=10)
+    args = parser.parse_args()
+
+    rng = random.Random(7)
+    vocabulary = make_vocabulary(args.vocabulary)
+
+    with tempfile.TemporaryDirectory() as index_dir:
+        passages = make_passages(args.passages, vocabulary, rng)
+        start = time.perf_counter()
+        index = BM25Index.build(passages)
+        build_seconds = time.perf_counter() - start
+        version_dir = index.save(index_dir)
+        size_mb = sum(os.path.getsize(os.path.join(version_dir, name)) for name in os.listdir(version_dir)) / 1e6
+
+        src = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src')
+        output = subprocess.run(
+            [sys.executable, "-c", LOAD_SNIPPET.format(src=src, index_dir=index_dir)],
+            capture_output=True, text=True, check=True
+        ).stdout.split()
+        load_seconds = float(output[0])
+
+        loaded = BM25Index.load(index_dir)
+        queries = [" ".join(rng.sample(vocabulary[:5000], args.query_words)) for _ in range(args.queries)]
+        latencies = []
+        for query in queries:
+            start = time.perf_counter()
+            loaded.search(query, args.k)
+            latencies.append((time.perf_counter() - start) * 1000)
+
+    print(f"passages:      {args.passages} ({size_mb:.1f} MB on disk)")
+    print(f"build:         {build_seconds:.2f}s")
+    print(f"load (mmap):   {load_seconds * 1000:.0f} ms including import")
+    print(f"query p50/p95: {percentile(latencies, 50):.2f} / {percentile(latencies, 95):.2f} ms "
+          f"({args.query_words} words, top {args.k})")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,97 @@
+"""
+Per-run CPU time and memory of the workflow with large email bodies.
+
+    python benchmarks/bench_state_overhead.py --runs 20 --body-mb 1
+
+Drives the full receive -> classify -> retrieve -> gmail_draft -> save_draft
+path with the mock LLM. The "legacy round trips" line measures the
+AgentState.from_dict/to_dict cycles every node and router used to perform
+(10 per run on this path) on the same state, i.e. the work that is gone.
+"""
+import argparse
+import asyncio
+import contextlib
+import io
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+os.environ["LLM_PROVIDER"] = "mock"
+os.environ["MOCK_LLM_CLASSIFICATION"] = "EMAIL_REPLY:0.90"
+os.environ["DRAFT_STORE_PATH"] = os.path.join(tempfile.mkdtemp(), "drafts.sqlite3")
+
+from ai_agent.state import AgentState, Message, InputType
+from ai_agent.workflow import get_compiled_workflow
+
+LEGACY_CYCLES_PER_RUN = 10
+
+
+def make_message(body_bytes: int) -> Message:
+    line = "Please provide an update on the system outage root cause analysis.\n"
+    return Message(
+        sender="customer@example.com",
+        recipient="agent@company.com",
+        subject="System outage follow-up",
+        body=(line * (body_bytes // len(line) + 1))[:body_bytes],
+        input_type=InputType.EMAIL,
+        source="gmail",
+    )
+
+
+def measure(fn, runs: int):
+    """Return (cpu ms per run, peak traced KiB of one run)"""
+    fn()  # warm up
+    start = time.process_time()
+    for _ in range(runs):
+        fn()
+    cpu = (time.process_time() - start) / runs * 1000
+
+    # Tracing slows everything down, so memory is measured separately
+    tracemalloc.start()
+    fn()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return cpu, peak / 1024
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Workflow state overhead benchmark")
+    parser.add_argument("--runs", type=int, default=20)
+    parser.add_argument("--body-mb", type=float, default=1.0)
+    args = parser.parse_args()
+
+    message = make_message(int(args.body_mb * 1024 * 1024))
+    app = get_compiled_workflow()
+
+    def run_once():
+        with contextlib.redirect_stdout(io.StringIO()):
+            return asyncio.run(app.ainvoke({"input_mode": "gmail", "gmail_message": message}))
+
+    final_state = run_once()
+    legacy_state = AgentState(
+        input_message=message,
+        action_type=final_state["action_type"],
+        action_confidence=final_state["action_confidence"],
+        retrieved_context=final_state["retrieved_context"],
+        result=final_state["result"],
+    ).to_dict()
+
+    def legacy_round_trips():
+        for _ in range(LEGACY_CYCLES_PER_RUN):
+            AgentState.from_dict(legacy_state).to_dict()
+
+    run_cpu, run_peak = measure(run_once, args.runs)
+    legacy_cpu, legacy_peak = measure(legacy_round_trips, args.runs)
+
+    print(f"body size: {args.body_mb} MB, path: {final_state['result']['type']}")
+    print(f"{'':24} {'cpu ms/run':>11} {'peak KiB':>10}")
+    print(f"{'workflow run':24} {run_cpu:>11.2f} {run_peak:>10.0f}")
+    print(f"{'legacy round trips':24} {legacy_cpu:>11.2f} {legacy_peak:>10.0f}")
+
+
+if __name__ == "__main__":
+    main()
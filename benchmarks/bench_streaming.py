@@ -0,0 +1,70 @@
+"""
+Time to first token vs full-completion latency for draft generation.
+
+    python benchmarks/bench_streaming.py --latency 0.3 --chunk-delay 0.02
+
+Runs the same draft prompt through LLMClient.agenerate_response and
+LLMClient.astream_response against the streaming mock and the local fake
+OpenAI/Anthropic endpoints. The fake endpoints stream one word per event.
+"""
+import argparse
+import asyncio
+import os
+import sys
+import time
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'src'))
+sys.path.append(os.path.dirname(__file__))
+
+import fake_llm
+from fake_llm import FakeLLMServer
+
+DRAFT_WORDS = 200
+
+
+async def measure(client, provider: str, prompt: str):
+    from ai_agent.utils.llm_client import acollect_stream
+    client.router = client.create_router(provider)
+    # Warm up: SDK import and connection setup are not what is being measured
+    await client.agenerate_response(prompt)
+
+    start = time.perf_counter()
+    blocking_text = await client.agenerate_response(prompt)
+    blocking = time.perf_counter() - start
+
+    streamed_text, stats = await acollect_stream(client.astream_response(prompt))
+    assert streamed_text == blocking_text, f"{provider}: streamed text differs from blocking response"
+    return blocking, stats
+
+
+async def run(providers):
+    from ai_agent.utils.llm_client import LLMClient
+    client = LLMClient()
+    return [await measure(client, provider, "Write a reply to this customer email.") for provider in providers]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Draft streaming benchmark")
+    parser.add_argument("--latency", type=float, default=0.3, help="Delay before the first token")
+    parser.add_argument("--chunk-delay", type=float, default=0.02, help="Delay between streamed tokens")
+    args = parser.parse_args()
+
+    fake_llm.DRAFT_TEXT = " ".join(f"word{i}" for i in range(DRAFT_WORDS))
+    os.environ["MOCK_LLM_LATENCY"] = str(args.latency)
+    os.environ["MOCK_LLM_STREAM_DELAY"] = str(args.chunk_delay)
+
+    with FakeLLMServer(latency=args.latency, chunk_delay=args.chunk_delay) as server:
+        os.environ["OPENAI_API_KEY"] = "fake"
+        os.environ["ANTHROPIC_API_KEY"] = "fake"
+        os.environ["OPENAI_BASE_URL"] = f"{server.url}/v1"
+        os.environ["ANTHROPIC_BASE_URL"] = server.url
+
+        print(f"{'provider':>10} {'blocking (s)':>13} {'first token (s)':>16} {'stream total (s)':>17} "
+              f"{'tokens':>7} {'tokens/s':>9}")
+        providers = ("mock", "openai", "anthropic")
+        for provider, (blocking, stats) in zip(providers, asyncio.run(run(providers))):
+            print(f"{provider:>10} {blocking:>13.2f} {stats['ttft_seconds']:>16.2f} "
+                  f"{stats['total_seconds']:>17.2f} {stats['tokens']:>7} {stats['tokens_per_sec']:>9.1f}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,96 @@
+"""
+Full RFC822 fetch vs headers-first two-phase fetch against the local IMAP stand-in.
+
+    python benchmarks/bench_two_phase_fetch.py --messages 200 --bulk-ratio 0.6 --attachment-bytes 200000
+
+Both modes go from a fresh sync to "classified, with bodies for every
+EMAIL_REPLY message". Bulk mail is skipped by the header rules and the mock
+LLM classifies everything else as EMAIL_REPLY, so --bulk-ratio sets how many
+bodies phase two can skip. --bandwidth and --latency model the network.
+"""
+import argparse
+import asyncio
+import contextlib
+import io
+import os
+import sys
+import tempfile
+import time
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'src'))
+sys.path.append(os.path.dirname(__file__))
+
+os.environ["LLM_PROVIDER"] = "mock"
+os.environ["MOCK_LLM_CLASSIFICATION"] = "EMAIL_REPLY"
+os.environ.setdefault("MOCK_LLM_LATENCY", "0")
+
+from fake_imap import FakeIMAPServer, Mailbox, synthetic_mailbox
+from ai_agent.nodes.classify_action import aclassify_scraped_batch
+from ai_agent.state import ActionType
+from ai_agent.tools.gmail_imap_tool import GmailIMAPTool
+from ai_agent.tools.mailbox_sync import MailboxSyncState
+
+
+def run(raw_messages, fetch_mode: str, latency: float, bandwidth: float):
+    with FakeIMAPServer(Mailbox(raw_messages), latency=latency, bandwidth=bandwidth) as server:
+        tool = GmailIMAPTool("bench@example.com", "secret", host="127.0.0.1",
+                             port=server.port, use_ssl=False, fetch_mode=fetch_mode)
+        tool.connect()
+        server.reset_stats()
+        sync_state = MailboxSyncState(os.path.join(tempfile.mkdtemp(), "sync.json"))
+
+        with contextlib.redirect_stdout(io.StringIO()):
+            start = time.perf_counter()
+            messages, _ = tool.get_new_messages(sync_state)
+            fetched = time.perf_counter()
+            classifications = asyncio.run(aclassify_scraped_batch(messages))
+            classified = time.perf_counter()
+            replies = [m for m, (action, _) in zip(messages, classifications) if action == ActionType.EMAIL_REPLY]
+            if fetch_mode == "two_phase":
+                replies = tool.fetch_bodies(replies)
+            done = time.perf_counter()
+
+        stats = dict(server.stats)
+        tool.disconnect()
+
+    assert all(m.body for m in replies), "reply without a body"
+    imap_seconds = (fetched - start) + (done - classified)
+    return {
+        "messages": len(messages), "replies": len(replies), "bytes": stats["bytes_sent"],
+        "round_trips": stats["round_trips"], "imap_seconds": imap_seconds, "total_seconds": done - start,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Two-phase IMAP fetch benchmark")
+    parser.add_argument("--messages", type=int, default=200)
+    parser.add_argument("--bulk-ratio", type=float, default=0.6)
+    parser.add_argument("--mime", default="mixed")
+    parser.add_argument("--body-bytes", type=int, default=2000)
+    parser.add_argument("--attachment-bytes", type=int, default=200_000)
+    parser.add_argument("--latency", type=float, default=0.02,
+                        help="Simulated per-command round trip latency in seconds")
+    parser.add_argument("--bandwidth", type=float, default=10e6,
+                        help="Simulated download bandwidth in bytes/s (0 = unlimited)")
+    args = parser.parse_args()
+
+    raw_messages = synthetic_mailbox(args.messages, args.body_bytes, args.bulk_ratio,
+                                     mime=args.mime, attachment_bytes=args.attachment_bytes)
+    print(f"{args.messages} messages ({sum(map(len, raw_messages)) / 1e6:.1f} MB), "
+          f"bulk ratio {args.bulk_ratio}, {args.latency * 1000:.0f} ms RTT, {args.bandwidth / 1e6:.0f} MB/s")
+    print(f"{'mode':>10} {'replies':>8} {'MB':>8} {'KB/msg':>8} {'round trips':>12} "
+          f"{'IMAP ms/msg':>12} {'total (s)':>10}")
+    results = {}
+    for mode in ("full", "two_phase"):
+        result = results[mode] = run(raw_messages, mode, args.latency, args.bandwidth)
+        print(f"{mode:>10} {result['replies']:>8} {result['bytes'] / 1e6:>8.2f} "
+              f"{result['bytes'] / 1e3 / result['messages']:>8.1f} {result['round_trips']:>12} "
+              f"{result['imap_seconds'] * 1000 / result['messages']:>12.2f} {result['total_seconds']:>10.2f}")
+
+    full, two_phase = results["full"], results["two_phase"]
+    print(f"two_phase transfers {two_phase['bytes'] / full['bytes']:.1%} of the bytes, "
+          f"IMAP time {two_phase['imap_seconds'] / full['imap_seconds']:.1%} of full")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,56 @@
+"""
+Per-message overhead of compiling the LangGraph workflow on every run vs. reusing it.
+
+    python benchmarks/bench_workflow_compile.py --runs 200
+
+Uses a CLI command with the mock LLM, which takes the short receive -> classify
+-> retrieve -> no_op path, so graph overhead dominates.
+"""
+import argparse
+import asyncio
+import contextlib
+import io
+import os
+import sys
+import time
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+os.environ["LLM_PROVIDER"] = "mock"
+
+from ai_agent.workflow import create_workflow, get_compiled_workflow
+
+STATE = {"input_mode": "cli", "cli_command": "schedule a sync with the team"}
+
+
+async def run(runs: int, recompile: bool) -> float:
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        for _ in range(runs):
+            app = create_workflow() if recompile else get_compiled_workflow()
+            await app.ainvoke(dict(STATE))
+    return (time.perf_counter() - start) / runs
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Workflow compile overhead benchmark")
+    parser.add_argument("--runs", type=int, default=200)
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    for _ in range(args.runs):
+        create_workflow()
+    compile_ms = (time.perf_counter() - start) / args.runs * 1000
+
+    get_compiled_workflow()
+    recompiled_ms = asyncio.run(run(args.runs, recompile=True)) * 1000
+    cached_ms = asyncio.run(run(args.runs, recompile=False)) * 1000
+
+    print(f"create_workflow():          {compile_ms:8.3f} ms")
+    print(f"per message, compile each:  {recompiled_ms:8.3f} ms")
+    print(f"per message, compiled once: {cached_ms:8.3f} ms")
+    print(f"saved per message:          {recompiled_ms - cached_ms:8.3f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,374 @@
+"""
+Local IMAP stand-in for benchmarks.
+
+Speaks just enough IMAP4rev1 over plain TCP for imaplib.IMAP4 (and therefore
+GmailIMAPTool with use_ssl=False) to log in, search, fetch, APPEND and IDLE.
+Every tagged command counts as one round trip. latency delays every response
+by that long after the command arrived, so a client that waits for each reply
+pays it per command while a pipelining client pays it once; bandwidth
+(bytes/s) additionally delays each FETCH by the size of its response.
+FETCH understands RFC822, BODYSTRUCTURE, BODY[], BODY[HEADER] and BODY[<section>]<partial>.
+APPEND accepts synchronizing literals and, when advertised, LITERAL+.
+"""
+import email
+import queue
+import re
+import select
+import socketserver
+import threading
+import time
+from email.message import EmailMessage
+from typing import Dict, List, Optional, Tuple
+
+
+MIME_KINDS = ("plain", "alternative", "mixed")
+
+
+def make_message(index: int, body_bytes: int = 2000, bulk: bool = False,
+                 mime: str = "plain", attachment_bytes: int = 0) -> bytes:
+    """Build a deterministic synthetic email.
+
+    bulk=True makes it look like a newsletter. mime="alternative" adds an HTML
+    part next to the text; mime="mixed" also nests that under multipart/mixed
+    with a PDF attachment of attachment_bytes (and a second, smaller one).
+    """
+    msg = EmailMessage()
+    if bulk:
+        msg["From"] = f"Newsletter <no-reply@news{index}.example.com>"
+        msg["List-Unsubscribe"] = f"<mailto:unsubscribe@news{index}.example.com>"
+        msg["Precedence"] = "bulk"
+    else:
+        msg["From"] = f"sender{index}@example.com"
+    msg["To"] = "agent@company.com"
+    msg["Subject"] = f"Synthetic message {index}"
+    msg["Date"] = "Mon, 01 Jan 2024 10:00:00 +0000"
+    msg["Message-ID"] = f"<synthetic-{index}@example.com>"
+    line = f"Please provide an update on ticket {index}.\n"
+    text = (line * (body_bytes // len(line) + 1))[:body_bytes]
+    msg.set_content(text)
+
+    if mime in ("alternative", "mixed"):
+        paragraphs = "".join(f"<p>{row}</p>" for row in text.splitlines())
+        msg.add_alternative(f"<html><body>{paragraphs}</body></html>", subtype="html")
+    if mime == "mixed":
+        payload = bytes(range(256)) * (attachment_bytes // 256 + 1)
+        msg.add_attachment(payload[:attachment_bytes], maintype="application", subtype="pdf",
+                           filename=f"report-{index}.pdf")
+        msg.add_attachment(payload[:min(attachment_bytes, 4096)], maintype="image", subtype="png",
+                           filename=f"logo-{index}.png")
+    return msg.as_bytes()
+
+
+def synthetic_mailbox(count: int, body_bytes: int = 2000, bulk_ratio: float = 0.0,
+                      mime: str = "plain", attachment_bytes: int = 0) -> List[bytes]:
+    """Every message whose position falls in the first bulk_ratio of each ten is a newsletter"""
+    return [
+        make_message(i, body_bytes, bulk=(i % 10) < bulk_ratio * 10, mime=mime, attachment_bytes=attachment_bytes)
+        for i in range(1, count + 1)
+    ]
+
+
+class Mailbox:
+    def __init__(self, messages: Optional[List[bytes]] = None, uidvalidity: int = 1):
+        self.lock = threading.Lock()
+        self.uidvalidity = uidvalidity
+        self.uidnext = 1
+        self.messages: List[Dict] = []
+        for raw in messages or []:
+            self.add(raw)
+
+    def add(self, raw: bytes, flags: Tuple[str, ...] = ()) -> int:
+        with self.lock:
+            uid = self.uidnext
+            self.uidnext += 1
+            # Parsed up front so BODYSTRUCTURE / section fetches don't time the stand-in's parsing
+            self.messages.append({"uid": uid, "raw": raw, "flags": set(flags),
+                                  "parsed": email.message_from_bytes(raw)})
+            return uid
+
+
+def _parse_sequence_set(spec: str, maximum: int) -> List[int]:
+    numbers = []
+    for part in spec.split(","):
+        if ":" in part:
+            start, end = part.split(":")
+            start = maximum if start == "*" else int(start)
+            end = maximum if end == "*" else int(end)
+            lo, hi = min(start, end), max(start, end)
+            numbers.extend(range(lo, hi + 1))
+        else:
+            numbers.append(maximum if part == "*" else int(part))
+    return numbers
+
+
+def _bodystructure(part) -> str:
+    if part.is_multipart():
+        children = "".join(_bodystructure(child) for child in part.get_payload())
+        return f'({children} "{part.get_content_subtype().upper()}")'
+    maintype, subtype = part.get_content_maintype(), part.get_content_subtype()
+    charset = part.get_content_charset()
+    params = f'("CHARSET" "{charset}")' if charset else "NIL"
+    encoding = (part.get("Content-Transfer-Encoding") or "7bit").upper()
+    payload = part.get_payload()
+    filename = part.get_filename()
+    disposition = f'("ATTACHMENT" ("FILENAME" "{filename}"))' if filename else "NIL"
+    fields = f'"{maintype.upper()}" "{subtype.upper()}" {params} NIL NIL "{encoding}" {len(payload)}'
+    if maintype == "text":
+        return f"({fields} {payload.count(chr(10))} NIL {disposition} NIL)"
+    return f"({fields} NIL {disposition} NIL)"
+
+
+def _section(part, section: str) -> bytes:
+    for number in section.split("."):
+        if part.is_multipart():
+            part = part.get_payload()[int(number) - 1]
+        elif number != "1":
+            return b""
+    return part.get_payload().encode("utf-8", errors="replace")
+
+
+def _header(raw: bytes) -> bytes:
+    for separator in (b"\r\n\r\n", b"\n\n"):
+        end = raw.find(separator)
+        if end >= 0:
+            return raw[:end + len(separator)]
+    return raw
+
+
+class IMAPHandler(socketserver.StreamRequestHandler):
+    disable_nagle_algorithm = True
+
+    def handle(self):
+        self.selected = False
+        self.received_at = time.monotonic()
+        self._outbox = None
+        if self.server.latency:
+            # Responses leave `latency` after their command arrived, in order
+            self._outbox = queue.Queue()
+            writer = threading.Thread(target=self._write_delayed, daemon=True)
+            writer.start()
+        try:
+            self._serve()
+        finally:
+            if self._outbox is not None:
+                self._outbox.put(None)
+                writer.join()
+
+    def _serve(self):
+        self._send(f"* OK [CAPABILITY {self.server.capabilities}] Fake IMAP ready".encode())
+        while True:
+            line = self.rfile.readline()
+            if not line:
+                return
+            self.received_at = time.monotonic()
+            parts = line.decode().rstrip("\r\n").split(" ", 2)
+            if len(parts) < 2:
+                continue
+            tag, command = parts[0], parts[1].upper()
+            args = parts[2] if len(parts) > 2 else ""
+            self.server.stats["round_trips"] += 1
+
+            uid_mode = False
+            if command == "UID":
+                uid_mode = True
+                command, _, args = args.partition(" ")
+                command = command.upper()
+
+            handler = getattr(self, f"do_{command}", None)
+            if handler is None:
+                self._send(f"{tag} BAD unknown command".encode())
+                continue
+            if handler(tag, args, uid_mode) is False:
+                return
+
+    def _send(self, data: bytes):
+        self._write(data + b"\r\n")
+
+    def _write(self, data: bytes):
+        if self._outbox is None:
+            self.wfile.write(data)
+        else:
+            self._outbox.put((self.received_at + self.server.latency, data))
+
+    def _write_delayed(self):
+        while True:
+            item = self._outbox.get()
+            if item is None:
+                return
+            release_at, data = item
+            time.sleep(max(0.0, release_at - time.monotonic()))
+            try:
+                self.wfile.write(data)
+            except OSError:
+                return
+
+    def _mailbox(self) -> Mailbox:
+        return self.server.mailbox
+
+    def do_CAPABILITY(self, tag, args, uid_mode):
+        self._send(f"* CAPABILITY {self.server.capabilities}".encode())
+        self._send(f"{tag} OK CAPABILITY completed".encode())
+
+    def do_LOGIN(self, tag, args, uid_mode):
+        self._send(f"{tag} OK LOGIN completed".encode())
+
+    def do_SELECT(self, tag, args, uid_mode):
+        box = self._mailbox()
+        self.selected = True
+        self._send(f"* {len(box.messages)} EXISTS".encode())
+        self._send(b"* 0 RECENT")
+        self._send(f"* OK [UIDVALIDITY {box.uidvalidity}] UIDs valid".encode())
+        self._send(f"* OK [UIDNEXT {box.uidnext}] Predicted next UID".encode())
+        self._send(f"{tag} OK [READ-WRITE] SELECT completed".encode())
+
+    def do_NOOP(self, tag, args, uid_mode):
+        self._send(f"{tag} OK NOOP completed".encode())
+
+    def do_IDLE(self, tag, args, uid_mode):
+        box = self._mailbox()
+        known = len(box.messages)
+        self._send(b"+ idling")
+        while True:
+            readable, _, _ = select.select([self.connection], [], [], 0.05)
+            if len(box.messages) != known:
+                known = len(box.messages)
+                self._send(f"* {known} EXISTS".encode())
+            if readable:
+                line = self.rfile.readline()
+                if not line:
+                    return False
+                if line.strip().upper() == b"DONE":
+                    break
+        self._send(f"{tag} OK IDLE terminated".encode())
+
+    def do_CLOSE(self, tag, args, uid_mode):
+        self.selected = False
+        self._send(f"{tag} OK CLOSE completed".encode())
+
+    def do_LOGOUT(self, tag, args, uid_mode):
+        self._send(b"* BYE logging out")
+        self._send(f"{tag} OK LOGOUT completed".encode())
+        return False
+
+    def do_SEARCH(self, tag, args, uid_mode):
+        box = self._mailbox()
+        criteria = args.upper()
+        uid_range = re.search(r"UID (\S+)", criteria)
+        hits = []
+        with box.lock:
+            wanted_uids = None
+            if uid_range:
+                max_uid = box.messages[-1]["uid"] if box.messages else 0
+                wanted_uids = set(_parse_sequence_set(uid_range.group(1), max(max_uid, 1)))
+            for seq, entry in enumerate(box.messages, 1):
+                if "UNSEEN" in criteria and "\\Seen" in entry["flags"]:
+                    continue
+                if wanted_uids is not None and entry["uid"] not in wanted_uids:
+                    continue
+                hits.append(entry["uid"] if uid_mode else seq)
+        self._send(("* SEARCH " + " ".join(str(h) for h in hits)).rstrip().encode())
+        self._send(f"{tag} OK SEARCH completed".encode())
+
+    def do_FETCH(self, tag, args, uid_mode):
+        box = self._mailbox()
+        spec, _, items = args.partition(" ")
+        with box.lock:
+            by_uid = {entry["uid"]: seq for seq, entry in enumerate(box.messages, 1)}
+            if uid_mode:
+                max_uid = box.messages[-1]["uid"] if box.messages else 1
+                seqs = [by_uid[u] for u in _parse_sequence_set(spec, max_uid) if u in by_uid]
+            else:
+                seqs = [s for s in _parse_sequence_set(spec, len(box.messages))
+                        if 1 <= s <= len(box.messages)]
+            entries = [(seq, box.messages[seq - 1]) for seq in seqs]
+
+        wanted = items.upper()
+        mark_seen = "PEEK" not in wanted
+        sections = re.findall(r"BODY(?:\.PEEK)?\[([\d.]*)\](?:<(\d+)\.(\d+)>)?", wanted)
+        for seq, entry in entries:
+            if mark_seen:
+                entry["flags"].add("\\Seen")
+            raw = entry["raw"]
+            fields = [f"UID {entry['uid']}"]
+            literals = []
+            if "FLAGS" in wanted:
+                fields.append(f"FLAGS ({' '.join(sorted(entry['flags']))})")
+            parsed = entry["parsed"]
+            if "BODYSTRUCTURE" in wanted:
+                fields.append(f"BODYSTRUCTURE {_bodystructure(parsed)}")
+            if "BODY.PEEK[HEADER]" in wanted or "BODY[HEADER]" in wanted:
+                literals.append(("BODY[HEADER]", _header(raw)))
+            for section, origin, length in sections:
+                data = _section(parsed, section) if section else raw
+                if origin:
+                    data = data[int(origin):int(origin) + int(length)]
+                    literals.append((f"BODY[{section}]<{origin}>", data))
+                else:
+                    literals.append((f"BODY[{section}]", data))
+            if "RFC822" in wanted.replace("RFC822.", ""):
+                literals.append(("RFC822", raw))
+
+            response = f"* {seq} FETCH ({' '.join(fields)}".encode()
+            for name, data in literals:
+                response += f" {name} {{{len(data)}}}\r\n".encode() + data
+            response += b")\r\n"
+            self._write(response)
+            self.server.stats["bytes_sent"] += len(response)
+            if self.server.bandwidth:
+                time.sleep(len(response) / self.server.bandwidth)
+        self._send(f"{tag} OK FETCH completed".encode())
+
+    def do_APPEND(self, tag, args, uid_mode):
+        match = re.match(r'("(?:[^"\\]|\\.)*"|\S+)(?: \(([^)]*)\))?(?: "[^"]*")? \{(\d+)(\+?)\}$', args)
+        if not match:
+            self._send(f"{tag} BAD APPEND arguments".encode())
+            return
+        name = match.group(1).strip('"').replace('\\"', '"')
+        flags = tuple(match.group(2).split()) if match.group(2) else ()
+        size, synchronizing = int(match.group(3)), not match.group(4)
+        if synchronizing:
+            self._send(b"+ Ready for literal data")
+        raw = self.rfile.read(size)
+        self.rfile.readline()  # CRLF ending the command
+        if synchronizing:
+            self.received_at = time.monotonic()  # the reply waits on the literal, not the command line
+
+        if name.upper() == "INBOX":
+            box = self.server.mailbox
+        else:
+            box = self.server.folders.setdefault(name, Mailbox())
+        uid = box.add(raw, flags)
+        self._send(f"{tag} OK [APPENDUID {box.uidvalidity} {uid}] APPEND completed".encode())
+
+
+class FakeIMAPServer(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, mailbox: Mailbox, latency: float = 0.0, host: str = "127.0.0.1", port: int = 0,
+                 bandwidth: float = 0.0, literal_plus: bool = False):
+        super().__init__((host, port), IMAPHandler)
+        self.mailbox = mailbox
+        self.latency = latency
+        self.bandwidth = bandwidth
+        self.capabilities = "IMAP4rev1 IDLE UIDPLUS" + (" LITERAL+" if literal_plus else "")
+        # Other folders (e.g. "[Gmail]/Drafts"), created on first APPEND
+        self.folders: Dict[str, Mailbox] = {}
+        self.stats = {"round_trips": 0, "bytes_sent": 0}
+        self._thread = None
+
+    @property
+    def port(self) -> int:
+        return self.server_address[1]
+
+    def reset_stats(self):
+        self.stats = {"round_trips": 0, "bytes_sent": 0}
+
+    def __enter__(self):
+        self._thread = threading.Thread(target=self.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.shutdown()
+        self.server_close()
@@ -0,0 +1,237 @@
+"""
+Local fake LLM provider for benchmarks.
+
+Serves OpenAI-style POST /v1/chat/completions and Anthropic-style
+POST /v1/messages with a configurable delay per request. Point the SDKs at it
+with OPENAI_BASE_URL=<url>/v1 or ANTHROPIC_BASE_URL=<url>. Requests with
+"stream": true get server-sent events, one word per event, chunk_delay apart.
+
+Faults like a real provider's: requests beyond `capacity` in flight, and a
+random `error_rate` share of the rest, get a 429 with Retry-After; a
+`spike_rate` share takes `spike_latency` instead of `latency`; while `outage`
+is set every request gets a 503.
+"""
+import json
+import random
+import re
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+DRAFT_TEXT = "Thank you for your email. We are looking into it and will follow up shortly."
+_WORD_RE = re.compile(r'\S+\s*')
+
+
+def fake_completion(prompt: str) -> str:
+    if "ACTION_TYPE:CONFIDENCE_SCORE" in prompt:
+        batch_numbers = re.findall(r'^\s*EMAIL (\d+):\s*$', prompt, re.MULTILINE)
+        if batch_numbers:
+            return "\n".join(f"{number}: EMAIL_REPLY:0.90" for number in batch_numbers)
+        return "EMAIL_REPLY:0.90"
+    return DRAFT_TEXT
+
+
+class FakeLLMHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length", 0))
+        request = json.loads(self.rfile.read(length) or b"{}")
+        prompt = "".join(
+            m["content"] if isinstance(m["content"], str) else ""
+            for m in request.get("messages", [])
+        )
+
+        server = self.server
+        with server.lock:
+            server.stats["requests"] += 1
+            model = request.get("model")
+            if model:
+                server.stats["models"][model] = server.stats["models"].get(model, 0) + 1
+            if server.outage:
+                server.stats["unavailable"] += 1
+                rejected = 503
+            elif server.in_flight >= server.capacity or random.random() < server.error_rate:
+                server.stats["rate_limited"] += 1
+                rejected = 429
+            else:
+                rejected = None
+                server.in_flight += 1
+                server.stats["max_in_flight"] = max(server.stats["max_in_flight"], server.in_flight)
+        if rejected:
+            self._send_error(rejected)
+            return
+        try:
+            spike = random.random() < server.spike_rate
+            if spike:
+                with server.lock:
+                    server.stats["spikes"] += 1
+            latency = server.spike_latency if spike else server.latency
+            if latency:
+                time.sleep(latency)
+            text = fake_completion(prompt)
+            if request.get("stream"):
+                if self.path.endswith("/chat/completions"):
+                    self._send_events(self._openai_events(request, text))
+                elif self.path.endswith("/messages"):
+                    self._send_events(self._anthropic_events(request, text))
+                else:
+                    self.send_error(404)
+                return
+            if server.chunk_delay:
+                # A blocking response arrives once the whole completion has been generated
+                time.sleep(server.chunk_delay * max(0, len(_WORD_RE.findall(text)) - 1))
+            if self.path.endswith("/chat/completions"):
+                body = self._openai_body(request, text)
+            elif self.path.endswith("/messages"):
+                body = self._anthropic_body(request, text)
+            else:
+                self.send_error(404)
+                return
+            self._send_json(200, body)
+        finally:
+            with server.lock:
+                server.in_flight -= 1
+
+    def _send_json(self, status: int, body: dict, headers: dict = None):
+        data = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _send_error(self, status: int):
+        """A 429 or 503 in the shape of the provider's own error bodies"""
+        kind, message = ("rate_limit_error", "Rate limit reached") if status == 429 \
+            else ("overloaded_error", "Service unavailable")
+        if self.path.endswith("/messages"):
+            body = {"type": "error", "error": {"type": kind, "message": message}}
+        else:
+            body = {"error": {"message": message, "type": kind, "param": None, "code": None}}
+        retry_after = self.server.retry_after
+        headers = {"retry-after": str(max(1, round(retry_after))),
+                   "retry-after-ms": str(int(retry_after * 1000))} if retry_after else {}
+        self._send_json(status, body, headers)
+
+    def _send_events(self, events):
+        """Write (event name, payload) pairs as chunked server-sent events"""
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+        for position, (event, payload) in enumerate(events):
+            if position and event in ("", "content_block_delta") and self.server.chunk_delay:
+                time.sleep(self.server.chunk_delay)
+            data = payload if isinstance(payload, str) else json.dumps(payload)
+            frame = (f"event: {event}\n" if event else "") + f"data: {data}\n\n"
+            encoded = frame.encode()
+            self.wfile.write(f"{len(encoded):x}\r\n".encode() + encoded + b"\r\n")
+            self.wfile.flush()
+        self.wfile.write(b"0\r\n\r\n")
+
+    @staticmethod
+    def _openai_events(request: dict, text: str):
+        base = {"id": "chatcmpl-fake", "object": "chat.completion.chunk",
+                "created": int(time.time()), "model": request.get("model", "fake")}
+        for word in _WORD_RE.findall(text):
+            yield "", {**base, "choices": [{"index": 0, "delta": {"content": word}, "finish_reason": None}]}
+        yield "", {**base, "choices": [{"index": 0, "delta": {}, "finish_reason": "stop"}]}
+        yield "", "[DONE]"
+
+    @staticmethod
+    def _anthropic_events(request: dict, text: str):
+        yield "message_start", {"type": "message_start", "message": {
+            "id": "msg_fake", "type": "message", "role": "assistant", "model": request.get("model", "fake"),
+            "content": [], "stop_reason": None, "stop_sequence": None,
+            "usage": {"input_tokens": 0, "output_tokens": 0}}}
+        yield "content_block_start", {"type": "content_block_start", "index": 0,
+                                      "content_block": {"type": "text", "text": ""}}
+        for word in _WORD_RE.findall(text):
+            yield "content_block_delta", {"type": "content_block_delta", "index": 0,
+                                          "delta": {"type": "text_delta", "text": word}}
+        yield "content_block_stop", {"type": "content_block_stop", "index": 0}
+        yield "message_delta", {"type": "message_delta", "delta": {"stop_reason": "end_turn", "stop_sequence": None},
+                                "usage": {"output_tokens": len(text.split())}}
+        yield "message_stop", {"type": "message_stop"}
+
+    @staticmethod
+    def _openai_body(request: dict, text: str) -> dict:
+        return {
+            "id": "chatcmpl-fake",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": request.get("model", "fake"),
+            "choices": [{
+                "index": 0,
+                "message": {"role": "assistant", "content": text},
+                "finish_reason": "stop",
+            }],
+            "usage": {"prompt_tokens": 0, "completion_tokens": len(text.split()), "total_tokens": 0},
+        }
+
+    @staticmethod
+    def _anthropic_body(request: dict, text: str) -> dict:
+        return {
+            "id": "msg_fake",
+            "type": "message",
+            "role": "assistant",
+            "model": request.get("model", "fake"),
+            "content": [{"type": "text", "text": text}],
+            "stop_reason": "end_turn",
+            "stop_sequence": None,
+            "usage": {"input_tokens": 0, "output_tokens": len(text.split())},
+        }
+
+
+class FakeLLMServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, latency: float = 0.0, host: str = "127.0.0.1", port: int = 0, chunk_delay: float = 0.0,
+                 capacity: int = 1_000_000, error_rate: float = 0.0, retry_after: float = 1.0,
+                 spike_rate: float = 0.0, spike_latency: float = 0.0):
+        super().__init__((host, port), FakeLLMHandler)
+        self.latency = latency
+        self.chunk_delay = chunk_delay
+        self.capacity = capacity
+        self.error_rate = error_rate
+        self.retry_after = retry_after
+        self.spike_rate = spike_rate
+        self.spike_latency = spike_latency
+        self.outage = False
+        self.lock = threading.Lock()
+        self.in_flight = 0
+        self.stats = self._new_stats()
+        self._thread = None
+
+    @staticmethod
+    def _new_stats() -> dict:
+        return {"requests": 0, "max_in_flight": 0, "rate_limited": 0, "unavailable": 0, "spikes": 0, "models": {}}
+
+    @property
+    def url(self) -> str:
+        return f"http://{self.server_address[0]}:{self.server_address[1]}"
+
+    def reset_stats(self):
+        with self.lock:
+            self.stats = self._new_stats()
+
+    def handle_error(self, request, client_address):
+        # Clients hang up on purpose (cancelled hedges, closed streams)
+        if not isinstance(sys.exc_info()[1], ConnectionError):
+            super().handle_error(request, client_address)
+
+    def __enter__(self):
+        self._thread = threading.Thread(target=self.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.shutdown()
+        self.server_close()
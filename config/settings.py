@@ -13,8 +13,8 @@ class Settings:
     DEFAULT_TOOL = "gmail"
     
     
-    CONTEXT_SIMILARITY_THRESHOLD = 0.3
+    CONTEXT_SIMILARITY_THRESHOLD = float(os.getenv("CONTEXT_SIMILARITY_THRESHOLD", "0.3"))
     
-    MAX_CONTEXT_ITEMS = 10
+    MAX_CONTEXT_ITEMS = int(os.getenv("MAX_CONTEXT_ITEMS", "10"))
     
     DRAFT_MAX_LENGTH = 1000
\ No newline at end of file
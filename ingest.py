@@ -0,0 +1,157 @@
+"""
+Offline bulk ingest: stream an mbox file or Maildir directory through the
+workflow (receive -> classify -> retrieve -> draft -> save).
+
+    python ingest.py ~/archive.mbox --batch-size 200 --concurrency 8 --parse-workers 4
+
+Messages are read in batches; while one batch runs through the workflow the
+next one is already being MIME-parsed in a process pool, so at most two
+batches are held in memory. Progress is checkpointed after every batch and
+an interrupted run picks up after the last completed batch (--restart to
+start over). Archived messages are deduplicated through the processed-message
+ledger like live mail, but their drafts are only saved locally, never
+uploaded to Gmail Drafts.
+"""
+import argparse
+import asyncio
+import contextlib
+import itertools
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Dict, List, Optional, Tuple
+
+sys.path.append(os.path.join(os.path.dirname(__file__), 'src'))
+
+from ai_agent.workflow import get_compiled_workflow, run_workflow_batch
+from ai_agent.tools.mail_archive import (
+    IngestCheckpoint, archive_kind, archive_size, iter_archive, parse_raw_messages
+)
+from ai_agent.utils.context_registry import get_context_registry
+from ai_agent.utils.llm_client import LLMClient
+from ai_agent.utils.metrics import get_metrics
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="AI Agent - bulk ingest of an mbox or Maildir archive")
+    parser.add_argument("archive", help="Path to an mbox file or a Maildir directory")
+    parser.add_argument("--batch-size", type=int, default=200,
+                        help="Messages read, parsed and classified together (default: 200)")
+    parser.add_argument("--concurrency", type=int, default=8,
+                        help="Max concurrent workflow runs (default: 8)")
+    parser.add_argument("--parse-workers", type=int, default=os.cpu_count() or 1,
+                        help="Processes used for MIME parsing (default: CPU count)")
+    parser.add_argument("--limit", type=int, default=None,
+                        help="Stop after this many messages")
+    parser.add_argument("--checkpoint", default=None,
+                        help="Checkpoint file (default: INGEST_CHECKPOINT_PATH or data/ingest_checkpoint.json)")
+    parser.add_argument("--restart", action="store_true",
+                        help="Ignore any saved checkpoint for this archive")
+    parser.add_argument("--verbose", action="store_true",
+                        help="Show the workflow's per-message output")
+
+    args = parser.parse_args()
+    await ingest_archive(args.archive, batch_size=args.batch_size, concurrency=args.concurrency,
+                         parse_workers=args.parse_workers, limit=args.limit,
+                         checkpoint=IngestCheckpoint(args.checkpoint), restart=args.restart,
+                         verbose=args.verbose)
+
+
+async def ingest_archive(archive: str, batch_size: int = 200, concurrency: int = 8, parse_workers: int = 1,
+                         limit: Optional[int] = None, checkpoint: Optional[IngestCheckpoint] = None,
+                         restart: bool = False, verbose: bool = False) -> Dict[str, int]:
+    checkpoint = checkpoint or IngestCheckpoint()
+    kind = archive_kind(archive)
+    total = archive_size(archive)
+
+    saved = None if restart else checkpoint.get(archive)
+    resume_token = saved["resume_token"] if saved else 0
+    done = saved["messages"] if saved else 0
+    counts: Dict[str, int] = dict(saved["counts"]) if saved else {}
+    if saved:
+        print(f"Resuming {archive} after {done} message(s) ({_progress(kind, resume_token, total)})")
+
+    get_compiled_workflow()
+    LLMClient()  # fail on a provider without an API key before reading the archive
+    get_context_registry().get()
+    metrics = get_metrics()
+    loop = asyncio.get_running_loop()
+    loop.set_default_executor(ThreadPoolExecutor(max_workers=concurrency + 4))
+
+    reader = iter_archive(archive, resume_token)
+    if limit is not None:
+        reader = itertools.islice(reader, limit)
+
+    started = time.perf_counter()
+    processed = 0
+    with ProcessPoolExecutor(max_workers=max(1, parse_workers)) as pool, open(os.devnull, "w") as devnull:
+        pending = await _read_and_parse(loop, pool, reader, batch_size, parse_workers)
+        while pending is not None:
+            batch_token, messages = pending
+            # Parse the next batch while this one runs through the workflow
+            next_batch = asyncio.ensure_future(_read_and_parse(loop, pool, reader, batch_size, parse_workers))
+
+            parsed = [message for message in messages if message is not None]
+            with contextlib.nullcontext() if verbose else contextlib.redirect_stdout(devnull):
+                final_states = await run_workflow_batch(parsed, concurrency=concurrency)
+
+            deferred = sum(1 for final_state in final_states if final_state and final_state.get("deferred"))
+            if deferred:
+                # Leave the checkpoint before this batch so a rerun picks the deferred messages up
+                next_batch.cancel()
+                print(f"LLM provider unavailable, {deferred} message(s) deferred; stopping. "
+                      f"Rerun to resume from this batch.")
+                break
+
+            for final_state in final_states:
+                action = final_state.get("action_type") if final_state else None
+                if final_state and final_state.get("duplicate"):
+                    key = "duplicate"  # already in the processed-message ledger
+                else:
+                    key = action.value if action is not None else "failed"
+                counts[key] = counts.get(key, 0) + 1
+            counts["unparseable"] = counts.get("unparseable", 0) + len(messages) - len(parsed)
+
+            processed += len(messages)
+            done += len(messages)
+            checkpoint.update(archive, batch_token, done, counts)
+            metrics.export_prometheus()
+
+            elapsed = time.perf_counter() - started
+            print(f"{done} message(s) ingested ({_progress(kind, batch_token, total)}), "
+                  f"{processed / elapsed:.1f} msg/s this run | "
+                  + ", ".join(f"{key}: {value}" for key, value in sorted(counts.items())))
+
+            pending = await next_batch
+
+    elapsed = time.perf_counter() - started
+    print(f"Done: {processed} message(s) in {elapsed:.1f}s "
+          f"({processed / elapsed if elapsed else 0:.1f} msg/s), {done} total for {archive}")
+    return counts
+
+
+async def _read_and_parse(loop: asyncio.AbstractEventLoop, pool: ProcessPoolExecutor, reader,
+                          batch_size: int, parse_workers: int) -> Optional[Tuple[int, List]]:
+    """Next (resume token after the batch, parsed messages), or None at the end of the archive"""
+    raw_batch = await asyncio.to_thread(lambda: list(itertools.islice(reader, batch_size)))
+    if not raw_batch:
+        return None
+
+    raws = [raw for _, raw in raw_batch]
+    chunk = max(1, -(-len(raws) // max(1, parse_workers)))
+    parsed_chunks = await asyncio.gather(*(
+        loop.run_in_executor(pool, parse_raw_messages, raws[i:i + chunk])
+        for i in range(0, len(raws), chunk)
+    ))
+    return raw_batch[-1][0], [message for parsed in parsed_chunks for message in parsed]
+
+
+def _progress(kind: str, resume_token: int, total: int) -> str:
+    if kind == "mbox":
+        return f"{resume_token / total:.1%} of {total / 1e6:.1f} MB" if total else "empty archive"
+    return f"{resume_token}/{total} files"
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
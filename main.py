@@ -1,99 +1,298 @@
 import asyncio
+import contextlib
 import sys
 import os
 import argparse
+import signal
 import threading
-import queue
 import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import AsyncIterator, Dict, Optional
 
 sys.path.append(os.path.join(os.path.dirname(__file__), 'src'))
 
-from ai_agent.workflow import run_workflow
+from ai_agent.workflow import get_compiled_workflow, run_workflow, run_workflow_batch
+from ai_agent.nodes.receive_message import set_gmail_session, commit_gmail_sync, fetch_new_gmail_messages
+from ai_agent.nodes.save_draft import get_draft_uploader
+from ai_agent.scheduler import Priority, SchedulerClosed, WorkScheduler
+from ai_agent.tools.gmail_imap_tool import GmailIMAPTool
+from ai_agent.tools.gmail_idle_session import GmailIdleSession
+from ai_agent.utils.header_rules import get_header_rules
+from ai_agent.utils.context_registry import get_context_registry
+from ai_agent.utils.llm_client import LLMClient
+from ai_agent.utils.message_ledger import get_message_ledger
+from ai_agent.utils.metrics import get_metrics
 
 
 async def main():
     parser = argparse.ArgumentParser(description="AI Agent - Multi-Purpose Assistant")
     parser.add_argument("--gmail-interval", type=int, default=60,
                        help=f"Gmail scraping interval in seconds (default: {60})")
+    parser.add_argument("--no-idle", action="store_true",
+                       help="Disable the persistent IMAP IDLE session and only poll on the interval")
+    parser.add_argument("--gmail-concurrency", type=int, default=4,
+                       help="Max concurrent Gmail workflow runs (default: 4)")
+    parser.add_argument("--cli-workers", type=int, default=1,
+                       help="Workers kept free for CLI commands while mail is processed (default: 1)")
+    parser.add_argument("--drain-timeout", type=float, default=30,
+                       help="Seconds to let queued and running work finish on shutdown (default: 30)")
     
     args = parser.parse_args()
-    await run_unified_daemon(args.gmail_interval)
+    await run_unified_daemon(args.gmail_interval, use_idle=not args.no_idle,
+                             gmail_concurrency=args.gmail_concurrency, cli_workers=args.cli_workers,
+                             drain_timeout=args.drain_timeout)
 
 
-async def run_unified_daemon(gmail_interval: int):
-    # Queue for CLI commands
-    cli_queue = queue.Queue()
+async def run_unified_daemon(gmail_interval: int, use_idle: bool = True, gmail_concurrency: int = 4,
+                             cli_workers: int = 1, drain_timeout: float = 30):
+    """Serve CLI commands from stdin and Gmail from IDLE pushes / the poll interval until stopped.
     
-    # Start CLI input thread
-    cli_thread = threading.Thread(target=cli_input_thread, args=(cli_queue,), daemon=True)
-    cli_thread.start()
+    Both feed one WorkScheduler: CLI commands run at interactive priority on
+    workers that mail can never fully occupy, so they start immediately even
+    behind a large Gmail backlog. Stopping ("quit", Ctrl+C or SIGTERM; EOF on
+    stdin only ends CLI input) lets the current Gmail batch and queued
+    commands finish for up to drain_timeout seconds.
+    """
+    # Build the graph and load the context store up front so the first message doesn't pay for them
+    get_compiled_workflow()
+    LLMClient()  # a provider without an API key stops the daemon here, not every message
+    context_registry = get_context_registry()
+    context_registry.get()
+    # Claimed by a daemon that died mid-run; the sync watermark never passed them, so they are fetched again
+    stale_claims = get_message_ledger().release_stale_claims(before=time.time())
+    if stale_claims:
+        print(f"Released {stale_claims} unfinished claim(s) from a previous run")
     
-    gmail_last_check = 0
+    loop = asyncio.get_running_loop()
+    metrics = get_metrics()
+    scheduler = WorkScheduler(workers=gmail_concurrency + max(1, cli_workers), max_background=gmail_concurrency)
+    # Sync nodes run on the default executor; make room for every concurrent run
+    loop.set_default_executor(ThreadPoolExecutor(max_workers=scheduler.workers + 4))
+    scheduler.start()
     
-    try:
+    stopping = asyncio.Event()
+    
+    def request_stop():
+        if not stopping.is_set():
+            print("\nStopping daemon, finishing queued work (Ctrl+C again to force)...")
+            stopping.set()
+        with contextlib.suppress(NotImplementedError, RuntimeError):
+            loop.remove_signal_handler(signal.SIGINT)  # a second Ctrl+C interrupts the drain
+    
+    for signum in (signal.SIGINT, signal.SIGTERM):
+        with contextlib.suppress(NotImplementedError, RuntimeError):
+            loop.add_signal_handler(signum, request_stop)
+    
+    # Set by the IDLE session when Gmail pushes new mail, and by the poll timer
+    gmail_wakeup = asyncio.Event()
+    gmail_notified_at = None
+    def on_new_mail(notified_at: float):
+        nonlocal gmail_notified_at
+        if gmail_notified_at is None:
+            gmail_notified_at = notified_at
+        gmail_wakeup.set()
+    
+    async def gmail_loop():
+        nonlocal gmail_notified_at
+        poll_timer = None
+        gmail_wakeup.set()  # check once at startup
         while True:
-            current_time = time.time()
-            
-            # Check for CLI commands (non-blocking)
+            await gmail_wakeup.wait()
+            if stopping.is_set():
+                return
+            gmail_wakeup.clear()
+            if poll_timer is not None:
+                poll_timer.cancel()
+            notified_at, gmail_notified_at = gmail_notified_at, None
+            await check_gmail(scheduler, context_registry, gmail_concurrency, notified_at)
+            poll_timer = loop.call_later(gmail_interval, gmail_wakeup.set)
+    
+    async def cli_loop():
+        async for line in read_stdin_lines():
+            command = line.strip()
+            if not command:
+                continue
+            if command.lower() in ['quit', 'exit', 'stop']:
+                request_stop()
+                return
             try:
-                while not cli_queue.empty():
-                    command = cli_queue.get_nowait()
-                    if command.lower().strip() in ['quit', 'exit', 'stop']:
-                        print("Stopping daemon...")
-                        return
-                    
-                    print(f"\nProcessing CLI command: {command[:50]}...")
-                    final_state = await run_workflow({"input_mode": "cli", "cli_command": command})
-                    await print_workflow_summary(final_state)
-                    
-            except queue.Empty:
-                pass
-            
-            # Check Gmail scraping interval
-            if current_time - gmail_last_check >= gmail_interval:
-                print(f"\nAuto-checking Gmail...")
-                try:
-                    final_state = await run_workflow({"input_mode": "gmail", "gmail_last_check": gmail_last_check})
-                    await print_workflow_summary(final_state)
-                except Exception as e:
-                    print(f"Gmail scraping error: {e}")
-                gmail_last_check = current_time
-            
-            
-            # Short sleep to prevent busy waiting
-            await asyncio.sleep(1)
-            
-    except KeyboardInterrupt:
+                scheduler.submit(Priority.INTERACTIVE, run_cli_command, command)
+            except SchedulerClosed:
+                return
+    
+    gmail_session = None
+    if use_idle:
+        gmail_session = start_gmail_session(loop, on_new_mail)
+    
+    gmail_task = asyncio.create_task(gmail_loop())
+    cli_task = asyncio.create_task(cli_loop())
+    try:
+        await stopping.wait()
+    except asyncio.CancelledError:
         print("\nDaemon stopped by Ctrl+C")
+    finally:
+        stopping.set()  # also on cancellation, so the woken gmail_loop exits instead of checking again
+        cli_task.cancel()
+        gmail_wakeup.set()
+        started = time.monotonic()
+        # Let the Gmail batch in progress finish, then whatever is still queued
+        _, unfinished = await asyncio.wait([gmail_task], timeout=drain_timeout)
+        for task in unfinished:
+            task.cancel()
+        remaining = max(0.0, drain_timeout - (time.monotonic() - started))
+        if not await scheduler.drain(timeout=remaining) or unfinished:
+            print(f"Drain timed out after {drain_timeout:.0f}s; unfinished work was cancelled")
+        
+        # Upload queued drafts while the session's connection is still open
+        uploader = get_draft_uploader()
+        if uploader is not None:
+            uploader.flush()
+        metrics.export_prometheus()
+        if gmail_session:
+            set_gmail_session(None)
+            gmail_session.stop()
+
+
+async def run_cli_command(command: str):
+    print(f"\nProcessing CLI command: {command[:50]}...")
+    try:
+        final_state = await run_workflow({"input_mode": "cli", "cli_command": command})
+        await print_workflow_summary(final_state)
+    except Exception as e:
+        print(f"CLI command failed: {e}")
+    get_metrics().export_prometheus()
 
 
-def cli_input_thread(cli_queue):
-    """Thread function to handle CLI input non-blocking"""
-    while True:
-        try:
-            command = input()
-            if command.strip():
-                cli_queue.put(command.strip())
-        except (EOFError, KeyboardInterrupt):
-            break
+async def check_gmail(scheduler: WorkScheduler, context_registry, gmail_concurrency: int,
+                      notified_at: Optional[float] = None):
+    """One Gmail cycle: fetch everything new and run it through the scheduler at background priority.
+    
+    The sync watermark only moves once the batch is through, and stays below
+    messages the LLM provider couldn't serve: they are still unread and
+    unclaimed, so the next cycle (or the next daemon, after a restart or a
+    crash mid-batch) fetches them again.
+    """
+    print(f"\nAuto-checking Gmail...")
+    try:
+        # Pick up edited context documents before drafting against them
+        await asyncio.to_thread(context_registry.reload_if_changed)
+        
+        # Drain everything new in one poll, then fan out
+        messages, sync_point = await asyncio.to_thread(fetch_new_gmail_messages)
+        if not messages:
+            await asyncio.to_thread(commit_gmail_sync, sync_point)
+            return
+        started = time.time()
+        finished_at: Dict[int, float] = {}  # by id() of the final state
+        
+        async def run_in_background(state):
+            final_state = await scheduler.run(Priority.BACKGROUND, run_workflow, state)
+            finished_at[id(final_state)] = time.time()
+            return final_state
+        
+        final_states = await run_workflow_batch(messages, concurrency=gmail_concurrency, runner=run_in_background)
+        deferred = [message for message, final_state in zip(messages, final_states) if final_state.get("deferred")]
+        await asyncio.to_thread(commit_gmail_sync, sync_point, deferred)
+        if deferred:
+            print(f"{len(deferred)} message(s) deferred until the LLM provider is available again")
+        for final_state in final_states:
+            # Each message's own draft time; runs that didn't finish have none
+            finished = finished_at.get(id(final_state))
+            latency = finished - notified_at if notified_at and finished else None
+            await print_workflow_summary(final_state, notification_latency=latency)
+        elapsed = time.time() - started
+        print(f"Processed {len(messages)} Gmail message(s) in {elapsed:.2f}s "
+              f"({len(messages) / elapsed * 60:.1f} messages/min)")
+        prefilter = get_header_rules().report()
+        print(f"Header pre-classifier: skipped {prefilter['skipped']}/{prefilter['checked']} "
+              f"({prefilter['skip_ratio']:.0%}), "
+              f"~{prefilter['latency_saved_seconds']:.1f}s LLM latency saved")
+        get_metrics().export_prometheus()
+    except Exception as e:
+        print(f"Gmail scraping error: {e}")
 
 
-async def print_workflow_summary(final_state):
+def start_gmail_session(loop: asyncio.AbstractEventLoop, on_new_mail):
+    """Open the daemon's long-lived IMAP IDLE session if Gmail credentials are configured"""
+    imap_tool = GmailIMAPTool.from_env()
+    if imap_tool is None:
+        return None
+    
+    session = GmailIdleSession(imap_tool)
+    session.start(lambda notified_at: loop.call_soon_threadsafe(on_new_mail, notified_at))
+    set_gmail_session(session)
+    print("Gmail IDLE session started")
+    return session
+
+
+async def read_stdin_lines() -> AsyncIterator[str]:
+    """Lines typed on stdin, read by the event loop; ends at EOF"""
+    loop = asyncio.get_running_loop()
+    reader = asyncio.StreamReader()
+    try:
+        transport, _ = await loop.connect_read_pipe(lambda: asyncio.StreamReaderProtocol(reader), sys.stdin)
+    except (ValueError, OSError, NotImplementedError):
+        # Regular files (and Windows consoles) can't be watched by the loop
+        async for line in _read_stdin_in_thread(loop):
+            yield line
+        return
+    try:
+        while True:
+            line = await reader.readline()
+            if not line:
+                return
+            yield line.decode(errors="replace")
+    finally:
+        transport.close()
+        with contextlib.suppress(OSError, ValueError):
+            os.set_blocking(sys.stdin.fileno(), True)  # connect_read_pipe left it non-blocking
+
+
+async def _read_stdin_in_thread(loop: asyncio.AbstractEventLoop) -> AsyncIterator[str]:
+    lines: asyncio.Queue = asyncio.Queue()
+    
+    def read():
+        for line in iter(sys.stdin.readline, ""):
+            loop.call_soon_threadsafe(lines.put_nowait, line)
+        loop.call_soon_threadsafe(lines.put_nowait, None)
+    
+    # A daemon thread, so a pending read doesn't hold up interpreter exit
+    threading.Thread(target=read, name="stdin-reader", daemon=True).start()
+    while (line := await lines.get()) is not None:
+        yield line
+
+
+async def print_workflow_summary(final_state, notification_latency=None):
     print("\n" + "="*50)
     print("WORKFLOW SUMMARY")
     print("="*50)
     
+    if final_state.get('duplicate'):
+        print("Skipped: message already processed")
+        print("="*50)
+        return
+    
+    if final_state.get('deferred'):
+        print("Deferred: LLM provider unavailable, will retry")
+        print("="*50)
+        return
+    
+    if final_state.get('failed'):
+        print("Failed: marked failed in the message ledger, not retried")
+        print("="*50)
+        return
+    
     if final_state.get('input_message'):
         msg = final_state['input_message']
-        print(f"Input type: {msg.get('input_type', 'unknown')}")
-        print(f"Source: {msg.get('source', 'unknown')}")
-        if msg.get('sender'):
-            print(f"From: {msg['sender']}")
-        if msg.get('subject'):
-            print(f"Subject: {msg['subject']}")
+        print(f"Input type: {msg.input_type.value}")
+        print(f"Source: {msg.source}")
+        if msg.sender:
+            print(f"From: {msg.sender}")
+        if msg.subject:
+            print(f"Subject: {msg.subject}")
     
     if final_state.get('action_type'):
-        print(f"Action: {final_state['action_type']}")
+        print(f"Action: {final_state['action_type'].value}")
         if final_state.get('action_confidence'):
             print(f"Confidence: {final_state['action_confidence']:.2f}")
     
@@ -107,6 +306,14 @@ async def print_workflow_summary(final_state):
         result = final_state['result']
         print(f"Generated: {result.get('type', 'unknown')} draft")
     
+    if final_state.get('draft_stats'):
+        stats = final_state['draft_stats']
+        print(f"Draft streaming: first token {stats['ttft_seconds']:.2f}s, "
+              f"{stats['tokens_per_sec']:.1f} tokens/s, {stats['total_seconds']:.2f}s total")
+    
+    if notification_latency is not None:
+        print(f"Notification-to-draft latency: {notification_latency:.2f}s")
+    
     print("="*50)
 
 
@@ -1,43 +1,87 @@
-from typing import Dict, Any
-from ..state import AgentState, ActionType, InputType
-from ..utils.llm_client import LLMClient
+import asyncio
+import re
+import time
+from typing import Dict, Any, List, Optional
+from ..state import WorkflowState, ActionType, InputType, Message
+from ..utils.llm_client import LLMClient, LLMUnavailableError
+from ..utils.header_rules import get_header_rules
+from .receive_message import EMAIL_SOURCES, fetch_gmail_bodies
 
+# Batch classification limits: rough prompt size (~4 chars per token) and per-email body cap
+BATCH_TOKEN_BUDGET = 3000
+BATCH_MAX_EMAILS = 50
+BATCH_BODY_CHARS = 1500
 
-def classify_action_node(state: Dict[str, Any]) -> Dict[str, Any]:
-    agent_state = AgentState.from_dict(state)
+_ACTION_RE = re.compile(r'(EMAIL_REPLY|NO_OP)\s*:\s*(\d*\.?\d+)', re.IGNORECASE)
+_BATCH_LINE_RE = re.compile(r'^\s*(\d+)\s*[:.)\-]\s*(EMAIL_REPLY|NO_OP)\s*:\s*(\d*\.?\d+)', re.IGNORECASE | re.MULTILINE)
+
+
+async def aclassify_action_node(state: WorkflowState) -> Dict[str, Any]:
+    message = state.get("input_message")
     
-    if not agent_state.input_message:
+    if not message:
         raise ValueError("No input message found in state")
     
-    message = agent_state.input_message
+    if state.get("action_type") is not None:
+        # Pre-classified as part of a batch
+        return {}
     
     # Direct routing for automatic scraped messages
-    if message.source == "gmail":
-        action_type, confidence = _classify_scraped_action(message)
+    if message.source in EMAIL_SOURCES:
+        action_type, confidence = await _aclassify_scraped_action(message)
     elif message.source == "cli":
-        action_type, confidence = _classify_user_command(message)
+        action_type, confidence = await _aclassify_user_command(message)
         print(f"Classified CLI command: {action_type.value} (confidence: {confidence:.2f})")
     else:
         action_type, confidence = ActionType.NO_OP, 1.0
-
-    
-    agent_state.action_type = action_type
-    agent_state.action_confidence = confidence
     
-    return agent_state.to_dict()
+    update = {"action_type": action_type, "action_confidence": confidence}
+    if action_type == ActionType.EMAIL_REPLY and message.body_part:
+        # Headers-first fetch: only mail that gets a reply pays for its body
+        update["input_message"] = (await asyncio.to_thread(fetch_gmail_bodies, [message]))[0]
+    return update
+
+
+async def _aclassify_scraped_action(message) -> tuple[ActionType, float]:
+    decision = _preclassify(message)
+    if decision:
+        return decision
+    return await _allm_classify_scraped_action(message)
+
+
+def _preclassify(message) -> Optional[tuple[ActionType, float]]:
+    decision = get_header_rules().classify(message)
+    if decision is None:
+        return None
+    action_type, confidence, reason = decision
+    print(f"Classified from headers ({reason}): {action_type.value}, skipping LLM")
+    return action_type, confidence
 
 
-def _classify_scraped_action(message) -> tuple[ActionType, float]:
+async def _allm_classify_scraped_action(message) -> tuple[ActionType, float]:
     llm_client = LLMClient()
     
-    prompt = f"""
+    try:
+        started = time.perf_counter()
+        response = await llm_client.agenerate_response(_scraped_action_prompt(message), cache_namespace="classification")
+        get_header_rules().record_llm_latency(time.perf_counter() - started)
+        return _parse_scraped_action(response)
+    except LLMUnavailableError:
+        raise
+    except Exception as e:
+        print(f"LLM classification failed: {e}, falling back to rules")
+        return ActionType.NO_OP, 1.0
+
+
+def _scraped_action_prompt(message) -> str:
+    return f"""
         Analyze this email and classify the required action.
         Return only the action type and confidence score.
 
         EMAIL:
         From: {message.sender}
         Subject: {message.subject}
-        Body: {message.body}
+        Body: {_prompt_body(message)}
 
         ACTIONS:
         - EMAIL_REPLY: Email requires a substantive response
@@ -47,29 +91,142 @@ def _classify_scraped_action(message) -> tuple[ActionType, float]:
         Example: EMAIL_REPLY:0.95
         Response:
         """
+
+
+def _parse_scraped_action(response: str) -> tuple[ActionType, float]:
+    match = _ACTION_RE.search(response)
+    if match:
+        return _to_action(match.group(1), match.group(2))
+    
+    if "EMAIL_REPLY" in response.upper():
+        return ActionType.EMAIL_REPLY, 0.9
+    else:
+        return ActionType.NO_OP, 1.0
+
+
+def _to_action(label: str, confidence: str) -> tuple[ActionType, float]:
+    action_type = ActionType.EMAIL_REPLY if label.upper() == "EMAIL_REPLY" else ActionType.NO_OP
+    return action_type, min(max(float(confidence), 0.0), 1.0)
+
+
+async def aclassify_scraped_batch(messages: List[Message]) -> List[tuple[ActionType, float]]:
+    """Classify many emails with one LLM call per token-budgeted batch, batches sent concurrently.
+    
+    Results are aligned with `messages`. Messages decided by the header rules
+    never reach the LLM; entries missing from or unparseable in the batch
+    response are classified individually.
+    """
+    llm_client = LLMClient()
+    results: List[Optional[tuple[ActionType, float]]] = [_preclassify(message) for message in messages]
+    pending = [index for index, result in enumerate(results) if result is None]
+    
+    async def classify_batch(indexes: List[int]):
+        try:
+            started = time.perf_counter()
+            response = await llm_client.agenerate_response(
+                _batch_prompt([messages[i] for i in indexes]), cache_namespace="classification"
+            )
+            get_header_rules().record_llm_latency(time.perf_counter() - started, len(indexes))
+            parsed = _parse_batch_response(response, len(indexes))
+        except LLMUnavailableError:
+            raise
+        except Exception as e:
+            print(f"Batch classification failed: {e}, classifying individually")
+            parsed = {}
+        
+        for position, index in enumerate(indexes):
+            results[index] = parsed.get(position)
+        missing = [index for index in indexes if results[index] is None]
+        fallbacks = await asyncio.gather(*(_allm_classify_scraped_action(messages[index]) for index in missing))
+        for index, result in zip(missing, fallbacks):
+            results[index] = result
+    
+    await asyncio.gather(*(classify_batch(indexes) for indexes in _pack_batches(messages, pending)))
+    return results
+
+
+def _pack_batches(messages: List[Message], indexes: List[int]) -> List[List[int]]:
+    """Group message indexes so each batch prompt stays within BATCH_TOKEN_BUDGET"""
+    batches: List[List[int]] = []
+    current: List[int] = []
+    current_tokens = 0
+    
+    for index in indexes:
+        tokens = len(_batch_entry(0, messages[index])) // 4 + 1
+        if current and (current_tokens + tokens > BATCH_TOKEN_BUDGET or len(current) >= BATCH_MAX_EMAILS):
+            batches.append(current)
+            current, current_tokens = [], 0
+        current.append(index)
+        current_tokens += tokens
+    
+    if current:
+        batches.append(current)
+    return batches
+
+
+def _prompt_body(message: Message) -> str:
+    if message.body_part is not None:
+        return "(not downloaded; classify from the sender and subject)"
+    return message.body
+
+
+def _batch_entry(number: int, message: Message) -> str:
+    body = _prompt_body(message)[:BATCH_BODY_CHARS]
+    return f"EMAIL {number}:\nFrom: {message.sender}\nSubject: {message.subject}\nBody: {body}\n"
+
+
+def _batch_prompt(messages: List[Message]) -> str:
+    emails = "\n".join(_batch_entry(number, message) for number, message in enumerate(messages, 1))
+    return f"""
+        Analyze each email below and classify the required action.
+        Return exactly one line per email and nothing else.
+
+        {emails}
+        ACTIONS:
+        - EMAIL_REPLY: Email requires a substantive response
+        - NO_OP: Newsletters, notifications, spam, or emails that don't need replies
+
+        Return format, one line per email: EMAIL_NUMBER: ACTION_TYPE:CONFIDENCE_SCORE
+        Example:
+        1: EMAIL_REPLY:0.95
+        2: NO_OP:0.80
+        Response:
+        """
+
+
+def _parse_batch_response(response: str, count: int) -> Dict[int, tuple[ActionType, float]]:
+    """Map 0-based batch positions to results; positions not found are left out"""
+    parsed = {}
+    for match in _BATCH_LINE_RE.finditer(response):
+        position = int(match.group(1)) - 1
+        if 0 <= position < count and position not in parsed:
+            parsed[position] = _to_action(match.group(2), match.group(3))
+    return parsed
+
+
+# todo
+async def _aclassify_user_command(message) -> tuple[ActionType, float]:
+    llm_client = LLMClient()
+    print(message)
     
     try:
-        response = llm_client.generate_response(prompt)
+        response = await llm_client.agenerate_response(_user_command_prompt(message), cache_namespace="classification")
         
-        if "EMAIL_REPLY" in response.upper():
-            return ActionType.EMAIL_REPLY, 0.9
-        else:
-            return ActionType.NO_OP, 1.0
+        return ActionType.NO_OP, 1.0
+    except LLMUnavailableError:
+        raise
     except Exception as e:
         print(f"LLM classification failed: {e}, falling back to rules")
         return ActionType.NO_OP, 1.0
 
 
-# todo
-def _classify_user_command(message) -> tuple[ActionType, float]:
-    llm_client = LLMClient()
-    print(message)
-    prompt = f"""
+def _user_command_prompt(message) -> str:
+    return f"""
         Analyze this command and classify the required action.
         Return only the action type and confidence score.
 
         Command:
-        {message}
+        {message.body}
 
         ACTIONS:
         - SETUP_CALENDAR_INVITE: Setup calendar invite
@@ -79,14 +236,3 @@ def _classify_user_command(message) -> tuple[ActionType, float]:
         Example: SETUP_CALENDAR_INVITE:0.95
         Response:
         """
-    
-    try:
-        response = llm_client.generate_response(prompt)
-        
-        return ActionType.NO_OP, 1.0
-    except Exception as e:
-        print(f"LLM classification failed: {e}, falling back to rules")
-        return ActionType.NO_OP, 1.0
-    
-    
-    
\ No newline at end of file
@@ -1,25 +1,26 @@
 from typing import Dict, Any
-from ..state import AgentState
+from ..state import WorkflowState
 from ..utils.llm_client import LLMClient
 
 
-def generate_draft_node(state: Dict[str, Any]) -> Dict[str, Any]:
-    agent_state = AgentState.from_dict(state)
+def generate_draft_node(state: WorkflowState) -> Dict[str, Any]:
+    message = state.get("input_message")
     
-    if not agent_state.input_message:
+    if not message:
         raise ValueError("No input message found in state")
     
     llm_client = LLMClient()
     
-    context_text = "\n".join(agent_state.retrieved_context) if agent_state.retrieved_context else ""
+    retrieved_context = state.get("retrieved_context")
+    context_text = "\n".join(retrieved_context) if retrieved_context else ""
     
     prompt = f"""
 You are a professional customer support representative. Generate a polite, formal email reply based on the following:
 
 ORIGINAL MESSAGE:
-From: {agent_state.input_message.sender}
-Subject: {agent_state.input_message.subject}
-Body: {agent_state.input_message.body}
+From: {message.sender}
+Subject: {message.subject}
+Body: {message.body}
 
 RELEVANT CONTEXT:
 {context_text}
@@ -34,9 +35,8 @@ Instructions:
 Generate only the email body (do not include headers like To:, From:, Subject:):
 """
     
-    draft_reply = llm_client.generate_response(prompt)
-    agent_state.draft_reply = draft_reply
+    draft_reply = llm_client.generate_response(prompt, cache_namespace="draft")
     
     print("✍️ Generated draft reply using LLM")
     
-    return agent_state.to_dict()
\ No newline at end of file
+    return {"draft_reply": draft_reply}
\ No newline at end of file
@@ -1,19 +1,28 @@
 from typing import Dict, Any
-from ..state import AgentState, ActionType
-from ..utils.llm_client import LLMClient
+from ..state import WorkflowState, ActionType
+from ..utils.llm_client import LLMClient, acollect_stream, echo_chunk
 
 
-def gmail_draft_node(state: Dict[str, Any]) -> Dict[str, Any]:
-    agent_state = AgentState.from_dict(state)
+async def agmail_draft_node(state: WorkflowState) -> Dict[str, Any]:
+    message = state.get("input_message")
     
-    if not agent_state.input_message:
+    if not message:
         raise ValueError("No input message found in state")
     
     llm_client = LLMClient()
-    message = agent_state.input_message
-    context_text = "\n".join(agent_state.retrieved_context or [])
+    on_chunk = _stream_sink(state)
+    draft_body, stream_stats = await acollect_stream(
+        llm_client.astream_response(_draft_prompt(state), cache_namespace="draft"), on_chunk
+    )
     
-    prompt = f"""
+    return _draft_update(message, draft_body, stream_stats, streamed=on_chunk is not None)
+
+
+def _draft_prompt(state: WorkflowState) -> str:
+    message = state["input_message"]
+    context_text = "\n".join(state.get("retrieved_context") or [])
+    
+    return f"""
 You are a software developer. Generate a polite, concise, formal email reply.
 
 ORIGINAL MESSAGE:
@@ -32,20 +41,31 @@ Instructions:
 
 Generate only the email body:
 """
-    
-    draft_body = llm_client.generate_response(prompt)
+
+
+def _stream_sink(state: WorkflowState):
+    """Echo chunks live for CLI runs; concurrent Gmail runs would interleave on stdout"""
+    if state.get("input_mode") != "cli":
+        return None
+    print("Drafting reply:")
+    return echo_chunk
+
+
+def _draft_update(message, draft_body: str, stream_stats: Dict[str, float], streamed: bool) -> Dict[str, Any]:
+    if streamed:
+        print()
     
     draft_result = {
         "type": "email",
         "to": message.sender,
         "subject": f"Re: {message.subject}",
         "body": draft_body,
-        "original_message_id": getattr(message, 'message_id', None)
+        "original_message_id": message.message_id,
+        "references": message.headers.get("References"),
+        "streamed": streamed
     }
     
-    agent_state.result = draft_result
-    agent_state.tool = "gmail"
-    
-    print("Generated Gmail draft reply")
+    print(f"Generated Gmail draft reply (first token {stream_stats['ttft_seconds']:.2f}s, "
+          f"{stream_stats['tokens_per_sec']:.1f} tokens/s)")
     
-    return agent_state.to_dict()
\ No newline at end of file
+    return {"result": draft_result, "tool": "gmail", "draft_stats": stream_stats}
\ No newline at end of file
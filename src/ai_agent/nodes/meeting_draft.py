@@ -1,24 +1,32 @@
 from typing import Dict, Any
 import re
 from datetime import datetime, timedelta
-from ..state import AgentState
-from ..utils.llm_client import LLMClient
+from ..state import WorkflowState
+from ..utils.llm_client import LLMClient, acollect_stream, echo_chunk
 
 
-def meeting_draft_node(state: Dict[str, Any]) -> Dict[str, Any]:
-    agent_state = AgentState.from_dict(state)
+async def ameeting_draft_node(state: WorkflowState) -> Dict[str, Any]:
+    message = state.get("input_message")
     
-    if not agent_state.input_message:
+    if not message:
         raise ValueError("No input message found in state")
     
-    message = agent_state.input_message
-    context_text = "\n".join(agent_state.retrieved_context or [])
-    
     meeting_details = _extract_meeting_details(message.body)
     
     llm_client = LLMClient()
+    on_chunk = _stream_sink(state)
+    meeting_content, stream_stats = await acollect_stream(
+        llm_client.astream_response(_meeting_prompt(state, meeting_details), cache_namespace="draft"), on_chunk
+    )
     
-    prompt = f"""
+    return _meeting_update(meeting_details, meeting_content, stream_stats, streamed=on_chunk is not None)
+
+
+def _meeting_prompt(state: WorkflowState, meeting_details: Dict[str, Any]) -> str:
+    message = state["input_message"]
+    context_text = "\n".join(state.get("retrieved_context") or [])
+    
+    return f"""
 Based on this meeting request, generate a structured meeting invitation.
 
 REQUEST: {message.body}
@@ -40,8 +48,20 @@ Generate:
 
 Format as professional meeting invitation content:
 """
-    
-    meeting_content = llm_client.generate_response(prompt)
+
+
+def _stream_sink(state: WorkflowState):
+    """Echo chunks live for CLI runs; concurrent Gmail runs would interleave on stdout"""
+    if state.get("input_mode") != "cli":
+        return None
+    print("Drafting meeting invitation:")
+    return echo_chunk
+
+
+def _meeting_update(meeting_details: Dict[str, Any], meeting_content: str, stream_stats: Dict[str, float],
+                    streamed: bool) -> Dict[str, Any]:
+    if streamed:
+        print()
     
     draft_result = {
         "type": "meeting",
@@ -50,15 +70,14 @@ Format as professional meeting invitation content:
         "proposed_time": meeting_details.get('time'),
         "duration": meeting_details.get('duration', '30 minutes'),
         "description": meeting_content,
-        "location": "TBD - Will send calendar invite"
+        "location": "TBD - Will send calendar invite",
+        "streamed": streamed
     }
     
-    agent_state.result = draft_result
-    agent_state.tool = "calendar"
-    
-    print("Generated meeting invitation draft")
+    print(f"Generated meeting invitation draft (first token {stream_stats['ttft_seconds']:.2f}s, "
+          f"{stream_stats['tokens_per_sec']:.1f} tokens/s)")
     
-    return agent_state.to_dict()
+    return {"result": draft_result, "tool": "calendar", "draft_stats": stream_stats}
 
 
 def _extract_meeting_details(command_text: str) -> Dict[str, Any]:
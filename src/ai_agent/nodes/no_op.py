@@ -1,11 +1,9 @@
 from typing import Dict, Any
-from ..state import AgentState
+from ..state import WorkflowState
 
 
-def no_op_node(state: Dict[str, Any]) -> Dict[str, Any]:
-    agent_state = AgentState.from_dict(state)
-    
-    agent_state.result = {
+def no_op_node(state: WorkflowState) -> Dict[str, Any]:
+    result = {
         "type": "no_op",
         "message": "No action required for this input",
         "reason": "Not classified as any action"
@@ -13,4 +11,4 @@ def no_op_node(state: Dict[str, Any]) -> Dict[str, Any]:
     
     print("No action required - message classified as NO_OP")
     
-    return agent_state.to_dict()
\ No newline at end of file
+    return {"result": result}
\ No newline at end of file
@@ -1,19 +1,39 @@
-from typing import Dict, Any, Optional
+from typing import Dict, Any, Iterable, Iterator, List, Optional, Tuple
 import sys
-import os
+from contextlib import contextmanager
 from datetime import datetime
-from ..state import AgentState, Message, InputType
+from ..state import WorkflowState, Message, InputType
 from ..tools.gmail_imap_tool import GmailIMAPTool
+from ..tools.gmail_idle_session import GmailIdleSession
+from ..tools.mailbox_sync import MailboxSyncState, SyncPoint
+from ..utils.message_ledger import get_message_ledger
 
+# Daemon-owned IMAP session; when set, Gmail polls reuse its connection
+_gmail_session: Optional[GmailIdleSession] = None
 
-def receive_message_node(state: Dict[str, Any]) -> Dict[str, Any]:
-    agent_state = AgentState.from_dict(state)
-    
+# Persisted UID watermarks, loaded on first Gmail poll
+_sync_state: Optional[MailboxSyncState] = None
+
+
+def set_gmail_session(session: Optional[GmailIdleSession]):
+    global _gmail_session
+    _gmail_session = session
+
+
+def _get_sync_state() -> MailboxSyncState:
+    global _sync_state
+    if _sync_state is None:
+        _sync_state = MailboxSyncState()
+    return _sync_state
+
+
+def receive_message_node(state: WorkflowState) -> Optional[Dict[str, Any]]:
     input_mode = state.get("input_mode", "mock")
     cli_command = state.get("cli_command")  # For daemon-provided CLI commands
     
     if input_mode == "gmail":
-        message = _scrape_gmail_messages()
+        # Fetched by run_workflow, or by the daemon as part of a batch
+        message = state.get("gmail_message")
         if message is None:
             print("No new messages found - stopping workflow")
             return None  # This will stop the workflow execution
@@ -22,7 +42,10 @@ def receive_message_node(state: Dict[str, Any]) -> Dict[str, Any]:
     elif input_mode == "cli":
         message = _receive_cli_command(cli_command)
     
-    agent_state.input_message = message
+    # At most one workflow run per email, across polls and restarts
+    if is_ledgered(message) and not get_message_ledger().claim(message.message_id):
+        print(f"Already processed {message.message_id} - skipping")
+        return {"duplicate": True}
     
     print(f"Received {message.input_type.value}: {message.source}")
     if message.sender:
@@ -31,40 +54,113 @@ def receive_message_node(state: Dict[str, Any]) -> Dict[str, Any]:
         print(f"Subject: {message.subject}")
     print(f"Content preview: {message.body[:100]}...")
     
-    return agent_state.to_dict()
+    return {"input_message": message}
+
 
+# Real emails: live Gmail, and offline archives read by ingest.py
+EMAIL_SOURCES = ("gmail", "archive")
 
-def _scrape_gmail_messages() -> Optional[Message]:
+
+def is_ledgered(message: Message) -> bool:
+    """Fetched or archived emails with a Message-ID go through the processed-message ledger"""
+    return message.source in EMAIL_SOURCES and bool(message.message_id)
+
+
+def fetch_new_gmail_messages(max_count: Optional[int] = None) -> Tuple[List[Message], Optional[SyncPoint]]:
+    """Fetch all Gmail messages that arrived since the last sync (up to max_count).
+    
+    The sync watermark is not moved: pass the returned SyncPoint to
+    commit_gmail_sync once the messages have been handled.
+    """
     print("Scraping Gmail for new messages...")
     
+    if _gmail_session is not None:
+        try:
+            with _gmail_session.connection() as imap_tool:
+                messages, sync_point = imap_tool.get_new_messages(_get_sync_state(), max_count=max_count)
+            _report_fetched(messages)
+            return messages, sync_point
+        except Exception as e:
+            print(f"IMAP session fetch failed: {e}")
+            return [], None
+    
     # Try IMAP method first (simpler for users)
-    gmail_email = os.getenv('GMAIL_EMAIL')
-    gmail_app_password = os.getenv('GMAIL_APP_PASSWORD')
+    imap_tool = GmailIMAPTool.from_env()
     
-    if gmail_email and gmail_app_password:
+    if imap_tool:
         try:
             print("Using Gmail IMAP (app password method)...")
-            imap_tool = GmailIMAPTool(gmail_email, gmail_app_password)
-            messages = imap_tool.get_unread_messages(max_count=1)
-            latest_message = messages[0] if messages else None
-            
-            if latest_message:
-                print(f"Found new message from: {latest_message.sender}")
-                imap_tool.disconnect()
-                return latest_message
-            else:
-                print("No unread messages found via IMAP")
-                imap_tool.disconnect()
-                return None
+            messages, sync_point = imap_tool.get_new_messages(_get_sync_state(), max_count=max_count)
+            imap_tool.disconnect()
+            _report_fetched(messages)
+            return messages, sync_point
                 
         except Exception as e:
             print(f"IMAP method failed: {e}")
     
     print("No Gmail credentials configured or no messages found")
-    return None
+    return [], None
+
+
+def commit_gmail_sync(sync_point: Optional[SyncPoint], unfinished: Iterable[Message] = ()):
+    """Move the sync watermark past the fetched messages, except those in unfinished (to be fetched again)"""
+    if sync_point is not None:
+        _get_sync_state().commit(sync_point, [message.imap_uid for message in unfinished])
+
+
+def fetch_gmail_bodies(messages: List[Message]) -> List[Message]:
+    """Download the text part of messages received headers-first (GMAIL_FETCH_MODE=two_phase).
+    
+    Messages that already have their body are returned unchanged, in input order.
+    """
+    if not any(message.body_part for message in messages):
+        return messages
+    
+    if _gmail_session is not None:
+        try:
+            with _gmail_session.connection() as imap_tool:
+                return imap_tool.fetch_bodies(messages)
+        except Exception as e:
+            print(f"IMAP session body fetch failed: {e}")
+            return messages
     
+    mailbox = next(message.body_part for message in messages if message.body_part).get("mailbox", "INBOX")
+    imap_tool = GmailIMAPTool.from_env()
+    if imap_tool and imap_tool.ensure_connected(mailbox):
+        try:
+            return imap_tool.fetch_bodies(messages)
+        except Exception as e:
+            print(f"IMAP body fetch failed: {e}")
+        finally:
+            imap_tool.disconnect()
+    return messages
 
 
+@contextmanager
+def gmail_connection() -> Iterator[Optional[GmailIMAPTool]]:
+    """The daemon session's connection, else a short-lived one from env (None if not configured)"""
+    if _gmail_session is not None:
+        with _gmail_session.connection() as imap_tool:
+            yield imap_tool
+        return
+    
+    imap_tool = GmailIMAPTool.from_env()
+    if not (imap_tool and imap_tool.ensure_connected()):
+        yield None
+        return
+    try:
+        yield imap_tool
+    finally:
+        imap_tool.disconnect()
+
+
+def _report_fetched(messages: List[Message]):
+    if messages:
+        print(f"Found {len(messages)} new message(s), latest from: {messages[-1].sender}")
+    else:
+        print("No unread messages found via IMAP")
+    
+
 def _scrape_slack_messages() -> Message:
     print("Scraping Slack for new mentions/DMs...")
     
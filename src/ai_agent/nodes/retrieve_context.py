@@ -1,42 +1,49 @@
 from typing import Dict, Any
-import sys
-import os
-sys.path.append(os.path.join(os.path.dirname(__file__), '../../..'))
+from ..state import WorkflowState, ActionType, Message
+from ..utils.context_registry import get_context_registry
+from ..utils.retrieval import BM25Index
 
-from data.context_store import MockContextStore
-from ..state import AgentState, ActionType
 
-
-def retrieve_context_node(state: Dict[str, Any]) -> Dict[str, Any]:
-    agent_state = AgentState.from_dict(state)
+def retrieve_context_node(state: WorkflowState) -> Dict[str, Any]:
+    message = state.get("input_message")
+    action_type = state.get("action_type")
     
-    if not agent_state.input_message or not agent_state.action_type:
+    if not message or not action_type:
         raise ValueError("Missing input message or action type in state")
     
-    if agent_state.action_type == ActionType.NO_OP:
-        agent_state.retrieved_context = []
+    if action_type == ActionType.NO_OP:
         print("Skipping context retrieval for NO_OP action")
-        return agent_state.to_dict()
-    
-    context_store = MockContextStore()
-    
-    search_text = _build_search_query(agent_state)
-    relevant_contexts = context_store.fuzzy_search(search_text, action_type=agent_state.action_type)
-    
-    agent_state.retrieved_context = relevant_contexts
-    
-    print(f"Retrieved {len(relevant_contexts)} context items for {agent_state.action_type.value}:")
-    for i, context in enumerate(relevant_contexts[:3], 1):
-        print(f"   {i}. {context[:80]}...")
-    
-    return agent_state.to_dict()
+        return {"retrieved_context": []}
+    
+    search_text = _build_search_query(message, action_type)
+    registry = get_context_registry()
+    store = registry.get()
+    
+    if isinstance(store, BM25Index):
+        passages = store.search(search_text, k=registry.max_items)
+        if passages:
+            # BM25 scores are unbounded, so the similarity threshold is taken relative to the best match
+            cutoff = passages[0].score * registry.threshold
+            passages = [passage for passage in passages if passage.score >= cutoff]
+        relevant_contexts = [passage.text for passage in passages]
+        print(f"Retrieved {len(passages)} passages for {action_type.value}:")
+        for i, passage in enumerate(passages[:3], 1):
+            print(f"   {i}. [{passage.score:.2f}] {passage.source}: {' '.join(passage.text.split())[:80]}...")
+    else:
+        relevant_contexts = store.fuzzy_search(
+            search_text, action_type=action_type, threshold=registry.threshold, max_items=registry.max_items
+        )
+        print(f"Retrieved {len(relevant_contexts)} context items for {action_type.value}:")
+        for i, context in enumerate(relevant_contexts[:3], 1):
+            print(f"   {i}. {context[:80]}...")
+    
+    return {"retrieved_context": relevant_contexts}
 
 
-def _build_search_query(agent_state: AgentState) -> str:
-    message = agent_state.input_message
+def _build_search_query(message: Message, action_type: ActionType) -> str:
     print(message)
     
-    if agent_state.action_type == ActionType.EMAIL_REPLY:
+    if action_type == ActionType.EMAIL_REPLY:
         return f"{message.subject or ''} {message.body}"
     else:
         return message.body
\ No newline at end of file
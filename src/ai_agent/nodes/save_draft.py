@@ -1,16 +1,25 @@
-from typing import Dict, Any
+from typing import Dict, Any, Optional
+import atexit
+import os
+import threading
 from datetime import datetime
-from ..state import AgentState
+from ..state import WorkflowState
+from ..tools.gmail_drafts import DraftUploader
+from ..utils.draft_store import get_draft_store
+from .receive_message import gmail_connection
 
+# Uploads email drafts to Gmail when GMAIL_UPLOAD_DRAFTS=1; created on first use
+_draft_uploader: Optional[DraftUploader] = None
+_draft_uploader_lock = threading.Lock()
 
-def save_draft_node(state: Dict[str, Any]) -> Dict[str, Any]:
-    agent_state = AgentState.from_dict(state)
+
+def save_draft_node(state: WorkflowState) -> Dict[str, Any]:
+    result = state.get("result")
     
-    if not agent_state.result:
+    if not result:
         raise ValueError("No result to save")
     
     timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-    result = agent_state.result
     
     print("\n" + "="*80)
     print("DRAFT GENERATED")
@@ -23,8 +32,12 @@ def save_draft_node(state: Dict[str, Any]) -> Dict[str, Any]:
         print(f"Generated: {timestamp}")
         print("-"*80)
         print("Body:")
-        print(result['body'])
-        _save_email_draft(result, timestamp)
+        print("(streamed above)" if result.get("streamed") else result['body'])
+        _store_draft(result)
+        uploader = get_draft_uploader()
+        if uploader is not None and state["input_message"].source == "gmail":
+            # Replies to archived mail (ingest.py) never reach the live mailbox
+            uploader.submit(result)
         
     elif result["type"] == "meeting":
         print(f"Type: Meeting Invitation")
@@ -35,8 +48,8 @@ def save_draft_node(state: Dict[str, Any]) -> Dict[str, Any]:
         print(f"Generated: {timestamp}")
         print("-"*80)
         print("Description:")
-        print(result['description'])
-        _save_meeting_draft(result, timestamp)
+        print("(streamed above)" if result.get("streamed") else result['description'])
+        _store_draft(result)
         
         
     elif result["type"] == "no_op":
@@ -45,39 +58,26 @@ def save_draft_node(state: Dict[str, Any]) -> Dict[str, Any]:
         print(f"Message: {result['message']}")
         
     print("="*80)
-    print("Draft saved successfully (simulated)")
     
-    return agent_state.to_dict()
+    return {}
 
 
-def _save_email_draft(result: Dict[str, Any], timestamp: str):
+def _store_draft(result: Dict[str, Any]):
     try:
-        filename = f"/Users/indresh.gupta/Documents/ai-agent-langgraph/data/email_draft_{timestamp.replace(':', '-').replace(' ', '_')}.txt"
-        with open(filename, "w") as f:
-            f.write(f"Type: Gmail Email\n")
-            f.write(f"To: {result['to']}\n")
-            f.write(f"Subject: {result['subject']}\n")
-            f.write(f"Generated: {timestamp}\n")
-            f.write("-"*40 + "\n")
-            f.write(result['body'])
-        print(f"Email draft saved to file")
+        draft_id = get_draft_store().save(result)
+        print(f"Draft saved as {draft_id}")
     except Exception as e:
-        print(f"Could not save email draft: {e}")
+        print(f"Could not save draft: {e}")
 
 
-def _save_meeting_draft(result: Dict[str, Any], timestamp: str):
-    try:
-        filename = f"/Users/indresh.gupta/Documents/ai-agent-langgraph/data/meeting_draft_{timestamp.replace(':', '-').replace(' ', '_')}.txt"
-        with open(filename, "w") as f:
-            f.write(f"Type: Meeting Invitation\n")
-            f.write(f"Title: {result['title']}\n")
-            f.write(f"Participants: {', '.join(result.get('participants', []))}\n")
-            f.write(f"Duration: {result.get('duration', 'TBD')}\n")
-            f.write(f"Proposed Time: {result.get('proposed_time', 'TBD')}\n")
-            f.write(f"Location: {result.get('location', 'TBD')}\n")
-            f.write(f"Generated: {timestamp}\n")
-            f.write("-"*40 + "\n")
-            f.write(result['description'])
-        print(f"Meeting draft saved to file")
-    except Exception as e:
-        print(f"Could not save meeting draft: {e}")
+def get_draft_uploader() -> Optional[DraftUploader]:
+    """Process-wide Gmail draft uploader, or None unless GMAIL_UPLOAD_DRAFTS is enabled; flushed at exit"""
+    global _draft_uploader
+    if os.getenv("GMAIL_UPLOAD_DRAFTS", "0").lower() not in ("1", "true", "yes"):
+        return None
+    if _draft_uploader is None:
+        with _draft_uploader_lock:
+            if _draft_uploader is None:
+                _draft_uploader = DraftUploader(gmail_connection)
+                atexit.register(_draft_uploader.close)
+    return _draft_uploader
@@ -0,0 +1,144 @@
+"""
+Priority work scheduler for the daemon.
+
+Jobs are coroutine functions queued with a priority; a fixed pool of worker
+tasks always takes the most urgent job first (FIFO within a priority).
+Background jobs may only occupy max_background workers at once, so at least
+one worker is always free for interactive work: a CLI command waits for a
+worker only while other CLI commands are running, never behind a mail
+backlog. drain() stops intake and lets queued and running jobs finish.
+"""
+import asyncio
+import heapq
+import itertools
+import time
+from enum import IntEnum
+from typing import Any, Awaitable, Callable, List, Optional, Tuple
+
+from .utils.metrics import get_metrics
+
+
+class Priority(IntEnum):
+    INTERACTIVE = 0  # CLI commands
+    BACKGROUND = 10  # Gmail workflow runs
+
+
+class SchedulerClosed(RuntimeError):
+    pass
+
+
+class WorkScheduler:
+    def __init__(self, workers: int = 5, max_background: Optional[int] = None):
+        self.workers = max(1, workers)
+        # Keep one worker for interactive jobs unless there is only one
+        self.max_background = max(1, min(self.workers - 1, max_background or self.workers - 1))
+        self._heap: List[Tuple[int, int, float, Callable[[], Awaitable[Any]], asyncio.Future]] = []
+        self._sequence = itertools.count()
+        # Set whenever a job is queued or finishes; workers and drain() re-check on it
+        self._changed: Optional[asyncio.Event] = None
+        self._tasks: List[asyncio.Task] = []
+        self._running = 0
+        self._background_running = 0
+        self._accepting = True
+
+    def start(self):
+        self._changed = asyncio.Event()
+        self._tasks = [asyncio.create_task(self._worker(), name=f"scheduler-worker-{index}")
+                       for index in range(self.workers)]
+
+    def submit(self, priority: Priority, job: Callable[..., Awaitable[Any]], *args) -> asyncio.Future:
+        """Queue job(*args) and return a future for its result"""
+        if not self._accepting:
+            raise SchedulerClosed("Scheduler is draining")
+        future = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._heap, (int(priority), next(self._sequence), time.perf_counter(),
+                                    lambda: job(*args), future))
+        self._report_depth(priority)
+        if self._changed is not None:
+            self._changed.set()
+        return future
+
+    async def run(self, priority: Priority, job: Callable[..., Awaitable[Any]], *args) -> Any:
+        """submit() and wait for the result"""
+        return await self.submit(priority, job, *args)
+
+    def pending(self, priority: Optional[Priority] = None) -> int:
+        return sum(1 for entry in self._heap if priority is None or entry[0] == priority)
+
+    @property
+    def running(self) -> int:
+        return self._running
+
+    async def drain(self, timeout: Optional[float] = None) -> bool:
+        """Stop accepting jobs, wait for queued and running ones, then stop the workers.
+
+        Returns False if the timeout cut the drain short; unfinished jobs are cancelled.
+        """
+        self._accepting = False
+        drained = True
+        if self._changed is not None:
+            try:
+                await asyncio.wait_for(self._wait_idle(), timeout)
+            except asyncio.TimeoutError:
+                drained = False
+        for _, _, _, _, future in self._heap:
+            future.cancel()
+        self._heap.clear()
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        return drained
+
+    async def _wait_idle(self):
+        while self._heap or self._running:
+            self._changed.clear()
+            await self._changed.wait()
+
+    def _take(self):
+        """Most urgent job a worker may start now, or None"""
+        if not self._heap:
+            return None
+        if self._heap[0][0] > Priority.INTERACTIVE and self._background_running >= self.max_background:
+            return None  # only interactive work may use the reserved worker, and none is queued
+        return heapq.heappop(self._heap)
+
+    async def _worker(self):
+        metrics = get_metrics()
+        while True:
+            entry = self._take()
+            if entry is None:
+                self._changed.clear()
+                await self._changed.wait()
+                continue
+
+            priority, _, queued_at, job, future = entry
+            background = priority > Priority.INTERACTIVE
+            self._running += 1
+            self._background_running += background
+            self._report_depth(priority)
+            metrics.observe("agent_queue_wait_seconds", time.perf_counter() - queued_at,
+                            queue="gmail" if background else "cli")
+            try:
+                if future.cancelled():
+                    continue
+                try:
+                    result = await job()
+                except asyncio.CancelledError:
+                    future.cancel()
+                    raise
+                except Exception as e:
+                    if not future.cancelled():
+                        future.set_exception(e)
+                else:
+                    if not future.cancelled():
+                        future.set_result(result)
+            finally:
+                self._running -= 1
+                self._background_running -= background
+                self._changed.set()
+
+    def _report_depth(self, priority: int):
+        # The gmail queue depth is reported by run_workflow_batch, which knows about thread ordering
+        if priority == Priority.INTERACTIVE:
+            get_metrics().set_gauge("agent_queue_depth", self.pending(priority), queue="cli")
@@ -1,5 +1,5 @@
 from re import S
-from typing import Dict, Any, Optional, List, Literal
+from typing import Dict, Any, Optional, List, Literal, TypedDict
 from pydantic import BaseModel, Field
 from enum import Enum
 
@@ -23,7 +23,36 @@ class Message(BaseModel):
     body: str
     timestamp: Optional[str] = None
     input_type: InputType = InputType.EMAIL
-    source: str = "gmail"  # gmail, cli, api
+    source: str = "gmail"  # gmail, archive (ingest.py), cli, api
+    headers: Dict[str, str] = Field(default_factory=dict)  # selected raw headers, e.g. List-Unsubscribe
+    message_id: Optional[str] = None  # RFC 5322 Message-ID, angle brackets included
+    imap_uid: Optional[int] = None
+    body_part: Optional[Dict[str, Any]] = None  # text part still on the server after a headers-first fetch
+
+
+class WorkflowState(TypedDict, total=False):
+    """LangGraph state schema.
+    
+    Values are stored as-is (no validation); nodes return only the keys they
+    change and LangGraph merges them into the running state.
+    """
+    # Inputs
+    input_mode: str
+    cli_command: Optional[str]
+    gmail_message: Optional[Message]
+    gmail_last_check: float
+    # Produced by nodes
+    input_message: Optional[Message]
+    duplicate: bool  # message was already claimed in the processed-message ledger
+    deferred: bool  # the LLM provider was unavailable; the message is left for a later run
+    failed: bool  # the run raised; the message is marked failed in the ledger and not retried
+    action_type: Optional[ActionType]
+    action_confidence: Optional[float]
+    tool: Optional[str]
+    retrieved_context: List[str]
+    draft_reply: Optional[str]
+    draft_stats: Optional[Dict[str, float]]
+    result: Optional[Dict[str, Any]]
 
 
 class AgentState(BaseModel):
@@ -0,0 +1,130 @@
+"""
+Upload generated email replies into Gmail's Drafts folder over IMAP.
+
+Each reply becomes an RFC 5322 message with In-Reply-To and References set
+from the original, so Gmail threads the draft under the conversation it
+answers. Uploads are batched like DraftStore commits: submit() queues the
+draft for a background thread, which takes everything queued so far and
+APPENDs it in one pipelined exchange over a borrowed connection (the
+daemon's IDLE session when there is one).
+"""
+import queue
+import threading
+from contextlib import AbstractContextManager
+from email.message import EmailMessage
+from email.utils import formatdate, make_msgid
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from ..utils.metrics import get_metrics
+
+
+def build_draft_message(result: Dict[str, Any], from_addr: str) -> bytes:
+    """RFC 5322 bytes for an email draft result, threaded onto the message it replies to"""
+    message = EmailMessage()
+    message["From"] = from_addr
+    message["To"] = result["to"]
+    message["Subject"] = result["subject"]
+    message["Date"] = formatdate(localtime=True)
+    message["Message-ID"] = make_msgid(domain=from_addr.rpartition("@")[2] or None)
+
+    original_id = result.get("original_message_id")
+    if original_id:
+        references = (result.get("references") or "").split()
+        if original_id not in references:
+            references.append(original_id)
+        message["In-Reply-To"] = original_id
+        message["References"] = " ".join(references)
+
+    message.set_content(result["body"])
+    return message.as_bytes()
+
+
+class DraftUploader:
+    def __init__(self, connection: Callable[[], AbstractContextManager], max_batch: int = 100):
+        """connection() yields a logged-in GmailIMAPTool, or None when Gmail is not configured"""
+        self.connection = connection
+        self.max_batch = max_batch
+        self.stats = {"uploaded": 0, "failed": 0, "batches": 0}
+        self._queue: "queue.Queue[Optional[Tuple[Optional[Dict[str, Any]], Optional[threading.Event]]]]" = queue.Queue()
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+        self._closed = False
+
+    def submit(self, result: Dict[str, Any]):
+        """Queue an email draft result for the next batched upload"""
+        if self._closed:
+            raise RuntimeError("Draft uploader is closed")
+        self._ensure_thread()
+        self._queue.put((result, None))
+
+    def flush(self):
+        """Block until every draft submitted so far has been uploaded (or has failed)"""
+        if self._thread is not None:
+            done = threading.Event()
+            self._queue.put((None, done))
+            done.wait()
+
+    def close(self):
+        if self._closed:
+            return
+        self.flush()
+        self._closed = True
+        if self._thread is not None:
+            self._queue.put(None)
+            self._thread.join()
+
+    def upload(self, results: List[Dict[str, Any]]) -> List[Optional[int]]:
+        """APPEND results as drafts now, in one pipelined exchange; returns their UIDs (None on failure)"""
+        if not results:
+            return []
+        metrics = get_metrics()
+        uids: List[Optional[int]] = [None] * len(results)
+        try:
+            with self.connection() as imap_tool:
+                if imap_tool is None or imap_tool.imap is None:
+                    raise ConnectionError("no Gmail connection")
+                raw_drafts = [build_draft_message(result, imap_tool.email) for result in results]
+                uids = imap_tool.append_messages(raw_drafts)
+        except Exception as e:
+            print(f"Could not upload {len(results)} draft(s) to Gmail: {e}")
+
+        uploaded = sum(uid is not None for uid in uids)
+        self.stats["uploaded"] += uploaded
+        self.stats["failed"] += len(uids) - uploaded
+        self.stats["batches"] += 1
+        metrics.inc("agent_gmail_drafts_total", uploaded, outcome="uploaded")
+        metrics.inc("agent_gmail_drafts_total", len(uids) - uploaded, outcome="failed")
+        return uids
+
+    def _ensure_thread(self):
+        if self._thread is None:
+            with self._lock:
+                if self._thread is None:
+                    self._thread = threading.Thread(target=self._run, name="gmail-draft-uploader", daemon=True)
+                    self._thread.start()
+
+    def _run(self):
+        while True:
+            entry = self._queue.get()
+            if entry is None:
+                return
+            # Everything already queued goes up in the same pipelined APPEND batch
+            batch = [entry]
+            while len(batch) < self.max_batch:
+                try:
+                    entry = self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                if entry is None:
+                    self._queue.put(None)
+                    break
+                batch.append(entry)
+
+            results = [result for result, _ in batch if result is not None]
+            uids = self.upload(results)
+            for result, uid in zip(results, uids):
+                if uid is not None:
+                    print(f"Draft uploaded to Gmail: {result['subject']}")
+            for _, done in batch:
+                if done is not None:
+                    done.set()
@@ -0,0 +1,86 @@
+"""
+Long-lived Gmail IMAP session that waits for new mail with IDLE.
+
+The daemon owns one session: a background thread keeps the connection logged
+in (NOOP keepalive, reconnect with backoff) and idles on INBOX, calling
+on_new_mail as soon as the server pushes new messages. Workflow runs borrow
+the same connection through connection() instead of logging in per poll.
+"""
+import threading
+import time
+from contextlib import contextmanager
+from typing import Callable, Iterator, Optional
+
+from .gmail_imap_tool import GmailIMAPTool
+
+
+class GmailIdleSession:
+    RECONNECT_DELAY = 5
+    MAX_RECONNECT_DELAY = 300
+
+    def __init__(self, tool: GmailIMAPTool, idle_timeout: Optional[float] = None):
+        self.tool = tool
+        self.idle_timeout = idle_timeout or GmailIMAPTool.IDLE_TIMEOUT
+        self._lock = threading.Lock()  # guards tool.imap
+        self._interrupt = threading.Event()  # set when a caller wants the connection
+        self._stop = threading.Event()
+        self._thread = None
+        self._on_new_mail = None
+
+    def start(self, on_new_mail: Callable[[float], None]):
+        """Start idling in a background thread; on_new_mail gets the notification time"""
+        self._on_new_mail = on_new_mail
+        self._thread = threading.Thread(target=self._run, name="gmail-idle", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._interrupt.set()
+        if self._thread:
+            self._thread.join(timeout=5)
+        with self._lock:
+            try:
+                self.tool.disconnect()
+            except Exception:
+                self.tool._drop_connection()
+
+    @contextmanager
+    def connection(self) -> Iterator[GmailIMAPTool]:
+        """Borrow the logged-in tool, pulling the session out of IDLE first"""
+        self._interrupt.set()
+        with self._lock:
+            if not self._stop.is_set():
+                self._interrupt.clear()
+            if not self.tool.imap:
+                self.tool.ensure_connected()
+            yield self.tool
+
+    def _run(self):
+        delay = self.RECONNECT_DELAY
+        while not self._stop.is_set():
+            new_mail = False
+            try:
+                with self._lock:
+                    if self._interrupt.is_set():
+                        continue
+                    if not self.tool.ensure_connected():
+                        raise ConnectionError("could not connect to Gmail")
+                    if self.tool.supports_idle():
+                        new_mail = self.tool.idle(self.idle_timeout, interrupt=self._interrupt)
+                delay = self.RECONNECT_DELAY
+            except Exception as e:
+                print(f"Gmail IDLE session error: {e}, reconnecting in {delay}s")
+                with self._lock:
+                    self.tool._drop_connection()
+                self._stop.wait(delay)
+                delay = min(delay * 2, self.MAX_RECONNECT_DELAY)
+                continue
+            finally:
+                if self._interrupt.is_set() and not self._stop.is_set():
+                    time.sleep(GmailIMAPTool.IDLE_POLL_INTERVAL)
+
+            if new_mail:
+                self._on_new_mail(time.time())
+            elif not self.tool.supports_idle():
+                # No IDLE: just keep the login warm, the daemon's poll interval applies
+                self._stop.wait(self.idle_timeout)
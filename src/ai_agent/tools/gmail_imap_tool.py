@@ -3,31 +3,194 @@ Simple Gmail access using IMAP with app passwords
 Users just need to provide email + app password
 """
 import imaplib
+import os
 import email
+import re
+import select
+import ssl
+import threading
 from email.header import decode_header
-from typing import List, Optional
+from email.utils import parsedate_to_datetime
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple, Union
 from datetime import datetime, timedelta
 import time
 
 from ..state import Message, InputType
+from ..utils.metrics import get_metrics
+from .mailbox_sync import MailboxSyncState, SyncPoint
+from .mime_body import DEFAULT_BODY_MAX_BYTES, decode_payload, encoded_limit, extract_message
+
+# Headers kept on Message for the header-based pre-classifier and for threading replies
+KEPT_HEADERS = (
+    'List-Unsubscribe', 'List-Id', 'Precedence', 'Auto-Submitted',
+    'X-Auto-Response-Suppress', 'Reply-To', 'Return-Path', 'References', 'In-Reply-To'
+)
+
+# Phase one of a two-phase fetch: everything needed to classify, nothing marked \Seen
+HEADERS_FETCH_ITEMS = '(UID BODYSTRUCTURE BODY.PEEK[HEADER])'
+
+FETCH_MODES = ("full", "two_phase")
+
+DEFAULT_DRAFTS_MAILBOX = "[Gmail]/Drafts"
+# LITERAL- (RFC 7888) only allows non-synchronizing literals up to this size
+LITERAL_MINUS_MAX = 4096
+
+_APPENDUID_RE = re.compile(rb'\[APPENDUID \d+ (\d+)\]', re.IGNORECASE)
+
+# Untagged responses that mean the selected mailbox has new mail
+_NEW_MAIL_RE = re.compile(rb'^\* \d+ (EXISTS|RECENT)')
+
+_FETCH_UID_RE = re.compile(rb'\bUID (\d+)', re.IGNORECASE)
 
 
 class GmailIMAPTool:
-    def __init__(self, email_address: str, app_password: str):
+    # Max messages requested by a single FETCH command
+    FETCH_BATCH_SIZE = 100
+    # Gmail drops IDLE connections after ~10 minutes, so re-issue before that
+    IDLE_TIMEOUT = 9 * 60
+    # How often an IDLE wait checks for interruption
+    IDLE_POLL_INTERVAL = 0.1
+    # Pipelined APPENDs are written in chunks of about this many bytes
+    APPEND_SEND_BUFFER = 256 * 1024
+    # ...with at most this many awaiting their completion
+    APPEND_MAX_IN_FLIGHT = 100
+    
+    def __init__(self, email_address: str, app_password: str,
+                 host: str = "imap.gmail.com", port: int = 993, use_ssl: bool = True,
+                 fetch_mode: str = "full", body_max_bytes: Optional[int] = None,
+                 drafts_mailbox: str = DEFAULT_DRAFTS_MAILBOX):
+        if fetch_mode not in FETCH_MODES:
+            raise ValueError(f"Unknown fetch mode {fetch_mode!r}, expected one of {FETCH_MODES}")
         self.email = email_address
         self.password = app_password
+        self.host = host
+        self.port = port
+        self.use_ssl = use_ssl
+        self.fetch_mode = fetch_mode
+        # Bodies are truncated to this many bytes of UTF-8 before they reach Message
+        self.body_max_bytes = body_max_bytes or int(os.getenv('GMAIL_BODY_MAX_BYTES', DEFAULT_BODY_MAX_BYTES))
+        self.drafts_mailbox = drafts_mailbox
         self.imap = None
     
+    @classmethod
+    def from_env(cls) -> Optional["GmailIMAPTool"]:
+        """Tool for GMAIL_EMAIL / GMAIL_APP_PASSWORD, or None when they are not set.
+        
+        GMAIL_IMAP_HOST, GMAIL_IMAP_PORT and GMAIL_IMAP_SSL=0 point it at another
+        server, such as the local stand-in used by the benchmarks.
+        GMAIL_FETCH_MODE=two_phase downloads headers first and bodies only for
+        mail classified EMAIL_REPLY (see fetch_headers / fetch_bodies).
+        GMAIL_DRAFTS_MAILBOX overrides where append_messages puts drafts.
+        """
+        gmail_email = os.getenv('GMAIL_EMAIL')
+        gmail_app_password = os.getenv('GMAIL_APP_PASSWORD')
+        if not (gmail_email and gmail_app_password):
+            return None
+        return cls(
+            gmail_email, gmail_app_password,
+            host=os.getenv('GMAIL_IMAP_HOST', "imap.gmail.com"),
+            port=int(os.getenv('GMAIL_IMAP_PORT', "993")),
+            use_ssl=os.getenv('GMAIL_IMAP_SSL', "1").lower() not in ("0", "false", "no"),
+            fetch_mode=os.getenv('GMAIL_FETCH_MODE', "full"),
+            drafts_mailbox=os.getenv('GMAIL_DRAFTS_MAILBOX', DEFAULT_DRAFTS_MAILBOX)
+        )
+    
     def connect(self) -> bool:
         """Connect to Gmail via IMAP"""
         try:
-            self.imap = imaplib.IMAP4_SSL("imap.gmail.com")
+            if self.use_ssl:
+                self.imap = imaplib.IMAP4_SSL(self.host, self.port)
+            else:
+                self.imap = imaplib.IMAP4(self.host, self.port)
             self.imap.login(self.email, self.password)
             return True
         except Exception as e:
             print(f"Failed to connect to Gmail: {e}")
             return False
     
+    def ensure_connected(self, mailbox: str = 'INBOX') -> bool:
+        """Check the session with NOOP, reconnecting and reselecting the mailbox if it died"""
+        if self.imap:
+            try:
+                status, _ = self.imap.noop()
+                if status == 'OK':
+                    return True
+            except Exception as e:
+                print(f"IMAP session lost: {e}")
+            self._drop_connection()
+        
+        if not self.connect():
+            return False
+        try:
+            self.imap.select(mailbox)
+            return True
+        except Exception as e:
+            print(f"Failed to select {mailbox}: {e}")
+            self._drop_connection()
+            return False
+    
+    def supports_idle(self) -> bool:
+        return bool(self.imap) and 'IDLE' in self.imap.capabilities
+    
+    def idle(self, timeout: Optional[float] = None, interrupt: Optional[threading.Event] = None) -> bool:
+        """Wait for new mail with IMAP IDLE (RFC 2177) on the selected mailbox.
+        
+        Returns True as soon as the server reports new messages, False once the
+        timeout expires or interrupt is set. Errors on the connection propagate.
+        """
+        timeout = self.IDLE_TIMEOUT if timeout is None else timeout
+        tag = self.imap._new_tag()
+        self.imap.tagged_commands.pop(tag, None)  # we read the completion ourselves
+        self.imap.send(tag + b' IDLE\r\n')
+        
+        line = self.imap.readline()
+        if not line.startswith(b'+'):
+            raise imaplib.IMAP4.error(f"IDLE rejected: {line!r}")
+        
+        new_mail = False
+        deadline = time.monotonic() + timeout
+        while not new_mail and time.monotonic() < deadline:
+            if interrupt is not None and interrupt.is_set():
+                break
+            # Lines already buffered by imaplib or TLS are not visible to select
+            if not self._response_buffered():
+                wait = min(self.IDLE_POLL_INTERVAL, max(0.0, deadline - time.monotonic()))
+                readable, _, _ = select.select([self.imap.sock], [], [], wait)
+                if not readable:
+                    continue
+            line = self.imap.readline()
+            if not line:
+                raise imaplib.IMAP4.abort("connection closed during IDLE")
+            if _NEW_MAIL_RE.match(line):
+                new_mail = True
+        
+        self.imap.send(b'DONE\r\n')
+        while True:
+            line = self.imap.readline()
+            if not line:
+                raise imaplib.IMAP4.abort("connection closed ending IDLE")
+            if line.startswith(tag):
+                break
+            if _NEW_MAIL_RE.match(line):
+                new_mail = True
+        
+        return new_mail
+    
+    def _response_buffered(self) -> bool:
+        """Whether response bytes (e.g. an EXISTS that came with "+ idling") already sit in a read buffer"""
+        sock = self.imap.sock
+        if getattr(sock, 'pending', lambda: 0)():
+            return True
+        # peek() reads the socket when imaplib's buffer is empty; non-blocking, that returns at once
+        timeout = sock.gettimeout()
+        sock.setblocking(False)
+        try:
+            return bool(self.imap.file.peek(1))
+        except (BlockingIOError, ssl.SSLWantReadError):
+            return False
+        finally:
+            sock.settimeout(timeout)
+    
     def get_unread_messages(self, max_count: int = 10) -> List[Message]:
         """Get unread messages from the last hour via IMAP"""
         if not self.imap:
@@ -44,27 +207,25 @@ class GmailIMAPTool:
             print(f"Searching for unread messages since {since_date} (last hour)")
             search_criteria = f'(UNSEEN SINCE {since_date})'
             
-            status, messages = self.imap.search(None, search_criteria)
+            with get_metrics().timed("agent_imap_seconds", command="search"):
+                status, messages = self.imap.search(None, search_criteria)
             if status != 'OK':
                 return []
             
             message_ids = messages[0].split()[-max_count:]  # Get latest N
             parsed_messages = []
             
-            for msg_id in message_ids:
-                status, msg_data = self.imap.fetch(msg_id, '(RFC822)')
-                if status == 'OK':
-                    raw_email = msg_data[0][1]
-                    parsed_msg = self._parse_email(raw_email)
-                    if parsed_msg:
-                        # Double-check the timestamp is within the last hour
-                        try:
-                            msg_time = datetime.fromisoformat(parsed_msg.timestamp.replace('Z', '+00:00'))
-                            if msg_time.replace(tzinfo=None) >= one_hour_ago:
-                                parsed_messages.append(parsed_msg)
-                        except:
-                            # If timestamp parsing fails, include the message anyway
-                            parsed_messages.append(parsed_msg)
+            for parsed_msg in self.fetch_messages(message_ids):
+                # Double-check the timestamp is within the last hour
+                try:
+                    msg_time = datetime.fromisoformat(parsed_msg.timestamp.replace('Z', '+00:00'))
+                    if msg_time.tzinfo:
+                        msg_time = msg_time.astimezone().replace(tzinfo=None)
+                    if msg_time >= one_hour_ago:
+                        parsed_messages.append(parsed_msg)
+                except:
+                    # If timestamp parsing fails, include the message anyway
+                    parsed_messages.append(parsed_msg)
             
             return parsed_messages
             
@@ -72,6 +233,279 @@ class GmailIMAPTool:
             print(f"Error fetching messages: {e}")
             return []
     
+    def get_new_messages(self, sync_state: MailboxSyncState, mailbox: str = 'INBOX',
+                         max_count: Optional[int] = None) -> Tuple[List[Message], Optional[SyncPoint]]:
+        """Get unread messages that arrived since the last sync, oldest first.
+        
+        Only UIDs above the persisted watermark are searched and fetched. When
+        there is no watermark yet, or UIDVALIDITY changed, unread mail from the
+        last day is resynced. Nothing is marked \\Seen, and the watermark is
+        left alone: the returned SyncPoint is committed to sync_state by the
+        caller once the messages have been handled (None if the sync failed).
+        """
+        if not self.imap:
+            if not self.connect():
+                return [], None
+        
+        try:
+            status, _ = self.imap.select(mailbox)
+            if status != 'OK':
+                return [], None
+            uidvalidity = _response_int(self.imap, 'UIDVALIDITY')
+            uidnext = _response_int(self.imap, 'UIDNEXT')
+            
+            key = f"{self.email}/{mailbox}"
+            watermark = sync_state.get(key, uidvalidity)
+            if watermark is None:
+                since_date = (datetime.now() - timedelta(days=1)).strftime('%d-%b-%Y')
+                print(f"No valid sync watermark for {mailbox}, resyncing unread mail since {since_date}")
+                search_criteria = f'(UNSEEN SINCE {since_date})'
+                watermark = 0
+            else:
+                search_criteria = f'(UID {watermark + 1}:* UNSEEN)'
+            
+            with get_metrics().timed("agent_imap_seconds", command="search"):
+                status, data = self.imap.uid('SEARCH', None, search_criteria)
+            if status != 'OK':
+                return [], None
+            
+            # "N:*" always matches the highest UID, even when it is below N
+            uids = sorted(uid for uid in map(int, data[0].split()) if uid > watermark)
+            truncated = max_count is not None and len(uids) > max_count
+            if truncated:
+                uids = uids[:max_count]
+            
+            failed: List[int] = []
+            if self.fetch_mode == "two_phase":
+                messages = list(self.fetch_headers(uids, uid=True, mailbox=mailbox, failed=failed))
+            else:
+                messages = list(self.fetch_messages(uids, uid=True, peek=True, failed=failed))
+            
+            if truncated:
+                new_watermark = uids[-1]
+            else:
+                # Everything below UIDNEXT at SELECT time was covered by the search
+                new_watermark = max([watermark, *uids, (uidnext or 1) - 1])
+            if failed:
+                # Fetched again next sync; messages after them that did arrive are skipped by the ledger
+                new_watermark = min(new_watermark, min(failed) - 1)
+            
+            return messages, SyncPoint(key, uidvalidity, new_watermark)
+            
+        except Exception as e:
+            print(f"Error syncing {mailbox}: {e}")
+            return [], None
+    
+    def fetch_messages(self, message_ids: Iterable[Union[bytes, str, int]],
+                       batch_size: Optional[int] = None, uid: bool = False, peek: bool = False,
+                       failed: Optional[List[int]] = None) -> Iterator[Message]:
+        """Fetch many messages with one FETCH command per batch instead of one per message.
+        
+        Message IDs are sequence numbers, or UIDs when uid=True. Messages are
+        yielded in the order the server returns them, batch by batch, with
+        imap_uid set. peek=True fetches BODY.PEEK[] so nothing is marked \\Seen.
+        IDs of batches the server refused are appended to `failed`.
+        """
+        ids = [int(m) for m in message_ids]
+        batch_size = batch_size or self.FETCH_BATCH_SIZE
+        metrics = get_metrics()
+        items = '(UID BODY.PEEK[])' if peek else '(UID RFC822)'
+        
+        for start in range(0, len(ids), batch_size):
+            message_set = _compress_sequence_set(ids[start:start + batch_size])
+            with metrics.timed("agent_imap_seconds", command="fetch"):
+                if uid:
+                    status, msg_data = self.imap.uid('FETCH', message_set, items)
+                else:
+                    status, msg_data = self.imap.fetch(message_set, items)
+            metrics.inc("agent_imap_messages_total", len(ids[start:start + batch_size]))
+            if status != 'OK':
+                print(f"FETCH {message_set} failed: {status}")
+                if failed is not None:
+                    failed.extend(ids[start:start + batch_size])
+                continue
+            metrics.inc("agent_imap_bytes_total", _response_bytes(msg_data), phase="full")
+            
+            for envelope, raw_email in _iter_fetch_literals(msg_data):
+                parsed_msg = self._parse_email(raw_email)
+                if parsed_msg:
+                    match = _FETCH_UID_RE.search(envelope)
+                    parsed_msg.imap_uid = int(match.group(1)) if match else None
+                    yield parsed_msg
+    
+    def fetch_headers(self, message_ids: Iterable[Union[bytes, str, int]],
+                      batch_size: Optional[int] = None, uid: bool = False,
+                      mailbox: str = 'INBOX', failed: Optional[List[int]] = None) -> Iterator[Message]:
+        """Phase one of a two-phase fetch: headers and BODYSTRUCTURE only.
+        
+        Uses BODY.PEEK, so nothing is marked \\Seen. Messages come back with an
+        empty body; body_part records where the text/plain part lives (None when
+        there is none) for fetch_bodies. IDs of batches the server refused are
+        appended to `failed`.
+        """
+        ids = [int(m) for m in message_ids]
+        batch_size = batch_size or self.FETCH_BATCH_SIZE
+        metrics = get_metrics()
+        
+        for start in range(0, len(ids), batch_size):
+            message_set = _compress_sequence_set(ids[start:start + batch_size])
+            with metrics.timed("agent_imap_seconds", command="fetch_headers"):
+                if uid:
+                    status, msg_data = self.imap.uid('FETCH', message_set, HEADERS_FETCH_ITEMS)
+                else:
+                    status, msg_data = self.imap.fetch(message_set, HEADERS_FETCH_ITEMS)
+            metrics.inc("agent_imap_messages_total", len(ids[start:start + batch_size]))
+            if status != 'OK':
+                print(f"FETCH {message_set} failed: {status}")
+                if failed is not None:
+                    failed.extend(ids[start:start + batch_size])
+                continue
+            metrics.inc("agent_imap_bytes_total", _response_bytes(msg_data), phase="headers")
+            
+            for item in _parse_fetch_response(msg_data):
+                header = item.get("BODY[HEADER]")
+                if not isinstance(header, bytes):
+                    continue
+                try:
+                    email_msg = email.message_from_bytes(header)
+                    part = _find_text_part(item.get("BODYSTRUCTURE"))
+                except Exception as e:
+                    print(f"Error parsing email headers: {e}")
+                    continue
+                parsed_msg = self._message_from_email(email_msg, body="")
+                parsed_msg.imap_uid = int(item["UID"]) if "UID" in item else None
+                parsed_msg.body_part = {**part, "mailbox": mailbox} if part else None
+                yield parsed_msg
+    
+    def fetch_bodies(self, messages: List[Message], batch_size: Optional[int] = None) -> List[Message]:
+        """Phase two of a two-phase fetch: download only the text part of each message.
+        
+        Takes messages from fetch_headers and returns copies with the body
+        filled in and body_part cleared, in input order. Parts are fetched with
+        one UID FETCH per distinct section number per batch, and only the
+        leading bytes needed for body_max_bytes of text are requested;
+        anything that cannot be fetched comes back with an empty body.
+        """
+        batch_size = batch_size or self.FETCH_BATCH_SIZE
+        metrics = get_metrics()
+        bodies: Dict[int, str] = {}
+        
+        by_part: Dict[Tuple[str, str], List[Message]] = {}
+        for message in messages:
+            if message.body_part and message.imap_uid is not None:
+                part = message.body_part
+                by_part.setdefault((part["section"], part.get("subtype", "plain")), []).append(message)
+        
+        for (section, subtype), part_messages in by_part.items():
+            limit = encoded_limit(subtype, self.body_max_bytes)
+            for start in range(0, len(part_messages), batch_size):
+                batch = part_messages[start:start + batch_size]
+                message_set = _compress_sequence_set([m.imap_uid for m in batch])
+                with metrics.timed("agent_imap_seconds", command="fetch_bodies"):
+                    status, msg_data = self.imap.uid('FETCH', message_set, f'(UID BODY.PEEK[{section}]<0.{limit}>)')
+                if status != 'OK':
+                    print(f"FETCH {message_set} BODY[{section}] failed: {status}")
+                    continue
+                metrics.inc("agent_imap_bytes_total", _response_bytes(msg_data), phase="body")
+                
+                parts = {int(item["UID"]): item.get(f"BODY[{section}]<0>", item.get(f"BODY[{section}]"))
+                         for item in _parse_fetch_response(msg_data) if "UID" in item}
+                for message in batch:
+                    data = parts.get(message.imap_uid)
+                    if isinstance(data, bytes):
+                        bodies[message.imap_uid] = decode_payload(
+                            data, message.body_part.get("encoding"), message.body_part.get("charset"),
+                            subtype, self.body_max_bytes
+                        )
+        
+        return [
+            message.model_copy(update={"body": bodies.get(message.imap_uid, ""), "body_part": None})
+            if message.body_part is not None else message
+            for message in messages
+        ]
+    
+    def append_messages(self, raw_messages: List[bytes], mailbox: Optional[str] = None,
+                        flags: str = '(\\Draft \\Seen)') -> List[Optional[int]]:
+        """APPEND many messages to mailbox (default: the drafts mailbox) over this connection, pipelined.
+        
+        Each APPEND is sent without waiting for the previous one to complete.
+        Literals are non-synchronizing when the server allows it (LITERAL+, or
+        LITERAL- for small messages), so the whole batch costs about one round
+        trip; otherwise each waits only for its "+" continuation. Returns the
+        APPENDUID of each message (0 if the server reports none, None if it failed), in order.
+        Connection errors propagate.
+        """
+        capabilities = self.imap.capabilities
+        mailbox = mailbox or self.drafts_mailbox
+        internal_date = imaplib.Time2Internaldate(time.time())
+        quoted_mailbox = '"' + mailbox.replace('\\', '\\\\').replace('"', '\\"') + '"'
+        results: List[Optional[int]] = [None] * len(raw_messages)
+        in_flight: Dict[bytes, int] = {}
+        # Outgoing bytes are coalesced so a literal and the next command line share
+        # a segment, instead of the small write stalling behind Nagle + delayed ACK
+        pending: List[bytes] = []
+        pending_size = 0
+        
+        with get_metrics().timed("agent_imap_seconds", command="append"):
+            for index, raw in enumerate(raw_messages):
+                while len(in_flight) >= self.APPEND_MAX_IN_FLIGHT:
+                    # Bound unread completions so neither side blocks on a full socket buffer
+                    if pending:
+                        self.imap.send(b''.join(pending))
+                        pending, pending_size = [], 0
+                    self._read_append_response(in_flight, results)
+                raw = _crlf(raw)
+                synchronizing = not ('LITERAL+' in capabilities or
+                                     ('LITERAL-' in capabilities and len(raw) <= LITERAL_MINUS_MAX))
+                tag = self.imap._new_tag()
+                self.imap.tagged_commands.pop(tag, None)  # we read the completion ourselves
+                literal = f"{{{len(raw)}}}" if synchronizing else f"{{{len(raw)}+}}"
+                command = f"{tag.decode()} APPEND {quoted_mailbox} {flags} {internal_date} {literal}\r\n".encode()
+                pending.append(command)
+                pending_size += len(command)
+                in_flight[tag] = index
+                if synchronizing:
+                    self.imap.send(b''.join(pending))
+                    pending, pending_size = [], 0
+                    if not self._await_continuation(tag, in_flight, results):
+                        continue  # rejected before the literal was sent
+                pending.append(raw + b'\r\n')
+                pending_size += len(raw) + 2
+                if pending_size >= self.APPEND_SEND_BUFFER:
+                    self.imap.send(b''.join(pending))
+                    pending, pending_size = [], 0
+            
+            if pending:
+                self.imap.send(b''.join(pending))
+            while in_flight:
+                self._read_append_response(in_flight, results)
+        
+        return results
+    
+    def _await_continuation(self, tag: bytes, in_flight: Dict[bytes, int], results: List[Optional[int]]) -> bool:
+        """Read until the server asks for tag's literal; False if it completed the command instead"""
+        while tag in in_flight:
+            if self._read_append_response(in_flight, results):
+                return True
+        return False
+    
+    def _read_append_response(self, in_flight: Dict[bytes, int], results: List[Optional[int]]) -> bool:
+        """Handle one response line; True if it was a continuation request"""
+        line = self.imap.readline()
+        if not line:
+            raise imaplib.IMAP4.abort("connection closed during APPEND")
+        if line.startswith(b'+'):
+            return True
+        tag, _, rest = line.partition(b' ')
+        index = in_flight.pop(tag, None)
+        if index is not None:
+            if rest.upper().startswith(b'OK'):
+                match = _APPENDUID_RE.search(rest)
+                results[index] = int(match.group(1)) if match else 0
+            else:
+                print(f"APPEND failed: {rest.decode(errors='replace').strip()}")
+        return False
+    
     def get_latest_message(self) -> Optional[Message]:
         """Get most recent unread message"""
         messages = self.get_unread_messages(max_count=1)
@@ -80,34 +514,45 @@ class GmailIMAPTool:
     def _parse_email(self, raw_email: bytes) -> Optional[Message]:
         """Parse raw email into Message object"""
         try:
-            email_msg = email.message_from_bytes(raw_email)
-            
-            # Get headers
-            sender = self._decode_header(email_msg.get('From', ''))
-            recipient = self._decode_header(email_msg.get('To', ''))
-            subject = self._decode_header(email_msg.get('Subject', ''))
-            
-            # Get body
-            body = self._extract_body(email_msg)
-            
-            # Get timestamp
-            date_str = email_msg.get('Date', '')
-            timestamp = datetime.now().isoformat()  # Fallback
-            
-            return Message(
-                sender=sender,
-                recipient=recipient,
-                subject=subject,
-                body=body,
-                timestamp=timestamp,
-                input_type=InputType.EMAIL,
-                source="gmail"
-            )
+            # Only header blocks are parsed; attachment payloads are skipped, not decoded
+            email_msg, body = extract_message(raw_email, self.body_max_bytes)
+            return self._message_from_email(email_msg, body=body)
             
         except Exception as e:
             print(f"Error parsing email: {e}")
             return None
     
+    def _message_from_email(self, email_msg, body: str) -> Message:
+        """Build a Message from parsed headers and an already extracted body"""
+        # Get headers
+        sender = self._decode_header(email_msg.get('From', ''))
+        recipient = self._decode_header(email_msg.get('To', ''))
+        subject = self._decode_header(email_msg.get('Subject', ''))
+        
+        headers = {
+            name: self._decode_header(email_msg[name])
+            for name in KEPT_HEADERS if email_msg[name] is not None
+        }
+        
+        # Get timestamp
+        date_str = email_msg.get('Date', '')
+        try:
+            timestamp = parsedate_to_datetime(date_str).isoformat()
+        except (TypeError, ValueError):
+            timestamp = datetime.now().isoformat()  # Fallback
+        
+        return Message(
+            sender=sender,
+            recipient=recipient,
+            subject=subject,
+            body=body,
+            timestamp=timestamp,
+            input_type=InputType.EMAIL,
+            source="gmail",
+            headers=headers,
+            message_id=(email_msg.get('Message-ID') or '').strip() or None
+        )
+    
     def _decode_header(self, header: str) -> str:
         """Decode email header"""
         try:
@@ -118,23 +563,185 @@ class GmailIMAPTool:
         except:
             return header
     
-    def _extract_body(self, email_msg) -> str:
-        """Extract email body text"""
-        body = ""
-        
-        if email_msg.is_multipart():
-            for part in email_msg.walk():
-                if part.get_content_type() == "text/plain":
-                    body = part.get_payload(decode=True).decode('utf-8', errors='ignore')
-                    break
-        else:
-            if email_msg.get_content_type() == "text/plain":
-                body = email_msg.get_payload(decode=True).decode('utf-8', errors='ignore')
-        
-        return body.strip()
-    
     def disconnect(self):
         """Close IMAP connection"""
         if self.imap:
             self.imap.close()
-            self.imap.logout()
\ No newline at end of file
+            self.imap.logout()
+            self.imap = None
+    
+    def _drop_connection(self):
+        """Tear down a connection that may already be broken"""
+        if self.imap:
+            try:
+                self.imap.shutdown()
+            except Exception:
+                pass
+            self.imap = None
+
+
+def _compress_sequence_set(ids: List[int]) -> str:
+    """Collapse message numbers into an IMAP sequence set, e.g. [1, 2, 3, 7] -> "1:3,7" """
+    ranges = []
+    for n in sorted(set(ids)):
+        if ranges and n == ranges[-1][1] + 1:
+            ranges[-1][1] = n
+        else:
+            ranges.append([n, n])
+    return ",".join(str(a) if a == b else f"{a}:{b}" for a, b in ranges)
+
+
+def _response_int(imap: imaplib.IMAP4, code: str) -> Optional[int]:
+    """Read a numeric response code such as UIDVALIDITY left by SELECT"""
+    _, data = imap.response(code)
+    try:
+        return int(data[-1])
+    except (TypeError, ValueError, IndexError):
+        return None
+
+
+def _iter_fetch_literals(msg_data: list) -> Iterator[Tuple[bytes, bytes]]:
+    """Yield (envelope, literal) per message from a multi-message FETCH response.
+    
+    imaplib returns (envelope, literal) tuples interleaved with b')' closers;
+    items after the literal (e.g. a UID) arrive in the closer, so it is
+    appended to the envelope.
+    """
+    for position, item in enumerate(msg_data):
+        if isinstance(item, tuple) and len(item) == 2:
+            closer = msg_data[position + 1] if position + 1 < len(msg_data) else b""
+            yield item[0] + b" " + (closer if isinstance(closer, bytes) else b""), item[1]
+
+
+
+def _response_bytes(msg_data: list) -> int:
+    """Approximate bytes received for a FETCH response (lines plus literals)"""
+    total = 0
+    for item in msg_data:
+        if isinstance(item, tuple):
+            total += sum(len(piece) for piece in item if isinstance(piece, bytes))
+        elif isinstance(item, bytes):
+            total += len(item)
+    return total
+
+
+def _parse_fetch_response(msg_data: list) -> Iterator[Dict[str, Any]]:
+    """Parse a FETCH response into one {ITEM NAME: value} dict per message.
+    
+    Lists become Python lists, NIL becomes None, literals stay bytes and
+    other atoms are strings. imaplib splits the response at every literal,
+    so the pieces are joined back into one buffer first.
+    """
+    buffer = b"".join(
+        b"".join(item) if isinstance(item, tuple) else item
+        for item in msg_data if isinstance(item, (tuple, bytes))
+    )
+    position = 0
+    while True:
+        position = _skip_spaces(buffer, position)
+        if position >= len(buffer):
+            return
+        _, position = _parse_token(buffer, position)  # message sequence number
+        position = _skip_spaces(buffer, position)
+        if position >= len(buffer) or buffer[position:position + 1] != b"(":
+            return
+        values, position = _parse_token(buffer, position)
+        yield {str(values[i]).upper(): values[i + 1] for i in range(0, len(values) - 1, 2)}
+
+
+def _skip_spaces(buffer: bytes, position: int) -> int:
+    while position < len(buffer) and buffer[position:position + 1] in (b" ", b"\r", b"\n"):
+        position += 1
+    return position
+
+
+def _parse_token(buffer: bytes, position: int) -> Tuple[Any, int]:
+    char = buffer[position:position + 1]
+    if char == b"(":
+        values = []
+        position += 1
+        while True:
+            position = _skip_spaces(buffer, position)
+            if position >= len(buffer):
+                return values, position
+            if buffer[position:position + 1] == b")":
+                return values, position + 1
+            value, position = _parse_token(buffer, position)
+            values.append(value)
+    if char == b'"':
+        chars = bytearray()
+        position += 1
+        while position < len(buffer) and buffer[position:position + 1] != b'"':
+            if buffer[position:position + 1] == b"\\":
+                position += 1
+            chars += buffer[position:position + 1]
+            position += 1
+        return chars.decode("utf-8", errors="replace"), position + 1
+    if char == b"{":
+        end = buffer.index(b"}", position)
+        size = int(buffer[position + 1:end])
+        # imaplib has already dropped the CRLF between {size} and the data
+        start = end + 1
+        return buffer[start:start + size], start + size
+    
+    # Atom; a [...] section spec may contain spaces and parentheses
+    start = position
+    depth = 0
+    while position < len(buffer):
+        char = buffer[position:position + 1]
+        if char == b"[":
+            depth += 1
+        elif char == b"]":
+            depth -= 1
+        elif depth == 0 and char in (b" ", b"(", b")", b"\r", b"\n"):
+            break
+        position += 1
+    atom = buffer[start:position].decode("ascii", errors="replace")
+    return (None if atom.upper() == "NIL" else atom), position
+
+
+def _find_text_part(structure: Any) -> Optional[Dict[str, Any]]:
+    """Where the body lives in a BODYSTRUCTURE: the first inline text/plain part, else text/html"""
+    parts = list(_iter_structure_parts(structure))
+    for subtype in ("plain", "html"):
+        for section, part in parts:
+            if _is_inline_text(part, subtype):
+                params = part[2] if isinstance(part[2], list) else []
+                charset = next((params[i + 1] for i in range(0, len(params) - 1, 2)
+                                if str(params[i]).lower() == "charset"), None)
+                return {
+                    "section": section,
+                    "subtype": subtype,
+                    "encoding": (part[5] or "7bit").lower(),
+                    "charset": charset,
+                    "size": int(part[6]) if str(part[6]).isdigit() else None,
+                }
+    return None
+
+
+def _iter_structure_parts(structure: Any, section: str = "") -> Iterator[Tuple[str, list]]:
+    """(section number, BODYSTRUCTURE entry) for every leaf part, in order"""
+    if not isinstance(structure, list) or not structure:
+        return
+    if isinstance(structure[0], list):
+        # multipart: child parts first, then the subtype and extension data
+        for number, child in enumerate(structure, 1):
+            if not isinstance(child, list):
+                break
+            yield from _iter_structure_parts(child, f"{section}.{number}" if section else str(number))
+    else:
+        yield section or "1", structure
+
+
+def _is_inline_text(part: list, subtype: str) -> bool:
+    if len(part) < 7 or (part[0] or "").lower() != "text" or (part[1] or "").lower() != subtype:
+        return False
+    # text parts: ... lines, md5, disposition
+    disposition = part[9] if len(part) > 9 else None
+    return not (isinstance(disposition, list) and str(disposition[0]).lower() == "attachment")
+
+
+
+def _crlf(raw: bytes) -> bytes:
+    """IMAP literals carry CRLF line endings"""
+    return re.sub(rb'\r?\n', b'\r\n', raw)
@@ -0,0 +1,171 @@
+"""
+Streaming readers for offline mail archives (mbox files and Maildir directories)
+and the checkpoint the bulk ingest resumes from.
+
+Readers yield (resume_token, raw message bytes) one message at a time, so an
+archive of any size is read with constant memory. The token is what a reader
+needs to continue right after that message: the byte offset of the next
+message in an mbox, or the number of messages consumed in a Maildir.
+"""
+import json
+import os
+import threading
+import time
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from ..state import Message
+from .gmail_imap_tool import GmailIMAPTool
+
+DEFAULT_CHECKPOINT_PATH = os.path.abspath(
+    os.path.join(os.path.dirname(__file__), '../../../data/ingest_checkpoint.json')
+)
+
+# Parsing never touches the connection, so the worker-side parser has no credentials
+_parser = GmailIMAPTool("", "")
+
+
+def archive_kind(path: str) -> str:
+    if os.path.isdir(path):
+        if not os.path.isdir(os.path.join(path, "cur")) and not os.path.isdir(os.path.join(path, "new")):
+            raise ValueError(f"{path} is a directory but not a Maildir (no cur/ or new/)")
+        return "maildir"
+    return "mbox"
+
+
+def archive_size(path: str) -> int:
+    """Progress denominator: bytes for an mbox, messages for a Maildir"""
+    if archive_kind(path) == "maildir":
+        return len(_maildir_names(path))
+    return os.path.getsize(path)
+
+
+def iter_archive(path: str, resume_token: int = 0) -> Iterator[Tuple[int, bytes]]:
+    if archive_kind(path) == "maildir":
+        return iter_maildir(path, resume_token)
+    return iter_mbox(path, resume_token)
+
+
+def iter_mbox(path: str, offset: int = 0) -> Iterator[Tuple[int, bytes]]:
+    """Yield (offset of the following message, raw message) from an mbox file.
+
+    A message starts at a "From " line at the top of the file or after a blank
+    line. ">From " quoting (mboxrd) is undone. Reading starts at `offset`, which
+    must be a value previously yielded (or 0).
+    """
+    with open(path, "rb") as f:
+        f.seek(offset)
+        position = offset
+        lines: List[bytes] = []
+        previous_blank = True
+        while True:
+            line_start = position
+            line = f.readline()
+            position += len(line)
+            if not line or (previous_blank and line.startswith(b"From ")):
+                if lines:
+                    yield line_start, _join_mbox_lines(lines)
+                    lines = []
+                if not line:
+                    return
+            else:
+                if line.startswith(b">") and line.lstrip(b">").startswith(b"From "):
+                    line = line[1:]
+                lines.append(line)
+            previous_blank = line in (b"\n", b"\r\n")
+
+
+def _join_mbox_lines(lines: List[bytes]) -> bytes:
+    # The blank line before the next separator belongs to the mbox, not the message
+    if lines and lines[-1] in (b"\n", b"\r\n"):
+        lines = lines[:-1]
+    return b"".join(lines)
+
+
+def iter_maildir(path: str, start: int = 0) -> Iterator[Tuple[int, bytes]]:
+    """Yield (messages consumed, raw message) from a Maildir in delivery-name order"""
+    for position, file_path in enumerate(_maildir_names(path)[start:], start + 1):
+        try:
+            with open(file_path, "rb") as f:
+                raw = f.read()
+        except FileNotFoundError:
+            # Moved between cur/ and new/ or deleted since listing
+            continue
+        yield position, raw
+
+
+def _maildir_names(path: str) -> List[str]:
+    # Sort on the unique part of the name so a message moving from new/ to cur/
+    # (which appends ":2,<flags>") keeps its place
+    entries = []
+    for subdir in ("cur", "new"):
+        directory = os.path.join(path, subdir)
+        if not os.path.isdir(directory):
+            continue
+        for entry in os.scandir(directory):
+            if entry.is_file() and not entry.name.startswith("."):
+                entries.append((entry.name.split(":", 1)[0], entry.path))
+    entries.sort()
+    return [file_path for _, file_path in entries]
+
+
+def parse_raw_messages(raw_messages: List[bytes]) -> List[Optional[Message]]:
+    """Parse a chunk of raw messages; runs in the ingest's process pool"""
+    messages = [_parser._parse_email(raw) for raw in raw_messages]
+    for message in messages:
+        if message is not None:
+            message.source = "archive"  # not live mail: drafts stay local
+    return messages
+
+
+class IngestCheckpoint:
+    """Persisted ingest progress per archive, keyed by absolute archive path"""
+
+    def __init__(self, path: Optional[str] = None):
+        self.path = path or os.getenv("INGEST_CHECKPOINT_PATH", DEFAULT_CHECKPOINT_PATH)
+        self._lock = threading.Lock()
+        self._state: Dict[str, Dict[str, Any]] = self._load()
+
+    def _load(self) -> Dict[str, Dict[str, Any]]:
+        try:
+            with open(self.path) as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return {}
+        except Exception as e:
+            print(f"Could not read ingest checkpoint {self.path}: {e}, starting fresh")
+            return {}
+
+    def get(self, archive: str) -> Optional[Dict[str, Any]]:
+        """Saved progress for archive, or None when it has to be read from the start"""
+        with self._lock:
+            entry = self._state.get(os.path.abspath(archive))
+        if entry is None or entry.get("kind") != archive_kind(archive):
+            return None
+        if entry["kind"] == "mbox" and entry.get("resume_token", 0) > os.path.getsize(archive):
+            # The file shrank or was replaced; offsets no longer mean anything
+            return None
+        return entry
+
+    def update(self, archive: str, resume_token: int, messages: int, counts: Dict[str, int]):
+        with self._lock:
+            self._state[os.path.abspath(archive)] = {
+                "kind": archive_kind(archive),
+                "resume_token": resume_token,
+                "messages": messages,
+                "counts": counts,
+                "updated_at": time.time(),
+            }
+            self._save()
+
+    def clear(self, archive: str):
+        with self._lock:
+            if self._state.pop(os.path.abspath(archive), None) is not None:
+                self._save()
+
+    def _save(self):
+        # Write-then-rename so a crash never leaves a truncated file behind
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(self._state, f, indent=2, sort_keys=True)
+        os.replace(tmp_path, self.path)
@@ -0,0 +1,78 @@
+"""
+Persisted IMAP sync watermarks.
+
+For every account/mailbox we remember the UIDVALIDITY we last saw and the
+highest UID the workflow is done with, so each poll only asks the server for
+UID > watermark. A UIDVALIDITY change invalidates the watermark.
+
+A sync does not move the watermark itself: it returns a SyncPoint, which the
+caller commits once the fetched messages have been through the workflow. A
+message that did not finish (deferred, or the process stopped first) holds
+the watermark just below its UID, so the next poll fetches it again; the
+processed-message ledger skips the ones after it that did finish.
+"""
+import json
+import os
+import threading
+from dataclasses import dataclass
+from typing import Dict, Iterable, Optional
+
+DEFAULT_SYNC_STATE_PATH = os.path.abspath(
+    os.path.join(os.path.dirname(__file__), '../../../data/gmail_sync_state.json')
+)
+
+
+@dataclass
+class SyncPoint:
+    """Where a sync would put the watermark once everything it fetched is handled"""
+    key: str
+    uidvalidity: Optional[int]
+    last_uid: int
+
+
+class MailboxSyncState:
+    def __init__(self, path: Optional[str] = None):
+        self.path = path or os.getenv("GMAIL_SYNC_STATE_PATH", DEFAULT_SYNC_STATE_PATH)
+        self._lock = threading.Lock()
+        self._state: Dict[str, Dict[str, Optional[int]]] = self._load()
+
+    def _load(self) -> Dict[str, Dict[str, Optional[int]]]:
+        try:
+            with open(self.path) as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return {}
+        except Exception as e:
+            print(f"Could not read sync state {self.path}: {e}, starting fresh")
+            return {}
+
+    def get(self, key: str, uidvalidity: Optional[int]) -> Optional[int]:
+        """Last processed UID for key, or None if unknown or UIDVALIDITY changed"""
+        with self._lock:
+            entry = self._state.get(key)
+        if entry is None or entry.get("uidvalidity") != uidvalidity:
+            return None
+        return entry.get("last_uid")
+
+    def update(self, key: str, uidvalidity: Optional[int], last_uid: int):
+        with self._lock:
+            entry = self._state.get(key)
+            if entry == {"uidvalidity": uidvalidity, "last_uid": last_uid}:
+                return
+            self._state[key] = {"uidvalidity": uidvalidity, "last_uid": last_uid}
+            self._save()
+
+    def commit(self, point: SyncPoint, unfinished_uids: Iterable[Optional[int]] = ()):
+        """Advance the watermark to point, but not past the lowest UID that didn't finish"""
+        last_uid = min([point.last_uid, *(uid - 1 for uid in unfinished_uids if uid is not None)])
+        current = self.get(point.key, point.uidvalidity)
+        if current is None or last_uid > current:
+            self.update(point.key, point.uidvalidity, last_uid)
+
+    def _save(self):
+        # Write-then-rename so a crash never leaves a truncated file behind
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(self._state, f, indent=2, sort_keys=True)
+        os.replace(tmp_path, self.path)
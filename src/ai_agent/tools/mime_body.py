@@ -0,0 +1,191 @@
+"""
+Bounded body extraction from raw RFC 822 bytes.
+
+Only header blocks are parsed. Parts are located by scanning for multipart
+boundaries in the raw buffer and described by their byte span, so attachment
+payloads are never copied or decoded. The chosen text part (text/plain, else
+text/html converted to text) is decoded with its declared charset from at
+most a few times max_bytes of encoded input and truncated to max_bytes of
+UTF-8.
+"""
+import base64
+import binascii
+import codecs
+import quopri
+import re
+from dataclasses import dataclass
+from email.message import Message as EmailMessage
+from email.parser import BytesHeaderParser
+from html.parser import HTMLParser
+from typing import Iterator, List, Optional, Tuple
+
+DEFAULT_BODY_MAX_BYTES = 64 * 1024
+# Nested multiparts deeper than this are treated as opaque
+MAX_DEPTH = 16
+
+_HEADER_END_RE = re.compile(rb'\r?\n\r?\n')
+_BLANK_LINES_RE = re.compile(r'\n\s*\n\s*(\n\s*)+')
+_header_parser = BytesHeaderParser()
+
+
+@dataclass
+class MimePart:
+    headers: EmailMessage
+    start: int  # payload span in the raw message
+    end: int
+
+    @property
+    def is_attachment(self) -> bool:
+        return self.headers.get_content_disposition() == "attachment"
+
+
+def parse_headers(raw: bytes, start: int = 0, end: Optional[int] = None) -> Tuple[EmailMessage, int]:
+    """Parse the header block at raw[start:]; returns the headers and where the payload starts"""
+    end = len(raw) if end is None else end
+    if raw[start:start + 2] == b"\r\n":
+        return _header_parser.parsebytes(b""), start + 2
+    if raw[start:start + 1] == b"\n":
+        return _header_parser.parsebytes(b""), start + 1
+    match = _HEADER_END_RE.search(raw, start, end)
+    header_end = match.start() + 1 if match else end
+    body_start = match.end() if match else end
+    return _header_parser.parsebytes(raw[start:header_end]), body_start
+
+
+def iter_parts(raw: bytes, headers: EmailMessage, start: int, end: int, depth: int = 0) -> Iterator[MimePart]:
+    """Yield the leaf parts under headers, whose payload is raw[start:end], in order"""
+    boundary = headers.get_boundary() if headers.get_content_maintype() == "multipart" else None
+    if not boundary or depth >= MAX_DEPTH:
+        yield MimePart(headers, start, end)
+        return
+
+    delimiter = b"--" + boundary.encode("ascii", errors="replace")
+    position = _find_delimiter(raw, delimiter, start, end)
+    while position != -1:
+        after = position + len(delimiter)
+        if raw[after:after + 2] == b"--":
+            return  # close delimiter
+        line_end = raw.find(b"\n", after, end)
+        part_start = line_end + 1 if line_end != -1 else end
+        next_position = _find_delimiter(raw, delimiter, part_start, end)
+        part_end = next_position if next_position != -1 else end
+        # The line break before a delimiter belongs to the delimiter
+        if raw[part_end - 2:part_end] == b"\r\n" and next_position != -1:
+            part_end -= 2
+        elif raw[part_end - 1:part_end] == b"\n" and next_position != -1:
+            part_end -= 1
+
+        part_headers, body_start = parse_headers(raw, part_start, part_end)
+        yield from iter_parts(raw, part_headers, min(body_start, part_end), part_end, depth + 1)
+        position = next_position
+
+
+def _find_delimiter(raw: bytes, delimiter: bytes, start: int, end: int) -> int:
+    """Next boundary delimiter that starts a line, or -1"""
+    position = raw.find(delimiter, start, end)
+    while position > start and raw[position - 1:position] != b"\n":
+        position = raw.find(delimiter, position + 1, end)
+    return position
+
+
+def extract_message(raw: bytes, max_bytes: int = DEFAULT_BODY_MAX_BYTES) -> Tuple[EmailMessage, str]:
+    """Top-level headers and the bounded text body of a raw message"""
+    headers, body_start = parse_headers(raw)
+    html_part = None
+    for part in iter_parts(raw, headers, body_start, len(raw)):
+        if part.is_attachment or part.headers.get_content_maintype() != "text":
+            continue
+        subtype = part.headers.get_content_subtype()
+        if subtype == "plain":
+            return headers, _decode_part(raw, part, "plain", max_bytes)
+        if subtype == "html" and html_part is None:
+            html_part = part
+    if html_part is not None:
+        return headers, _decode_part(raw, html_part, "html", max_bytes)
+    return headers, ""
+
+
+def _decode_part(raw: bytes, part: MimePart, subtype: str, max_bytes: int) -> str:
+    return decode_payload(
+        memoryview(raw)[part.start:part.end], part.headers.get("Content-Transfer-Encoding"),
+        part.headers.get_content_charset(), subtype, max_bytes
+    )
+
+
+def encoded_limit(subtype: str, max_bytes: int) -> int:
+    """Encoded bytes worth decoding to fill max_bytes of text.
+
+    Transfer encodings expand text by at most ~1.4x; HTML gets extra room for markup.
+    """
+    return max_bytes * (8 if subtype == "html" else 2) + 4
+
+
+def decode_payload(data, encoding: Optional[str], charset: Optional[str],
+                   subtype: str = "plain", max_bytes: int = DEFAULT_BODY_MAX_BYTES) -> str:
+    """Decode a (possibly truncated) text part to at most max_bytes of UTF-8"""
+    data = bytes(data[:encoded_limit(subtype, max_bytes)])
+    encoding = (encoding or "7bit").strip().lower()
+    if encoding == "base64":
+        data = b"".join(data.split())
+        try:
+            data = base64.b64decode(data[:len(data) // 4 * 4])
+        except (binascii.Error, ValueError):
+            return ""
+    elif encoding == "quoted-printable":
+        data = quopri.decodestring(data)
+
+    text = data.decode(_codec(charset), errors="replace")
+    if subtype == "html":
+        text = html_to_text(text)
+    return truncate_utf8(text.strip(), max_bytes)
+
+
+def _codec(charset: Optional[str]) -> str:
+    if charset:
+        try:
+            return codecs.lookup(charset.strip().strip('"')).name
+        except LookupError:
+            pass
+    return "utf-8"
+
+
+def truncate_utf8(text: str, max_bytes: int) -> str:
+    encoded = text.encode("utf-8")
+    if len(encoded) <= max_bytes:
+        return text
+    return encoded[:max_bytes].decode("utf-8", errors="ignore")
+
+
+class _HTMLText(HTMLParser):
+    BLOCK_TAGS = {"p", "div", "br", "li", "tr", "table", "ul", "ol", "blockquote", "pre",
+                  "h1", "h2", "h3", "h4", "h5", "h6", "hr"}
+    SKIP_TAGS = {"script", "style", "head", "title"}
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.chunks: List[str] = []
+        self.skipping = 0
+
+    def handle_starttag(self, tag, attrs):
+        if tag in self.SKIP_TAGS:
+            self.skipping += 1
+        elif tag in self.BLOCK_TAGS:
+            self.chunks.append("\n")
+
+    def handle_endtag(self, tag):
+        if tag in self.SKIP_TAGS:
+            self.skipping = max(0, self.skipping - 1)
+        elif tag in self.BLOCK_TAGS:
+            self.chunks.append("\n")
+
+    def handle_data(self, data):
+        if not self.skipping:
+            self.chunks.append(data)
+
+
+def html_to_text(html: str) -> str:
+    parser = _HTMLText()
+    parser.feed(html)
+    parser.close()
+    lines = (" ".join(line.split()) for line in "".join(parser.chunks).splitlines())
+    return _BLANK_LINES_RE.sub("\n\n", "\n".join(lines)).strip()
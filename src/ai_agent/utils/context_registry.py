@@ -0,0 +1,163 @@
+"""
+Process-wide registry for the context store behind retrieve_context_node.
+
+The store is loaded and indexed once per process. reload_if_changed() is a
+cheap stat walk over the documents directory; only when that signature moves
+are the files hashed, and the index is rebuilt only when the content hash
+differs from the one it was built from. Reloads build the new store while the
+old one keeps serving, then swap. A rebuilt index goes into a new version
+directory; the old version's files are deleted only once the store mapping
+them has been garbage collected, i.e. no query still uses it.
+"""
+import os
+import sys
+import threading
+import time
+import weakref
+from typing import Any, Dict, Optional, Tuple, Union
+
+from .context_store import DEFAULT_MAX_ITEMS, DEFAULT_THRESHOLD, MockContextStore
+from .retrieval import BM25Index, hash_documents, index_exists, remove_index_version, DOC_EXTENSIONS
+
+DEFAULT_DOCS_DIR = os.path.abspath(
+    os.path.join(os.path.dirname(__file__), '../../../data/context_docs')
+)
+DEFAULT_INDEX_DIR = os.path.abspath(
+    os.path.join(os.path.dirname(__file__), '../../../data/context_index')
+)
+
+ContextSource = Union[BM25Index, MockContextStore]
+
+
+def stat_signature(docs_dir: str) -> Optional[Tuple]:
+    """(path, size, mtime) of every document, or None when the directory is missing"""
+    if not os.path.isdir(docs_dir):
+        return None
+    entries = []
+    for root, dirs, files in os.walk(docs_dir):
+        dirs.sort()
+        for name in sorted(files):
+            if name.lower().endswith(DOC_EXTENSIONS):
+                stat = os.stat(os.path.join(root, name))
+                entries.append((os.path.join(root, name), stat.st_size, stat.st_mtime_ns))
+    return tuple(entries)
+
+
+def _deep_size(obj: Any, seen: Optional[set] = None) -> int:
+    """Approximate heap footprint of nested dicts, lists and strings"""
+    seen = seen if seen is not None else set()
+    if id(obj) in seen:
+        return 0
+    seen.add(id(obj))
+    size = sys.getsizeof(obj)
+    if isinstance(obj, dict):
+        size += sum(_deep_size(key, seen) + _deep_size(value, seen) for key, value in obj.items())
+    elif isinstance(obj, (list, tuple, set)):
+        size += sum(_deep_size(item, seen) for item in obj)
+    return size
+
+
+class ContextRegistry:
+    def __init__(self, docs_dir: Optional[str] = None, index_dir: Optional[str] = None):
+        self.docs_dir = docs_dir or os.getenv("CONTEXT_DOCS_DIR", DEFAULT_DOCS_DIR)
+        self.index_dir = index_dir or os.getenv("CONTEXT_INDEX_DIR", DEFAULT_INDEX_DIR)
+        # Same variables as Settings.CONTEXT_SIMILARITY_THRESHOLD / MAX_CONTEXT_ITEMS
+        self.threshold = float(os.getenv("CONTEXT_SIMILARITY_THRESHOLD", str(DEFAULT_THRESHOLD)))
+        self.max_items = int(os.getenv("MAX_CONTEXT_ITEMS", str(DEFAULT_MAX_ITEMS)))
+        self._lock = threading.Lock()
+        self._store: Optional[ContextSource] = None
+        self._signature: Optional[Tuple] = None
+        self.stats = {
+            "kind": None, "loads": 0, "builds": 0, "load_seconds": 0.0,
+            "passages": 0, "heap_bytes": 0, "mapped_bytes": 0, "loaded_at": None,
+        }
+
+    def get(self) -> ContextSource:
+        """The current store, loading it on first use"""
+        store = self._store
+        if store is None:
+            with self._lock:
+                if self._store is None:
+                    self._load(force_rebuild=False)
+                store = self._store
+        return store
+
+    def reload_if_changed(self) -> bool:
+        """Reload when the documents changed since the last load; returns True if swapped"""
+        if self._store is not None and stat_signature(self.docs_dir) == self._signature:
+            return False
+        with self._lock:
+            return self._load(force_rebuild=False)
+
+    def reload(self, force_rebuild: bool = True) -> bool:
+        """Reload now, rebuilding the index from the documents by default"""
+        with self._lock:
+            return self._load(force_rebuild=force_rebuild)
+
+    def metrics(self) -> Dict[str, Any]:
+        with self._lock:
+            return {**self.stats, "docs_dir": self.docs_dir, "index_dir": self.index_dir}
+
+    def _load(self, force_rebuild: bool) -> bool:
+        started = time.perf_counter()
+        signature = stat_signature(self.docs_dir)
+        has_index = index_exists(self.index_dir)
+
+        if signature is None and not has_index:
+            if isinstance(self._store, MockContextStore):
+                return False
+            store: ContextSource = MockContextStore()
+        elif signature is None:
+            # Prebuilt index shipped without its documents
+            store = BM25Index.load(self.index_dir)
+        else:
+            docs_hash = hash_documents(self.docs_dir)
+            current = self._store
+            if not force_rebuild and isinstance(current, BM25Index) and current.docs_hash == docs_hash:
+                self._signature = signature
+                return False
+
+            store = BM25Index.load(self.index_dir) if has_index and not force_rebuild else None
+            if store is None or store.docs_hash != docs_hash:
+                BM25Index.from_directory(self.docs_dir).save(self.index_dir)
+                store = BM25Index.load(self.index_dir)
+                self.stats["builds"] += 1
+
+        previous, self._store = self._store, store
+        self._signature = signature
+        if isinstance(previous, BM25Index) and previous.path and previous.path != getattr(store, "path", None):
+            # In-flight queries may still read the old mapping
+            weakref.finalize(previous, remove_index_version, previous.path)
+        self._record_load(store, time.perf_counter() - started)
+        return True
+
+    def _record_load(self, store: ContextSource, seconds: float):
+        if isinstance(store, BM25Index):
+            kind, passages = "bm25", len(store)
+            heap_bytes = _deep_size(store.vocab) + _deep_size(store.sources)
+            mapped_bytes = store.nbytes
+        else:
+            kind = "mock"
+            passages = len(store.email_index.keys) + len(store.meeting_index.keys)
+            heap_bytes = _deep_size(store.email_context) + _deep_size(store.meeting_context)
+            mapped_bytes = 0
+        self.stats.update(
+            kind=kind, passages=passages, load_seconds=seconds, heap_bytes=heap_bytes,
+            mapped_bytes=mapped_bytes, loaded_at=time.time(), loads=self.stats["loads"] + 1,
+        )
+        print(f"Context store loaded: {kind}, {passages} entries in {seconds * 1000:.0f} ms "
+              f"(~{heap_bytes / 1e6:.1f} MB heap, {mapped_bytes / 1e6:.1f} MB mapped)")
+
+
+_registry: Optional[ContextRegistry] = None
+_registry_lock = threading.Lock()
+
+
+def get_context_registry() -> ContextRegistry:
+    """Process-wide registry configured from the environment"""
+    global _registry
+    if _registry is None:
+        with _registry_lock:
+            if _registry is None:
+                _registry = ContextRegistry()
+    return _registry
@@ -0,0 +1,141 @@
+"""
+In-memory keyed context used when no document index is available.
+"""
+import re
+from typing import List, Dict, Optional, Iterable, Tuple
+
+from ..state import ActionType
+
+# Defaults of Settings.CONTEXT_SIMILARITY_THRESHOLD / MAX_CONTEXT_ITEMS; the
+# registry reads the configured values and passes them in
+DEFAULT_THRESHOLD = 0.3
+DEFAULT_MAX_ITEMS = 10
+
+_TOKEN_RE = re.compile(r'\w+')
+
+
+def tokenize(text: str) -> List[str]:
+    return _TOKEN_RE.findall(text.lower())
+
+
+class ContextIndex:
+    """Token-to-key inverted index over keyed context entries.
+
+    A key matches a query when the share of its tokens present in the query
+    reaches the similarity threshold. Built once; lookups only touch the
+    posting lists of the query's tokens.
+    """
+
+    def __init__(self, context: Optional[Dict[str, List[str]]] = None):
+        self.keys: List[str] = []
+        self.key_sizes: List[int] = []
+        self.contexts: List[List[str]] = []
+        self.postings: Dict[str, List[int]] = {}
+        for key, contexts in (context or {}).items():
+            self.add(key, contexts)
+
+    def add(self, key: str, contexts: List[str]):
+        key_id = len(self.keys)
+        key_tokens = set(tokenize(key))
+        self.keys.append(key)
+        self.key_sizes.append(len(key_tokens))
+        self.contexts.append(list(contexts))
+        for token in key_tokens:
+            self.postings.setdefault(token, []).append(key_id)
+
+    def __len__(self) -> int:
+        return len(self.keys)
+
+    def score(self, query_tokens: Iterable[str], threshold: float) -> List[Tuple[float, int]]:
+        """Return (score, key_id) for every key at or above threshold"""
+        overlaps: Dict[int, int] = {}
+        for token in query_tokens:
+            for key_id in self.postings.get(token, ()):
+                overlaps[key_id] = overlaps.get(key_id, 0) + 1
+        return [
+            (overlap / self.key_sizes[key_id], key_id)
+            for key_id, overlap in overlaps.items()
+            if overlap / self.key_sizes[key_id] >= threshold
+        ]
+
+
+class MockContextStore:
+    def __init__(self):
+        self.email_context = {
+            "system outage": [
+                "RCA-2024-001: Database connection pool exhaustion caused by memory leak in connection driver.",
+                "Prevention: Implemented connection pooling monitoring and automated restart procedures.",
+                "SLA Impact: 99.9% uptime target maintained through quick response protocols."
+            ],
+            "production environment": [
+                "Production deployment checklist updated after incident review.",
+                "Monitoring thresholds adjusted for early detection of similar issues.",
+                "Backup systems verified and tested monthly."
+            ],
+            "database outage": [
+                "Database backup procedures verified and tested weekly.",
+                "Payment processing failover systems activated during outages.",
+                "Customer communication templates for service disruptions available."
+            ],
+            "customer communication": [
+                "Professional response templates for customer inquiries available.",
+                "Standard escalation procedures for urgent customer issues documented.",
+                "Customer satisfaction surveys show 95% positive response to incident communications."
+            ]
+        }
+        
+        self.meeting_context = {
+            "meeting scheduling": [
+                "Standard meeting duration: 30 minutes for planning sessions, 60 minutes for reviews.",
+                "Conference room availability: Check Outlook calendar for room bookings.",
+                "Meeting best practices: Send agenda 24 hours in advance."
+            ],
+            "q1 planning": [
+                "Q1 planning typically includes budget review, goal setting, and resource allocation.",
+                "Previous Q1 planning meetings included: Sales targets, Marketing campaigns, Engineering roadmap.",
+                "Recommended attendees for Q1 planning: Department heads, Project managers, Finance team."
+            ],
+            "team meetings": [
+                "Weekly standup meetings: Mondays 9 AM, Conference Room A.",
+                "Monthly all-hands meetings: First Friday of each month, Main auditorium.",
+                "Quarterly reviews: End of each quarter, includes performance metrics and planning."
+            ]
+        }
+        
+        self.email_index = ContextIndex(self.email_context)
+        self.meeting_index = ContextIndex(self.meeting_context)
+    
+    def fuzzy_search(self, query: str, action_type=None, threshold: Optional[float] = None,
+                     max_items: Optional[int] = None) -> List[str]:
+        """Contexts for keys matching the query, best match first.
+
+        Results are deduplicated and ordered by score, then by key order, and
+        capped at max_items.
+        """
+        threshold = DEFAULT_THRESHOLD if threshold is None else threshold
+        max_items = DEFAULT_MAX_ITEMS if max_items is None else max_items
+        
+        if action_type == ActionType.EMAIL_REPLY:
+            indexes = [self.email_index]
+        elif action_type == ActionType.SCHEDULE_MEETING:
+            indexes = [self.meeting_index]
+        else:
+            indexes = [self.email_index, self.meeting_index]
+        
+        query_tokens = set(tokenize(query))
+        ranked = []
+        for rank, index in enumerate(indexes):
+            for score, key_id in index.score(query_tokens, threshold):
+                ranked.append((-score, rank, key_id, index))
+        ranked.sort(key=lambda item: item[:3])
+        
+        results = []
+        seen = set()
+        for _, _, key_id, index in ranked:
+            for context in index.contexts[key_id]:
+                if context not in seen:
+                    seen.add(context)
+                    results.append(context)
+                    if len(results) >= max_items:
+                        return results
+        return results
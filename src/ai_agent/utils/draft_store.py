@@ -0,0 +1,260 @@
+"""
+Persistent store for generated drafts.
+
+Drafts go into one SQLite table (WAL mode) indexed by original Message-ID,
+recipient and creation time. Writes are group-committed: save() hands the
+draft to a single writer thread, which inserts everything queued so far in
+one transaction and then wakes every caller waiting on that batch. Draft IDs
+are random UUIDs, so concurrent saves never collide.
+
+    PYTHONPATH=src python -m ai_agent.utils.draft_store --recipient alice@example.com
+"""
+import argparse
+import atexit
+import json
+import os
+import queue
+import sqlite3
+import threading
+import time
+import uuid
+from typing import Any, Dict, List, Optional, Tuple
+
+DEFAULT_DRAFT_STORE_PATH = os.path.abspath(
+    os.path.join(os.path.dirname(__file__), '../../../data/drafts.sqlite3')
+)
+STATUSES = ("pending", "sent", "discarded")
+
+
+class _Waiter:
+    """Completion signal for one queued save; carries the commit error, if any"""
+    __slots__ = ("event", "error")
+
+    def __init__(self):
+        self.event = threading.Event()
+        self.error: Optional[Exception] = None
+
+    def wait(self):
+        self.event.wait()
+        if self.error is not None:
+            raise self.error
+
+
+_COLUMNS = ("draft_id", "kind", "message_id", "recipient", "subject", "body", "payload", "status", "created_at")
+
+
+class DraftStore:
+    def __init__(self, path: str = DEFAULT_DRAFT_STORE_PATH, max_batch: int = 1000):
+        self.path = path
+        self.max_batch = max_batch
+        self.stats = {"saved": 0, "commits": 0}
+        self._queue: "queue.Queue[Optional[Tuple[Optional[tuple], Optional[_Waiter]]]]" = queue.Queue()
+        self._lock = threading.Lock()  # guards the connection for readers and the writer
+        self._writer: Optional[threading.Thread] = None
+        self._closed = False
+
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._db = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=FULL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS drafts ("
+            " draft_id TEXT PRIMARY KEY, kind TEXT NOT NULL, message_id TEXT, recipient TEXT,"
+            " subject TEXT, body TEXT NOT NULL, payload TEXT NOT NULL,"
+            " status TEXT NOT NULL DEFAULT 'pending', created_at REAL NOT NULL)"
+        )
+        self._db.execute("CREATE INDEX IF NOT EXISTS drafts_message_id ON drafts (message_id)")
+        self._db.execute("CREATE INDEX IF NOT EXISTS drafts_recipient ON drafts (recipient, status, created_at)")
+        self._db.execute("CREATE INDEX IF NOT EXISTS drafts_created_at ON drafts (created_at)")
+        self._db.execute("CREATE INDEX IF NOT EXISTS drafts_status ON drafts (status, created_at)")
+
+    @classmethod
+    def from_env(cls) -> "DraftStore":
+        return cls(
+            path=os.getenv("DRAFT_STORE_PATH", DEFAULT_DRAFT_STORE_PATH),
+            max_batch=int(os.getenv("DRAFT_STORE_MAX_BATCH", "1000"))
+        )
+
+    def save(self, result: Dict[str, Any], wait: bool = True) -> str:
+        """Queue a draft result for the next group commit and return its draft ID.
+
+        With wait=True (the default) this returns once the draft is committed;
+        wait=False returns immediately and flush() waits for everything queued.
+        """
+        if self._closed:
+            raise RuntimeError("Draft store is closed")
+        draft_id = uuid.uuid4().hex
+        row = (draft_id, *_draft_columns(result), "pending", time.time())
+        done = _Waiter() if wait else None
+        self._ensure_writer()
+        self._queue.put((row, done))
+        if done is not None:
+            done.wait()
+        return draft_id
+
+    def flush(self):
+        """Block until every draft queued so far is committed"""
+        if self._writer is not None:
+            done = _Waiter()
+            self._queue.put((None, done))
+            done.wait()
+
+    def close(self):
+        if self._closed:
+            return
+        self.flush()
+        self._closed = True
+        if self._writer is not None:
+            self._queue.put(None)
+            self._writer.join()
+        with self._lock:
+            self._db.close()
+
+    def get(self, draft_id: str) -> Optional[Dict[str, Any]]:
+        rows = self._query("SELECT * FROM drafts WHERE draft_id = ?", (draft_id,))
+        return rows[0] if rows else None
+
+    def for_message(self, message_id: str) -> List[Dict[str, Any]]:
+        """Every draft generated for the message with this Message-ID, oldest first"""
+        return self._query("SELECT * FROM drafts WHERE message_id = ? ORDER BY created_at", (message_id,))
+
+    def pending(self, recipient: Optional[str] = None, since: Optional[float] = None,
+                until: Optional[float] = None, limit: int = 100) -> List[Dict[str, Any]]:
+        """Pending drafts, newest first, optionally for one recipient and a created_at window"""
+        return self.list(status="pending", recipient=recipient, since=since, until=until, limit=limit)
+
+    def list(self, status: Optional[str] = None, recipient: Optional[str] = None,
+             since: Optional[float] = None, until: Optional[float] = None, limit: int = 100) -> List[Dict[str, Any]]:
+        clauses, params = [], []
+        for clause, value in (("status = ?", status), ("recipient = ?", recipient),
+                              ("created_at >= ?", since), ("created_at < ?", until)):
+            if value is not None:
+                clauses.append(clause)
+                params.append(value)
+        where = f" WHERE {' AND '.join(clauses)}" if clauses else ""
+        return self._query(f"SELECT * FROM drafts{where} ORDER BY created_at DESC LIMIT ?", (*params, limit))
+
+    def set_status(self, draft_ids: List[str], status: str) -> int:
+        """Mark drafts sent or discarded; returns how many were updated"""
+        if status not in STATUSES:
+            raise ValueError(f"Unknown draft status {status!r}, expected one of {STATUSES}")
+        self.flush()
+        with self._lock:
+            cursor = self._db.executemany(
+                "UPDATE drafts SET status = ? WHERE draft_id = ?", [(status, draft_id) for draft_id in draft_ids]
+            )
+            return cursor.rowcount
+
+    def counts(self) -> Dict[str, int]:
+        with self._lock:
+            return dict(self._db.execute("SELECT status, COUNT(*) FROM drafts GROUP BY status").fetchall())
+
+    def _query(self, sql: str, params: tuple) -> List[Dict[str, Any]]:
+        with self._lock:
+            cursor = self._db.execute(sql, params)
+            names = [column[0] for column in cursor.description]
+            rows = cursor.fetchall()
+        drafts = []
+        for row in rows:
+            draft = dict(zip(names, row))
+            draft["payload"] = json.loads(draft["payload"])
+            drafts.append(draft)
+        return drafts
+
+    def _ensure_writer(self):
+        if self._writer is None:
+            with self._lock:
+                if self._writer is None:
+                    self._writer = threading.Thread(target=self._write_loop, name="draft-store-writer", daemon=True)
+                    self._writer.start()
+
+    def _write_loop(self):
+        while True:
+            entry = self._queue.get()
+            if entry is None:
+                return
+            # Group commit: take whatever else is already queued, up to max_batch
+            batch = [entry]
+            while len(batch) < self.max_batch:
+                try:
+                    entry = self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                if entry is None:
+                    self._queue.put(None)
+                    break
+                batch.append(entry)
+
+            rows = [row for row, _ in batch if row is not None]
+            error = None
+            if rows:
+                with self._lock:
+                    try:
+                        self._db.execute("BEGIN")
+                        self._db.executemany(
+                            f"INSERT INTO drafts ({', '.join(_COLUMNS)}) VALUES ({', '.join('?' * len(_COLUMNS))})",
+                            rows
+                        )
+                        self._db.execute("COMMIT")
+                        self.stats["saved"] += len(rows)
+                        self.stats["commits"] += 1
+                    except Exception as e:
+                        if self._db.in_transaction:
+                            self._db.execute("ROLLBACK")
+                        print(f"Could not save {len(rows)} draft(s): {e}")
+                        error = e
+            for row, done in batch:
+                if done is not None:
+                    done.error = error if row is not None else None
+                    done.event.set()
+
+
+def _draft_columns(result: Dict[str, Any]) -> tuple:
+    """(kind, message_id, recipient, subject, body, payload) for a draft node's result"""
+    kind = result.get("type", "unknown")
+    if kind == "meeting":
+        recipient = ", ".join(result.get("participants", [])) or None
+        subject, body = result.get("title"), result.get("description", "")
+    else:
+        recipient, subject, body = result.get("to"), result.get("subject"), result.get("body", "")
+    payload = {key: value for key, value in result.items() if key != "streamed"}
+    return kind, result.get("original_message_id"), recipient, subject, body, json.dumps(payload, default=str)
+
+
+_draft_store: Optional[DraftStore] = None
+_draft_store_lock = threading.Lock()
+
+
+def get_draft_store() -> DraftStore:
+    """Process-wide store configured from the environment; flushed at exit"""
+    global _draft_store
+    if _draft_store is None:
+        with _draft_store_lock:
+            if _draft_store is None:
+                _draft_store = DraftStore.from_env()
+                atexit.register(_draft_store.close)
+    return _draft_store
+
+
+def main():
+    parser = argparse.ArgumentParser(description="List saved drafts")
+    parser.add_argument("--status", default="pending", choices=STATUSES)
+    parser.add_argument("--recipient")
+    parser.add_argument("--message-id")
+    parser.add_argument("-n", "--limit", type=int, default=20)
+    args = parser.parse_args()
+
+    store = DraftStore.from_env()
+    if args.message_id:
+        drafts = store.for_message(args.message_id)
+    else:
+        drafts = store.list(status=args.status, recipient=args.recipient, limit=args.limit)
+    for draft in drafts:
+        created = time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(draft["created_at"]))
+        print(f"{draft['draft_id']}  {created}  {draft['status']:<9} {draft['kind']:<7} "
+              f"{draft['recipient'] or '-'}: {draft['subject'] or ''}")
+    print(f"{len(drafts)} draft(s); totals by status: {store.counts()}")
+
+
+if __name__ == "__main__":
+    main()
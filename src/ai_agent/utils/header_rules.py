@@ -0,0 +1,108 @@
+"""
+Header-based fast path in front of the LLM classifier.
+
+Obvious cases - bulk mail, mailing lists, auto-generated notifications,
+no-reply senders and configured sender/domain lists - are decided from the
+message headers alone so they never cost an LLM call.
+"""
+import os
+import re
+import threading
+from email.utils import parseaddr
+from typing import Dict, List, Optional, Tuple
+
+from ..state import ActionType, Message
+
+NOREPLY_RE = re.compile(
+    r'^(no[-_.]?reply|do[-_.]?not[-_.]?reply|mailer[-_.]daemon|postmaster|bounces?|notifications?)([-+_.].*)?@',
+    re.IGNORECASE
+)
+BULK_PRECEDENCE = {"bulk", "list", "junk", "auto_reply"}
+
+
+def _env_list(name: str) -> List[str]:
+    return [item.strip().lower() for item in os.getenv(name, "").split(",") if item.strip()]
+
+
+class HeaderRules:
+    def __init__(self, allow_senders: Optional[List[str]] = None, deny_senders: Optional[List[str]] = None,
+                 allow_domains: Optional[List[str]] = None, deny_domains: Optional[List[str]] = None,
+                 enabled: bool = True):
+        self.allow_senders = set(allow_senders or [])
+        self.deny_senders = set(deny_senders or [])
+        self.allow_domains = set(allow_domains or [])
+        self.deny_domains = set(deny_domains or [])
+        self.enabled = enabled
+        self._lock = threading.Lock()
+        self.stats = {"checked": 0, "skipped": 0, "llm_calls": 0, "llm_seconds": 0.0}
+
+    @classmethod
+    def from_env(cls) -> "HeaderRules":
+        return cls(
+            allow_senders=_env_list("PREFILTER_ALLOW_SENDERS"),
+            deny_senders=_env_list("PREFILTER_DENY_SENDERS"),
+            allow_domains=_env_list("PREFILTER_ALLOW_DOMAINS"),
+            deny_domains=_env_list("PREFILTER_DENY_DOMAINS"),
+            enabled=os.getenv("HEADER_PREFILTER", "1").lower() not in ("0", "false", "no")
+        )
+
+    def classify(self, message: Message) -> Optional[Tuple[ActionType, float, str]]:
+        """Return (action, confidence, reason) when headers decide the message, else None"""
+        if not self.enabled:
+            return None
+
+        decision = self._decide(message)
+        with self._lock:
+            self.stats["checked"] += 1
+            if decision:
+                self.stats["skipped"] += 1
+        return decision
+
+    def _decide(self, message: Message) -> Optional[Tuple[ActionType, float, str]]:
+        address = parseaddr(message.sender or "")[1].lower()
+        domain = address.rpartition("@")[2]
+        headers = {name.lower(): value for name, value in (message.headers or {}).items()}
+
+        if address in self.allow_senders or domain in self.allow_domains:
+            return ActionType.EMAIL_REPLY, 0.95, "allow-listed sender"
+        if address in self.deny_senders or domain in self.deny_domains:
+            return ActionType.NO_OP, 1.0, "deny-listed sender"
+        if headers.get("auto-submitted", "no").strip().lower() != "no":
+            return ActionType.NO_OP, 0.99, "Auto-Submitted"
+        if headers.get("precedence", "").strip().lower() in BULK_PRECEDENCE:
+            return ActionType.NO_OP, 0.98, "Precedence: bulk"
+        if "list-unsubscribe" in headers or "list-id" in headers:
+            return ActionType.NO_OP, 0.95, "mailing list"
+        if NOREPLY_RE.match(address):
+            return ActionType.NO_OP, 0.95, "no-reply sender"
+        return None
+
+    def record_llm_latency(self, seconds: float, emails: int = 1):
+        """Track LLM classification cost so skipped messages can be priced"""
+        with self._lock:
+            self.stats["llm_calls"] += emails
+            self.stats["llm_seconds"] += seconds
+
+    def report(self) -> Dict[str, float]:
+        with self._lock:
+            stats = dict(self.stats)
+        checked = stats["checked"] or 1
+        avg_llm = stats["llm_seconds"] / stats["llm_calls"] if stats["llm_calls"] else 0.0
+        return {
+            "checked": stats["checked"],
+            "skipped": stats["skipped"],
+            "skip_ratio": stats["skipped"] / checked,
+            "avg_llm_seconds": avg_llm,
+            "latency_saved_seconds": stats["skipped"] * avg_llm,
+        }
+
+
+_header_rules: Optional[HeaderRules] = None
+
+
+def get_header_rules() -> HeaderRules:
+    """Process-wide rules configured from the environment"""
+    global _header_rules
+    if _header_rules is None:
+        _header_rules = HeaderRules.from_env()
+    return _header_rules
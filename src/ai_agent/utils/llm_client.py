@@ -1,15 +1,182 @@
+import asyncio
+import hashlib
+import json
 import os
 import re
-from typing import Optional
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from contextlib import aclosing, closing
+from typing import AsyncIterator, Awaitable, Callable, Dict, Iterator, List, Optional, Tuple, TypeVar
 from dotenv import load_dotenv
+from .llm_router import Backend, LLMRouter, tier_for
+from .metrics import get_metrics
+from .rate_limit import LLMRequestError, LLMUnavailableError
 
 load_dotenv()
 
+DEFAULT_CACHE_PATH = os.path.abspath(
+    os.path.join(os.path.dirname(__file__), '../../../data/llm_cache.sqlite3')
+)
+
+
+_MOCK_CHUNK_RE = re.compile(r'\S+\s*|\s+')
+
+T = TypeVar("T")
+
+
+def collect_stream(chunks: Iterator[str], on_chunk: Optional[Callable[[str], None]] = None) -> Tuple[str, Dict[str, float]]:
+    """Drain a stream_response iterator; returns the full text and its timing"""
+    started = time.perf_counter()
+    first_chunk_at = None
+    parts = []
+    for chunk in chunks:
+        if first_chunk_at is None:
+            first_chunk_at = time.perf_counter()
+        parts.append(chunk)
+        if on_chunk:
+            on_chunk(chunk)
+    return "".join(parts), _stream_stats(started, first_chunk_at, len(parts))
+
+
+async def acollect_stream(chunks: AsyncIterator[str], on_chunk: Optional[Callable[[str], None]] = None) -> Tuple[str, Dict[str, float]]:
+    """Async counterpart of collect_stream for astream_response"""
+    started = time.perf_counter()
+    first_chunk_at = None
+    parts = []
+    async for chunk in chunks:
+        if first_chunk_at is None:
+            first_chunk_at = time.perf_counter()
+        parts.append(chunk)
+        if on_chunk:
+            on_chunk(chunk)
+    return "".join(parts), _stream_stats(started, first_chunk_at, len(parts))
+
+
+def _stream_stats(started: float, first_chunk_at: Optional[float], chunks: int) -> Dict[str, float]:
+    # Provider stream events carry roughly one token each, so chunks stand in for tokens
+    finished = time.perf_counter()
+    first_chunk_at = first_chunk_at or finished
+    generating = finished - first_chunk_at
+    return {
+        "ttft_seconds": first_chunk_at - started,
+        "total_seconds": finished - started,
+        "tokens": chunks,
+        "tokens_per_sec": chunks / generating if generating > 0 else 0.0,
+    }
+
+
+def echo_chunk(chunk: str):
+    """on_chunk callback that writes chunks to stdout as they arrive"""
+    print(chunk, end="", flush=True)
+
+
+class LLMResponseCache:
+    """Two-tier response cache: in-memory LRU in front of a SQLite table.
+    
+    Entries live in a namespace (e.g. "classification", "draft") that sets
+    their TTL. Expired entries are dropped on read; the disk tier is trimmed
+    to max_disk_items by least recent use.
+    """
+    
+    def __init__(self, path: str, ttls: Dict[str, float], default_ttl: float,
+                 max_memory_items: int = 1024, max_disk_items: int = 100_000):
+        self.path = path
+        self.ttls = ttls
+        self.default_ttl = default_ttl
+        self.max_memory_items = max_memory_items
+        self.max_disk_items = max_disk_items
+        self.stats = {"hits": 0, "memory_hits": 0, "disk_hits": 0, "misses": 0, "evictions": 0}
+        self._memory: "OrderedDict[Tuple[str, str], Tuple[str, float]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._puts_since_trim = 0
+    
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._db = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS llm_cache ("
+            " namespace TEXT NOT NULL, key TEXT NOT NULL, value TEXT NOT NULL,"
+            " expires_at REAL NOT NULL, last_access REAL NOT NULL,"
+            " PRIMARY KEY (namespace, key))"
+        )
+        self._db.execute("CREATE INDEX IF NOT EXISTS llm_cache_last_access ON llm_cache (last_access)")
+    
+    def get(self, namespace: str, key: str) -> Optional[str]:
+        now = time.time()
+        with self._lock:
+            entry = self._memory.get((namespace, key))
+            if entry is not None:
+                value, expires_at = entry
+                if expires_at > now:
+                    self._memory.move_to_end((namespace, key))
+                    self.stats["hits"] += 1
+                    self.stats["memory_hits"] += 1
+                    return value
+                del self._memory[(namespace, key)]
+    
+            row = self._db.execute(
+                "SELECT value, expires_at FROM llm_cache WHERE namespace = ? AND key = ?",
+                (namespace, key)
+            ).fetchone()
+            if row is None or row[1] <= now:
+                if row is not None:
+                    self._db.execute("DELETE FROM llm_cache WHERE namespace = ? AND key = ?", (namespace, key))
+                self.stats["misses"] += 1
+                return None
+    
+            self._db.execute(
+                "UPDATE llm_cache SET last_access = ? WHERE namespace = ? AND key = ?",
+                (now, namespace, key)
+            )
+            self._remember(namespace, key, row[0], row[1])
+            self.stats["hits"] += 1
+            self.stats["disk_hits"] += 1
+            return row[0]
+    
+    def put(self, namespace: str, key: str, value: str):
+        now = time.time()
+        expires_at = now + self.ttls.get(namespace, self.default_ttl)
+        with self._lock:
+            self._remember(namespace, key, value, expires_at)
+            self._db.execute(
+                "INSERT OR REPLACE INTO llm_cache (namespace, key, value, expires_at, last_access)"
+                " VALUES (?, ?, ?, ?, ?)",
+                (namespace, key, value, expires_at, now)
+            )
+            self._puts_since_trim += 1
+            if self._puts_since_trim >= 100:
+                self._trim_disk(now)
+    
+    def _remember(self, namespace: str, key: str, value: str, expires_at: float):
+        self._memory[(namespace, key)] = (value, expires_at)
+        self._memory.move_to_end((namespace, key))
+        while len(self._memory) > self.max_memory_items:
+            self._memory.popitem(last=False)
+            self.stats["evictions"] += 1
+    
+    def _trim_disk(self, now: float):
+        self._puts_since_trim = 0
+        self._db.execute("DELETE FROM llm_cache WHERE expires_at <= ?", (now,))
+        (count,) = self._db.execute("SELECT COUNT(*) FROM llm_cache").fetchone()
+        excess = count - self.max_disk_items
+        if excess > 0:
+            self._db.execute(
+                "DELETE FROM llm_cache WHERE rowid IN"
+                " (SELECT rowid FROM llm_cache ORDER BY last_access LIMIT ?)",
+                (excess,)
+            )
+            self.stats["evictions"] += excess
+
 
 class LLMClient:
     _instance = None
     _initialized = False
     
+    MAX_TOKENS = 500
+    PROVIDER_NAMES = {"openai": "OpenAI", "anthropic": "Anthropic", "gemini": "Gemini", "mock": "Mock"}
+    
     def __new__(cls):
         if cls._instance is None:
             cls._instance = super(LLMClient, cls).__new__(cls)
@@ -17,71 +184,502 @@ class LLMClient:
     
     def __init__(self, provider: Optional[str] = None):
         if not self._initialized:
-            self.provider = provider or os.getenv("LLM_PROVIDER", "mock")
             self.openai_key = os.getenv("OPENAI_API_KEY")
             self.anthropic_key = os.getenv("ANTHROPIC_API_KEY")
             self.gemini_key = os.getenv("GEMINI_API_KEY")
+            # Simulated provider latency for the mock, used by benchmarks
+            self.mock_latency = float(os.getenv("MOCK_LLM_LATENCY", "0"))
+            # Simulated per-chunk delay when the mock streams
+            self.mock_stream_delay = float(os.getenv("MOCK_LLM_STREAM_DELAY", "0"))
+            # Canned answer for classification prompts, e.g. "EMAIL_REPLY:0.90"
+            self.mock_classification = os.getenv("MOCK_LLM_CLASSIFICATION")
             self._openai_client = None
             self._anthropic_client = None
-            self._gemini_client = None
+            self._gemini_models = {}
+            # Async SDK clients keep one pooled HTTP connection set per provider and are
+            # bound to the event loop that created them; LLM_MAX_CONNECTIONS caps requests in flight
+            self.max_connections = int(os.getenv("LLM_MAX_CONNECTIONS", "20"))
+            self._async_loop = None
+            self._async_openai_client = None
+            self._async_anthropic_client = None
+            self._async_closer = None
+            # Provider/model backends per tier, each with its limiter and latency window (see llm_router.py)
+            self.router = self.create_router(provider)
+            # Opt-in response cache (LLM_CACHE=1)
+            self.cache = self._create_cache() if os.getenv("LLM_CACHE", "").lower() in ("1", "true", "yes") else None
             self.__class__._initialized = True
     
-    def generate_response(self, prompt: str) -> str:
-        if self.provider == "openai" and self.openai_key:
-            return self._openai_generate(prompt)
-        elif self.provider == "anthropic" and self.anthropic_key:
-            return self._anthropic_generate(prompt)
-        elif self.provider == "gemini" and self.gemini_key:
-            return self._gemini_generate(prompt)
-        else:
-            return self._mock_generate(prompt)
-    
-    def _openai_generate(self, prompt: str) -> str:
+    def generate_response(self, prompt: str, cache_namespace: str = "default") -> str:
+        """Completion for prompt from the fastest healthy backend of the namespace's tier.
+        
+        Backends are tried down the ranking; LLMUnavailableError if none can serve it,
+        LLMRequestError right away if a provider rejects the request itself.
+        """
+        tier = tier_for(cache_namespace)
+        cache_key = self._cache_key(tier, prompt) if self.cache else None
+        if cache_key:
+            cached = self.cache.get(cache_namespace, cache_key)
+            if cached is not None:
+                return cached
+    
+        response = self._route(tier, lambda backend: self._generate(backend, prompt, cache_namespace))
+    
+        if cache_key:
+            self.cache.put(cache_namespace, cache_key, response)
+        return response
+    
+    async def agenerate_response(self, prompt: str, cache_namespace: str = "default") -> str:
+        """Async counterpart of generate_response; does not block the event loop, and may hedge"""
+        tier = tier_for(cache_namespace)
+        cache_key = self._cache_key(tier, prompt) if self.cache else None
+        if cache_key:
+            cached = self.cache.get(cache_namespace, cache_key)
+            if cached is not None:
+                return cached
+    
+        self._bind_event_loop()
+        response = await self._aroute(tier, lambda backend: self._agenerate(backend, prompt, cache_namespace))
+    
+        if cache_key:
+            self.cache.put(cache_namespace, cache_key, response)
+        return response
+    
+    def stream_response(self, prompt: str, cache_namespace: str = "default") -> Iterator[str]:
+        """Yield the completion in chunks as the provider produces them.
+        
+        Cache hits arrive as a single chunk. Until the first chunk, provider
+        errors are retried and then failed over like generate_response; later
+        ones can't be, since part of the text has already been handed out.
+        Either way the caller gets LLMUnavailableError (or LLMRequestError).
+        """
+        tier = tier_for(cache_namespace)
+        cache_key = self._cache_key(tier, prompt) if self.cache else None
+        if cache_key:
+            cached = self.cache.get(cache_namespace, cache_key)
+            if cached is not None:
+                yield cached
+                return
+    
+        metrics = get_metrics()
+        started = time.perf_counter()
+        backend, chunks, first = self._route(tier, lambda backend: self._open_stream(backend, prompt))
+        parts = []
+        with closing(chunks):
+            try:
+                if first is not None:
+                    if metrics.enabled:
+                        metrics.observe("agent_llm_ttft_seconds", time.perf_counter() - started,
+                                        provider=backend.provider, model=backend.model)
+                    parts.append(first)
+                    yield first
+                for chunk in chunks:
+                    parts.append(chunk)
+                    yield chunk
+            except (LLMUnavailableError, LLMRequestError) as e:
+                self._report_error(backend, e)
+                raise
+    
+        if metrics.enabled:
+            metrics.observe("agent_llm_request_seconds", time.perf_counter() - started,
+                            provider=backend.provider, model=backend.model, namespace=cache_namespace)
+        if cache_key:
+            self.cache.put(cache_namespace, cache_key, "".join(parts))
+    
+    async def astream_response(self, prompt: str, cache_namespace: str = "default") -> AsyncIterator[str]:
+        """Async counterpart of stream_response; a hedge races for the first chunk"""
+        tier = tier_for(cache_namespace)
+        cache_key = self._cache_key(tier, prompt) if self.cache else None
+        if cache_key:
+            cached = self.cache.get(cache_namespace, cache_key)
+            if cached is not None:
+                yield cached
+                return
+    
+        self._bind_event_loop()
+        metrics = get_metrics()
+        started = time.perf_counter()
+        backend, chunks, first = await self._aroute(
+            tier, lambda backend: self._aopen_stream(backend, prompt), discard=lambda opened: opened[1].aclose()
+        )
+        parts = []
+        async with aclosing(chunks):
+            try:
+                if first is not None:
+                    if metrics.enabled:
+                        metrics.observe("agent_llm_ttft_seconds", time.perf_counter() - started,
+                                        provider=backend.provider, model=backend.model)
+                    parts.append(first)
+                    yield first
+                async for chunk in chunks:
+                    parts.append(chunk)
+                    yield chunk
+            except (LLMUnavailableError, LLMRequestError) as e:
+                self._report_error(backend, e)
+                raise
+    
+        if metrics.enabled:
+            metrics.observe("agent_llm_request_seconds", time.perf_counter() - started,
+                            provider=backend.provider, model=backend.model, namespace=cache_namespace)
+        if cache_key:
+            self.cache.put(cache_namespace, cache_key, "".join(parts))
+    
+    async def agenerate_many(self, prompts: List[str], max_in_flight: Optional[int] = None,
+                             cache_namespace: str = "default") -> List[str]:
+        """Run many prompts concurrently, at most max_in_flight requests at a time"""
+        semaphore = asyncio.Semaphore(max_in_flight or self.max_connections)
+    
+        async def generate(prompt: str) -> str:
+            async with semaphore:
+                return await self.agenerate_response(prompt, cache_namespace)
+    
+        return await asyncio.gather(*(generate(prompt) for prompt in prompts))
+    
+    def cache_stats(self) -> Dict[str, int]:
+        return dict(self.cache.stats) if self.cache else {}
+    
+    def create_router(self, providers: Optional[str] = None) -> LLMRouter:
+        """A router over the configured backends with fresh limiters and statistics"""
+        return LLMRouter.from_env(self._has_key, self.max_connections, providers)
+    
+    def _has_key(self, provider: str) -> bool:
+        return provider == "mock" or bool({
+            "openai": self.openai_key, "anthropic": self.anthropic_key, "gemini": self.gemini_key
+        }.get(provider))
+    
+    def _route(self, tier: str, call: Callable[[Backend], T]) -> T:
+        """call() on the tier's best backend, failing over down the ranking"""
+        metrics = get_metrics()
+        error = None
+        for backend in self.router.rank(tier):
+            if error is not None:
+                metrics.inc("agent_llm_failovers_total", tier=tier)
+            try:
+                return call(backend)
+            except LLMRequestError as e:
+                self._report_error(backend, e)
+                raise
+            except LLMUnavailableError as e:
+                self._report_error(backend, e)
+                error = e
+        raise error
+    
+    async def _aroute(self, tier: str, start: Callable[[Backend], Awaitable[T]],
+                      discard: Optional[Callable[[T], Awaitable]] = None) -> T:
+        """Async _route; hedges when the router has a delay for the chosen backend.
+        
+        discard releases a result that lost the race (e.g. closes a stream).
+        """
+        metrics = get_metrics()
+    
+        async def attempt(backend: Backend) -> T:
+            try:
+                return await start(backend)
+            except (LLMUnavailableError, LLMRequestError) as e:
+                self._report_error(backend, e)
+                raise
+    
+        ranked = self.router.rank(tier)
+        tried = set()
+        error = None
+        for index, backend in enumerate(ranked):
+            if backend.name in tried:
+                continue
+            if error is not None:
+                metrics.inc("agent_llm_failovers_total", tier=tier)
+            tried.add(backend.name)
+            delay = self.router.hedge_delay(backend)
+            try:
+                if delay is None:
+                    return await attempt(backend)
+                # The backup stays in the ranking: if the hedge never fired it is still worth a try
+                backup = next((other for other in ranked[index + 1:] if other.name not in tried), backend)
+                return await self._ahedge(attempt, backend, backup, delay, discard)
+            except LLMUnavailableError as e:
+                error = e
+        raise error
+    
+    async def _ahedge(self, attempt: Callable[[Backend], Awaitable[T]], primary: Backend, backup: Backend,
+                      delay: float, discard: Optional[Callable[[T], Awaitable]]) -> T:
+        """attempt(primary), plus attempt(backup) if primary hasn't answered within delay; first success wins"""
+        metrics = get_metrics()
+        tasks = [asyncio.ensure_future(attempt(primary))]
         try:
-            if self._openai_client is None:
-                from openai import OpenAI
-                self._openai_client = OpenAI(api_key=self.openai_key)
-            
-            response = self._openai_client.chat.completions.create(
-                model="gpt-3.5-turbo",
-                messages=[{"role": "user", "content": prompt}],
-                max_tokens=500
-            )
-            return response.choices[0].message.content
-        except Exception as e:
-            print(f"OpenAI API error: {e}")
-            return self._mock_generate(prompt)
+            done, _ = await asyncio.wait(tasks, timeout=delay)
+            if not done:
+                metrics.inc("agent_llm_hedges_total", provider=backup.provider, model=backup.model)
+                tasks.append(asyncio.ensure_future(attempt(backup)))
+            pending = set(tasks)
+            error = None
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                succeeded = [task for task in tasks if task in done and task.exception() is None]
+                if not succeeded:
+                    error = next(task.exception() for task in done)
+                    continue
+                winner = succeeded[0]
+                if winner is not tasks[0]:
+                    metrics.inc("agent_llm_hedge_wins_total", provider=backup.provider, model=backup.model)
+                for loser in succeeded[1:]:
+                    if discard:
+                        await discard(loser.result())
+                return winner.result()
+            raise error
+        finally:
+            # The slower request is cancelled; its limiter slot is released as it unwinds
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+    
+    def _report_error(self, backend: Backend, error: Exception):
+        get_metrics().inc("agent_llm_errors_total", provider=backend.provider, model=backend.model)
+        print(f"{self.PROVIDER_NAMES[backend.provider]} API error: {error}")
     
-    def _anthropic_generate(self, prompt: str) -> str:
+    def _generate(self, backend: Backend, prompt: str, namespace: str) -> str:
+        generate = {
+            "openai": self._openai_generate,
+            "anthropic": self._anthropic_generate,
+            "gemini": self._gemini_generate,
+            "mock": self._mock_generate,
+        }[backend.provider]
+        with get_metrics().timed("agent_llm_request_seconds", provider=backend.provider, model=backend.model,
+                                 namespace=namespace):
+            return backend.limiter.call(backend.measure(lambda: generate(prompt, backend.model)),
+                                        self._estimate_tokens(prompt))
+    
+    async def _agenerate(self, backend: Backend, prompt: str, namespace: str) -> str:
+        generate = {
+            "openai": self._aopenai_generate,
+            "anthropic": self._aanthropic_generate,
+            "gemini": self._agemini_generate,
+            "mock": self._amock_generate,
+        }[backend.provider]
+        with get_metrics().timed("agent_llm_request_seconds", provider=backend.provider, model=backend.model,
+                                 namespace=namespace):
+            return await backend.limiter.acall(backend.ameasure(lambda: generate(prompt, backend.model)),
+                                               self._estimate_tokens(prompt))
+    
+    def _open_stream(self, backend: Backend, prompt: str) -> Tuple[Backend, Iterator[str], Optional[str]]:
+        """Start streaming from backend: (backend, remaining chunks, first chunk or None if empty)"""
+        stream = {
+            "openai": self._openai_stream,
+            "anthropic": self._anthropic_stream,
+            "gemini": self._gemini_stream,
+            "mock": self._mock_stream,
+        }[backend.provider]
+        chunks = backend.limiter.stream(backend.measure_stream(lambda: stream(prompt, backend.model)),
+                                        self._estimate_tokens(prompt))
         try:
-            if self._anthropic_client is None:
-                import anthropic
-                self._anthropic_client = anthropic.Anthropic(api_key=self.anthropic_key)
-            
-            response = self._anthropic_client.messages.create(
-                model="claude-3-sonnet-20240229",
-                max_tokens=500,
-                messages=[{"role": "user", "content": prompt}]
-            )
-            return response.content[0].text
-        except Exception as e:
-            print(f"Anthropic API error: {e}")
-            return self._mock_generate(prompt)
+            return backend, chunks, next(chunks, None)
+        except BaseException:
+            chunks.close()
+            raise
+    
+    async def _aopen_stream(self, backend: Backend, prompt: str) -> Tuple[Backend, AsyncIterator[str], Optional[str]]:
+        stream = {
+            "openai": self._aopenai_stream,
+            "anthropic": self._aanthropic_stream,
+            "gemini": self._agemini_stream,
+            "mock": self._amock_stream,
+        }[backend.provider]
+        chunks = backend.limiter.astream(backend.ameasure_stream(lambda: stream(prompt, backend.model)),
+                                         self._estimate_tokens(prompt))
+        try:
+            return backend, chunks, await anext(chunks, None)
+        except BaseException:
+            await chunks.aclose()
+            raise
+    
+    def _estimate_tokens(self, prompt: str) -> int:
+        # Providers count max_tokens against the tokens/min limit before generating
+        return len(prompt) // 4 + self.MAX_TOKENS
+    
+    def _cache_key(self, tier: str, prompt: str) -> str:
+        # Any backend of a tier may answer, so the key names the tier's backends rather than the one used
+        backends = [backend.name for backend in self.router.tiers[tier]]
+        payload = json.dumps([tier, backends, {"max_tokens": self.MAX_TOKENS}, prompt])
+        return hashlib.sha256(payload.encode()).hexdigest()
+    
+    @staticmethod
+    def _create_cache() -> LLMResponseCache:
+        return LLMResponseCache(
+            path=os.getenv("LLM_CACHE_PATH", DEFAULT_CACHE_PATH),
+            ttls={"classification": float(os.getenv("LLM_CACHE_CLASSIFICATION_TTL", str(7 * 24 * 3600)))},
+            default_ttl=float(os.getenv("LLM_CACHE_TTL", str(24 * 3600))),
+            max_memory_items=int(os.getenv("LLM_CACHE_MEMORY_ITEMS", "1024")),
+            max_disk_items=int(os.getenv("LLM_CACHE_DISK_ITEMS", "100000"))
+        )
+    
+    def _openai_generate(self, prompt: str, model: str) -> str:
+        if self._openai_client is None:
+            from openai import OpenAI
+            self._openai_client = OpenAI(api_key=self.openai_key, max_retries=0)
+    
+        response = self._openai_client.chat.completions.create(
+            model=model,
+            messages=[{"role": "user", "content": prompt}],
+            max_tokens=self.MAX_TOKENS
+        )
+        return response.choices[0].message.content
+    
+    def _anthropic_generate(self, prompt: str, model: str) -> str:
+        if self._anthropic_client is None:
+            import anthropic
+            self._anthropic_client = anthropic.Anthropic(api_key=self.anthropic_key, max_retries=0)
+    
+        response = self._anthropic_client.messages.create(
+            model=model,
+            max_tokens=self.MAX_TOKENS,
+            messages=[{"role": "user", "content": prompt}]
+        )
+        return response.content[0].text
+    
+    def _gemini_generate(self, prompt: str, model: str) -> str:
+        response = self._gemini_model(model).generate_content(prompt)
+        print("Gem Response: ")
+        print(response)
+        return response.text
+    
+    def _gemini_model(self, model: str):
+        if model not in self._gemini_models:
+            import google.generativeai as genai
+            genai.configure(api_key=self.gemini_key)
+            self._gemini_models[model] = genai.GenerativeModel(model)
+        return self._gemini_models[model]
+    
+    def _openai_stream(self, prompt: str, model: str) -> Iterator[str]:
+        if self._openai_client is None:
+            from openai import OpenAI
+            self._openai_client = OpenAI(api_key=self.openai_key, max_retries=0)
+    
+        stream = self._openai_client.chat.completions.create(
+            model=model,
+            messages=[{"role": "user", "content": prompt}],
+            max_tokens=self.MAX_TOKENS,
+            stream=True
+        )
+        for chunk in stream:
+            if chunk.choices and chunk.choices[0].delta.content:
+                yield chunk.choices[0].delta.content
     
-    def _gemini_generate(self, prompt: str) -> str:
+    def _anthropic_stream(self, prompt: str, model: str) -> Iterator[str]:
+        if self._anthropic_client is None:
+            import anthropic
+            self._anthropic_client = anthropic.Anthropic(api_key=self.anthropic_key, max_retries=0)
+    
+        with self._anthropic_client.messages.stream(
+            model=model,
+            max_tokens=self.MAX_TOKENS,
+            messages=[{"role": "user", "content": prompt}]
+        ) as stream:
+            yield from stream.text_stream
+    
+    def _gemini_stream(self, prompt: str, model: str) -> Iterator[str]:
+        for chunk in self._gemini_model(model).generate_content(prompt, stream=True):
+            if chunk.text:
+                yield chunk.text
+    
+    def _bind_event_loop(self):
+        """Reset loop-bound async state when called from a different event loop
+
+        Clients left on a loop that is still running are closed there; otherwise
+        _aclose_on_shutdown closes them while their loop shuts down, since closing
+        them after the loop has closed raises "Event loop is closed".
+        """
+        loop = asyncio.get_running_loop()
+        if self._async_loop is not loop:
+            previous_loop, previous_clients = self._async_loop, self._async_clients()
+            self._async_loop = loop
+            self._async_openai_client = None
+            self._async_anthropic_client = None
+            if previous_clients and previous_loop is not None and previous_loop.is_running():
+                asyncio.run_coroutine_threadsafe(self._aclose_clients(previous_clients), previous_loop)
+            self._async_closer = loop.create_task(self._aclose_on_shutdown())
+    
+    async def aclose(self):
+        """Close the async SDK clients; the next async call opens new ones"""
+        clients = self._async_clients()
+        self._async_openai_client = None
+        self._async_anthropic_client = None
+        await self._aclose_clients(clients)
+    
+    def _async_clients(self) -> list:
+        return [client for client in (self._async_openai_client, self._async_anthropic_client) if client is not None]
+    
+    async def _aclose_on_shutdown(self):
+        """Wait until asyncio.run cancels the loop's remaining tasks, then close its clients"""
+        loop = asyncio.get_running_loop()
         try:
-            if self._gemini_client is None:
-                import google.generativeai as genai
-                genai.configure(api_key=self.gemini_key)
-                self._gemini_client = genai.GenerativeModel('gemini-1.5-flash')
-            
-            response = self._gemini_client.generate_content(prompt)
-            print("Gem Response: ")
-            print(response)
-            return response.text
-        except Exception as e:
-            print(f"Gemini API error: {e}")
-            return self._mock_generate(prompt)
+            await loop.create_future()
+        finally:
+            if self._async_loop is loop:
+                self._async_loop = None
+                await self.aclose()
+    
+    @staticmethod
+    async def _aclose_clients(clients: list):
+        for client in clients:
+            await client.close()
+    
+    async def _aopenai_generate(self, prompt: str, model: str) -> str:
+        if self._async_openai_client is None:
+            from openai import AsyncOpenAI
+            self._async_openai_client = AsyncOpenAI(api_key=self.openai_key, max_retries=0)
+    
+        response = await self._async_openai_client.chat.completions.create(
+            model=model,
+            messages=[{"role": "user", "content": prompt}],
+            max_tokens=self.MAX_TOKENS
+        )
+        return response.choices[0].message.content
+    
+    async def _aanthropic_generate(self, prompt: str, model: str) -> str:
+        if self._async_anthropic_client is None:
+            import anthropic
+            self._async_anthropic_client = anthropic.AsyncAnthropic(api_key=self.anthropic_key, max_retries=0)
+    
+        response = await self._async_anthropic_client.messages.create(
+            model=model,
+            max_tokens=self.MAX_TOKENS,
+            messages=[{"role": "user", "content": prompt}]
+        )
+        return response.content[0].text
+    
+    async def _agemini_generate(self, prompt: str, model: str) -> str:
+        response = await self._gemini_model(model).generate_content_async(prompt)
+        return response.text
+    
+    async def _aopenai_stream(self, prompt: str, model: str) -> AsyncIterator[str]:
+        if self._async_openai_client is None:
+            from openai import AsyncOpenAI
+            self._async_openai_client = AsyncOpenAI(api_key=self.openai_key, max_retries=0)
+    
+        stream = await self._async_openai_client.chat.completions.create(
+            model=model,
+            messages=[{"role": "user", "content": prompt}],
+            max_tokens=self.MAX_TOKENS,
+            stream=True
+        )
+        async for chunk in stream:
+            if chunk.choices and chunk.choices[0].delta.content:
+                yield chunk.choices[0].delta.content
+    
+    async def _aanthropic_stream(self, prompt: str, model: str) -> AsyncIterator[str]:
+        if self._async_anthropic_client is None:
+            import anthropic
+            self._async_anthropic_client = anthropic.AsyncAnthropic(api_key=self.anthropic_key, max_retries=0)
+    
+        async with self._async_anthropic_client.messages.stream(
+            model=model,
+            max_tokens=self.MAX_TOKENS,
+            messages=[{"role": "user", "content": prompt}]
+        ) as stream:
+            async for text in stream.text_stream:
+                yield text
+    
+    async def _agemini_stream(self, prompt: str, model: str) -> AsyncIterator[str]:
+        async for chunk in await self._gemini_model(model).generate_content_async(prompt, stream=True):
+            if chunk.text:
+                yield chunk.text
     
     @classmethod
     def get_instance(cls):
@@ -90,9 +688,40 @@ class LLMClient:
             cls._instance = cls()
         return cls._instance
     
-    def _mock_generate(self, prompt: str) -> str:
+    async def _amock_generate(self, prompt: str, model: str) -> str:
+        if self.mock_latency:
+            await asyncio.sleep(self.mock_latency)
+        return self._mock_response(prompt)
+    
+    def _mock_generate(self, prompt: str, model: str) -> str:
+        if self.mock_latency:
+            time.sleep(self.mock_latency)
+        return self._mock_response(prompt)
+    
+    def _mock_stream(self, prompt: str, model: str) -> Iterator[str]:
+        if self.mock_latency:
+            time.sleep(self.mock_latency)
+        for position, chunk in enumerate(_MOCK_CHUNK_RE.findall(self._mock_response(prompt))):
+            if position and self.mock_stream_delay:
+                time.sleep(self.mock_stream_delay)
+            yield chunk
+    
+    async def _amock_stream(self, prompt: str, model: str) -> AsyncIterator[str]:
+        if self.mock_latency:
+            await asyncio.sleep(self.mock_latency)
+        for position, chunk in enumerate(_MOCK_CHUNK_RE.findall(self._mock_response(prompt))):
+            if position and self.mock_stream_delay:
+                await asyncio.sleep(self.mock_stream_delay)
+            yield chunk
+    
+    def _mock_response(self, prompt: str) -> str:
+        if self.mock_classification and "ACTION_TYPE:CONFIDENCE_SCORE" in prompt:
+            batch_numbers = re.findall(r'^\s*EMAIL (\d+):\s*$', prompt, re.MULTILINE)
+            if batch_numbers:
+                return "\n".join(f"{number}: {self.mock_classification}" for number in batch_numbers)
+            return self.mock_classification
         return """Dear John,
 
 Thank you for reaching out regarding the system outage that occurred last Tuesday.
 Best regards,
-Technical Support Team"""
\ No newline at end of file
+Technical Support Team"""
@@ -0,0 +1,304 @@
+"""
+Latency-aware routing across LLM backends.
+
+A backend is one provider/model pair with its own ProviderLimiter. Backends
+are grouped into tiers: cheap "fast" models answer classification prompts,
+"quality" models write drafts. Each backend keeps a rolling window of its
+latencies (time to the first chunk for streams, the whole call otherwise)
+and of its attempt outcomes.
+
+LLMRouter.rank orders a tier's backends for one request: healthy ones
+(circuit closed, recent error rate at most max_error_rate) by rolling p50,
+fastest first, then the unhealthy ones as a last resort. A backend with
+fewer than min_samples recent samples ranks as fastest, so it gets measured
+and one slow first answer can't bury it; samples age out after
+window_seconds, so a backend that had a bad minute is tried again later.
+
+With hedging on, a request still waiting after the chosen backend's own p95
+is sent again to the next backend (the same one if it is the only one); the
+first answer wins and the other request is cancelled.
+
+    LLM_PROVIDERS=openai,anthropic LLM_HEDGE=1 python main.py
+"""
+import asyncio
+import os
+import threading
+import time
+from collections import deque
+from typing import AsyncIterator, Awaitable, Callable, Deque, Dict, Iterator, List, Optional, Tuple, TypeVar
+
+from .rate_limit import ProviderLimiter, is_transient
+
+T = TypeVar("T")
+
+PROVIDERS = ("openai", "anthropic", "gemini", "mock")
+TIERS = ("fast", "quality")
+DEFAULT_MODELS = {
+    "fast": {"openai": "gpt-4o-mini", "anthropic": "claude-3-haiku-20240307",
+             "gemini": "gemini-1.5-flash", "mock": "mock"},
+    "quality": {"openai": "gpt-4o", "anthropic": "claude-3-sonnet-20240229",
+                "gemini": "gemini-1.5-pro", "mock": "mock"},
+}
+# Cache namespace -> tier; everything else (drafts) goes to the quality tier
+NAMESPACE_TIERS = {"classification": "fast"}
+
+
+def tier_for(namespace: str) -> str:
+    return NAMESPACE_TIERS.get(namespace, "quality")
+
+
+class LatencyWindow:
+    """Latencies and outcomes of the last window_seconds (at most max_samples of each)"""
+
+    def __init__(self, window_seconds: float = 60.0, max_samples: int = 100):
+        self.window_seconds = window_seconds
+        self._latencies: Deque[Tuple[float, float]] = deque(maxlen=max_samples)
+        self._outcomes: Deque[Tuple[float, bool]] = deque(maxlen=max_samples)
+        self._sorted: Optional[List[float]] = None
+        self._lock = threading.Lock()
+
+    def record(self, seconds: float):
+        with self._lock:
+            now = time.monotonic()
+            self._latencies.append((now, seconds))
+            self._outcomes.append((now, True))
+            self._sorted = None
+
+    def record_failure(self):
+        with self._lock:
+            self._outcomes.append((time.monotonic(), False))
+
+    def percentile(self, pct: float) -> Optional[float]:
+        with self._lock:
+            self._expire()
+            if not self._latencies:
+                return None
+            if self._sorted is None:
+                self._sorted = sorted(seconds for _, seconds in self._latencies)
+            return self._sorted[min(len(self._sorted) - 1, int(round(pct / 100 * (len(self._sorted) - 1))))]
+
+    def error_rate(self) -> float:
+        with self._lock:
+            self._expire()
+            if not self._outcomes:
+                return 0.0
+            return sum(1 for _, ok in self._outcomes if not ok) / len(self._outcomes)
+
+    def __len__(self) -> int:
+        with self._lock:
+            self._expire()
+            return len(self._latencies)
+
+    def _expire(self):
+        cutoff = time.monotonic() - self.window_seconds
+        while self._latencies and self._latencies[0][0] < cutoff:
+            self._latencies.popleft()
+            self._sorted = None
+        while self._outcomes and self._outcomes[0][0] < cutoff:
+            self._outcomes.popleft()
+
+
+class Backend:
+    def __init__(self, provider: str, model: str, limiter: ProviderLimiter, window: LatencyWindow):
+        self.provider = provider
+        self.model = model
+        self.name = f"{provider}:{model}"
+        self.limiter = limiter
+        self.stats = window
+
+    def healthy(self, max_error_rate: float) -> bool:
+        return not self.limiter.breaker.is_open() and self.stats.error_rate() <= max_error_rate
+
+    def record_error(self, error: BaseException):
+        # Only errors that say something about the provider count against it
+        if is_transient(error):
+            self.stats.record_failure()
+
+    def measure(self, function: Callable[[], T]) -> Callable[[], T]:
+        """function, recording each attempt's latency or failure"""
+        def attempt():
+            started = time.perf_counter()
+            try:
+                result = function()
+            except Exception as e:
+                self.record_error(e)
+                raise
+            self.stats.record(time.perf_counter() - started)
+            return result
+        return attempt
+
+    def ameasure(self, function: Callable[[], Awaitable[T]]) -> Callable[[], Awaitable[T]]:
+        """Async measure; an attempt cancelled by a faster hedge counts as at least as slow as it got"""
+        async def attempt():
+            started = time.perf_counter()
+            try:
+                result = await function()
+            except asyncio.CancelledError:
+                self.stats.record(time.perf_counter() - started)
+                raise
+            except Exception as e:
+                self.record_error(e)
+                raise
+            self.stats.record(time.perf_counter() - started)
+            return result
+        return attempt
+
+    def measure_stream(self, open_stream: Callable[[], Iterator[str]]) -> Callable[[], Iterator[str]]:
+        """open_stream, recording the time to its first chunk or its failure before one"""
+        def attempt():
+            started = time.perf_counter()
+            first = True
+            try:
+                for chunk in open_stream():
+                    if first:
+                        self.stats.record(time.perf_counter() - started)
+                        first = False
+                    yield chunk
+            except Exception as e:
+                if first:
+                    self.record_error(e)
+                raise
+        return attempt
+
+    def ameasure_stream(self, open_stream: Callable[[], AsyncIterator[str]]) -> Callable[[], AsyncIterator[str]]:
+        async def attempt():
+            started = time.perf_counter()
+            first = True
+            try:
+                async for chunk in open_stream():
+                    if first:
+                        self.stats.record(time.perf_counter() - started)
+                        first = False
+                    yield chunk
+            except asyncio.CancelledError:
+                if first:
+                    self.stats.record(time.perf_counter() - started)
+                raise
+            except Exception as e:
+                if first:
+                    self.record_error(e)
+                raise
+        return attempt
+
+    def __repr__(self) -> str:
+        return f"Backend({self.name})"
+
+
+def _check_provider(provider: str, variable: str):
+    if provider not in PROVIDERS:
+        raise ValueError(f"Unknown LLM provider {provider!r} in {variable}, expected one of {', '.join(PROVIDERS)}")
+
+
+def _parse_providers(providers: str) -> List[str]:
+    names = [provider.strip() for provider in providers.split(",") if provider.strip()]
+    for provider in names:
+        _check_provider(provider, "LLM_PROVIDERS / LLM_PROVIDER")
+    return names
+
+
+def _parse_backends(variable: str, configured: str) -> List[Tuple[str, str]]:
+    """(provider, model) pairs from "provider:model,..."; ValueError naming the bad entry otherwise"""
+    pairs = []
+    for entry in (entry.strip() for entry in configured.split(",")):
+        if not entry:
+            continue
+        provider, _, model = (part.strip() for part in entry.partition(":"))
+        if not provider or not model:
+            raise ValueError(f"{variable} entry {entry!r} is not of the form provider:model")
+        _check_provider(provider, variable)
+        pairs.append((provider, model))
+    return pairs
+
+
+class LLMRouter:
+    def __init__(self, tiers: Dict[str, List[Backend]], hedge: bool = False, hedge_min_delay: float = 0.05,
+                 hedge_min_samples: int = 20, min_samples: int = 5, max_error_rate: float = 0.5):
+        self.tiers = tiers
+        self.min_samples = min_samples
+        self.hedge = hedge
+        self.hedge_min_delay = hedge_min_delay
+        self.hedge_min_samples = hedge_min_samples
+        self.max_error_rate = max_error_rate
+
+    @classmethod
+    def from_env(cls, available: Callable[[str], bool], max_concurrency: int = 20,
+                 providers: Optional[str] = None) -> "LLMRouter":
+        """Backends from LLM_<TIER>_BACKENDS ("provider:model,..."), or else one per provider in
+        providers (default LLM_PROVIDERS, then LLM_PROVIDER) with model LLM_<PROVIDER>_<TIER>_MODEL.
+
+        Providers available() rejects (no API key) are left out. A tier with no
+        backend left raises ValueError rather than quietly drafting with the
+        mock, which is only used when configured (LLM_PROVIDER=mock, the
+        default). So do entries that are not provider:model or name an unknown
+        provider.
+        """
+        providers = providers or os.getenv("LLM_PROVIDERS", os.getenv("LLM_PROVIDER", "mock"))
+        window_seconds = float(os.getenv("LLM_ROUTER_WINDOW_SECONDS", "60"))
+        # Backends shared by both tiers share their limiter and statistics
+        shared: Dict[str, Backend] = {}
+
+        def backend(provider: str, model: str) -> Backend:
+            name = f"{provider}:{model}"
+            if name not in shared:
+                shared[name] = Backend(provider, model, ProviderLimiter.from_env(provider, max_concurrency, name),
+                                       LatencyWindow(window_seconds))
+            return shared[name]
+
+        tiers = {}
+        for tier in TIERS:
+            configured = os.getenv(f"LLM_{tier.upper()}_BACKENDS")
+            if configured:
+                pairs = _parse_backends(f"LLM_{tier.upper()}_BACKENDS", configured)
+            else:
+                pairs = [(provider, os.getenv(f"LLM_{provider.upper()}_{tier.upper()}_MODEL",
+                                              DEFAULT_MODELS[tier][provider]))
+                         for provider in _parse_providers(providers)]
+            backends = [backend(provider, model) for provider, model in pairs if available(provider)]
+            if not backends:
+                configured_providers = ", ".join(sorted({provider for provider, _ in pairs})) or "none"
+                raise ValueError(f"No {tier} LLM backend is usable: no API key for {configured_providers} "
+                                 f"(set LLM_PROVIDER=mock for canned responses)")
+            tiers[tier] = backends
+
+        return cls(
+            tiers,
+            hedge=os.getenv("LLM_HEDGE", "").lower() in ("1", "true", "yes"),
+            hedge_min_delay=float(os.getenv("LLM_HEDGE_MIN_DELAY", "0.05")),
+            max_error_rate=float(os.getenv("LLM_ROUTER_MAX_ERROR_RATE", "0.5"))
+        )
+
+    def rank(self, tier: str) -> List[Backend]:
+        """The tier's backends in the order to try them for one request"""
+        backends = self.tiers[tier]
+        if len(backends) == 1:
+            return backends
+        healthy = [backend for backend in backends if backend.healthy(self.max_error_rate)]
+        # Stable sort: among backends still being measured, the configured order decides
+        healthy.sort(key=lambda backend: backend.stats.percentile(50)
+                     if len(backend.stats) >= self.min_samples else 0.0)
+        return healthy + [backend for backend in backends if backend not in healthy]
+
+    def hedge_delay(self, backend: Backend) -> Optional[float]:
+        """Seconds to wait for backend before hedging, or None to send the request only once"""
+        if not self.hedge or len(backend.stats) < self.hedge_min_samples:
+            return None
+        return max(self.hedge_min_delay, backend.stats.percentile(95))
+
+    def backends(self) -> List[Backend]:
+        unique = {}
+        for backends in self.tiers.values():
+            for backend in backends:
+                unique.setdefault(backend.name, backend)
+        return list(unique.values())
+
+    def report(self) -> List[Dict]:
+        """Rolling statistics per backend, e.g. for a status line"""
+        return [{
+            "backend": backend.name,
+            "samples": len(backend.stats),
+            "p50": backend.stats.percentile(50),
+            "p95": backend.stats.percentile(95),
+            "error_rate": backend.stats.error_rate(),
+            "circuit": backend.limiter.breaker.state,
+            "concurrency_limit": backend.limiter.concurrency.limit,
+        } for backend in self.backends()]
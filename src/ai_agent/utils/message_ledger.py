@@ -0,0 +1,312 @@
+"""
+Ledger of processed emails, keyed by Message-ID.
+
+receive_message_node claims a message before any LLM work is done; a message
+that was already claimed (still unread on the server, refetched after a
+restart or a UIDVALIDITY reset, or present twice in an archive) is skipped.
+Finished messages are never released automatically, so each email is drafted
+at most once; `--release` puts one back. A run that fails outright (e.g. the
+provider rejects the prompt) leaves its message "failed" rather than retrying
+it every poll. Claims a crashed process left unfinished are dropped when the
+daemon starts, so their messages (still below the sync watermark) are
+drafted then.
+
+IDs live in one SQLite table (WAL mode). In front of it sits a scalable Bloom
+filter, rebuilt from the table on first use (about 4 s per million IDs), so
+checking a new message costs a few hashes and no query. The filter grows in
+slices (each twice the capacity of the last, at half its error rate), about
+2 bytes per ID at the default 0.1% false-positive rate, while the table
+stays on disk.
+
+    PYTHONPATH=src python -m ai_agent.utils.message_ledger --status claimed
+"""
+import argparse
+import hashlib
+import math
+import os
+import sqlite3
+import threading
+import time
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+DEFAULT_MESSAGE_LEDGER_PATH = os.path.abspath(
+    os.path.join(os.path.dirname(__file__), '../../../data/message_ledger.sqlite3')
+)
+STATUSES = ("claimed", "done", "failed")
+
+
+_MASK64 = (1 << 64) - 1
+
+
+def _hash_pair(key: str) -> Tuple[int, int]:
+    """Two 64-bit hashes of key; position i in a filter is (h1 + i * h2) mod 2**64 mod num_bits"""
+    digest = hashlib.blake2b(key.encode("utf-8", errors="surrogatepass"), digest_size=16).digest()
+    return int.from_bytes(digest[:8], "little"), int.from_bytes(digest[8:], "little") | 1
+
+
+class BloomFilter:
+    def __init__(self, capacity: int, error_rate: float):
+        self.capacity = max(1, capacity)
+        self.num_bits = max(64, int(-self.capacity * math.log(error_rate) / math.log(2) ** 2))
+        self.num_hashes = max(1, round(self.num_bits / self.capacity * math.log(2)))
+        self.bits = bytearray((self.num_bits + 7) // 8)
+        self.count = 0
+
+    def add(self, hashes: Tuple[int, int]):
+        h1, h2 = hashes
+        bits, num_bits = self.bits, self.num_bits
+        for i in range(self.num_hashes):
+            position = ((h1 + i * h2) & _MASK64) % num_bits
+            bits[position >> 3] |= 1 << (position & 7)
+        self.count += 1
+
+    def add_many(self, h1: np.ndarray, h2: np.ndarray):
+        """Vectorized add of uint64 hash pairs"""
+        bits = np.frombuffer(self.bits, dtype=np.uint8)
+        num_bits = np.uint64(self.num_bits)
+        for i in range(self.num_hashes):
+            positions = (h1 + np.uint64(i) * h2) % num_bits  # wraps mod 2**64 like add()
+            np.bitwise_or.at(bits, positions >> np.uint64(3),
+                             np.left_shift(1, positions & np.uint64(7)).astype(np.uint8))
+        self.count += len(h1)
+
+    def contains(self, hashes: Tuple[int, int]) -> bool:
+        h1, h2 = hashes
+        bits, num_bits = self.bits, self.num_bits
+        for i in range(self.num_hashes):
+            position = ((h1 + i * h2) & _MASK64) % num_bits
+            if not bits[position >> 3] & (1 << (position & 7)):
+                return False  # most misses stop after a probe or two
+        return True
+
+
+class ScalableBloomFilter:
+    """Bloom filter that adds slices as it fills, keeping the overall false-positive rate near error_rate"""
+
+    def __init__(self, initial_capacity: int = 1_000_000, error_rate: float = 0.001):
+        self.error_rate = error_rate
+        # Slice error rates halve, so the total stays under error_rate
+        self.slices = [BloomFilter(initial_capacity, error_rate / 2)]
+
+    def add(self, key: str):
+        self._current().add(_hash_pair(key))
+
+    def add_many(self, keys: List[str]):
+        pairs = np.array([_hash_pair(key) for key in keys], dtype=np.uint64).reshape(-1, 2)
+        start = 0
+        while start < len(pairs):
+            current = self._current()
+            end = start + min(len(pairs) - start, current.capacity - current.count)
+            current.add_many(pairs[start:end, 0], pairs[start:end, 1])
+            start = end
+
+    def __contains__(self, key: str) -> bool:
+        hashes = _hash_pair(key)
+        return any(bloom.contains(hashes) for bloom in self.slices)
+
+    def __len__(self) -> int:
+        return sum(bloom.count for bloom in self.slices)
+
+    @property
+    def nbytes(self) -> int:
+        return sum(len(bloom.bits) for bloom in self.slices)
+
+    def _current(self) -> BloomFilter:
+        current = self.slices[-1]
+        if current.count >= current.capacity:
+            current = BloomFilter(current.capacity * 2, self.error_rate / 2 ** (len(self.slices) + 1))
+            self.slices.append(current)
+        return current
+
+
+class MessageLedger:
+    # IDs streamed from SQLite per fetch while rebuilding the filter
+    LOAD_CHUNK = 10_000
+
+    def __init__(self, path: str = DEFAULT_MESSAGE_LEDGER_PATH, capacity: int = 1_000_000,
+                 error_rate: float = 0.001):
+        self.path = path
+        self.capacity = capacity
+        self.error_rate = error_rate
+        self.stats = {"bloom_negative": 0, "lookups": 0, "claimed": 0, "duplicates": 0}
+        self._lock = threading.Lock()
+        self._bloom: Optional[ScalableBloomFilter] = None
+
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._db = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        # A crash of the process loses nothing; a power cut may forget the last few claims
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS processed ("
+            " message_id TEXT PRIMARY KEY, status TEXT NOT NULL, action TEXT,"
+            " claimed_at REAL NOT NULL, completed_at REAL) WITHOUT ROWID"
+        )
+
+    @classmethod
+    def from_env(cls) -> "MessageLedger":
+        return cls(
+            path=os.getenv("MESSAGE_LEDGER_PATH", DEFAULT_MESSAGE_LEDGER_PATH),
+            capacity=int(os.getenv("MESSAGE_LEDGER_CAPACITY", "1000000")),
+            error_rate=float(os.getenv("MESSAGE_LEDGER_ERROR_RATE", "0.001"))
+        )
+
+    def seen(self, message_id: str) -> bool:
+        """Whether message_id was claimed before; a Bloom miss answers without touching SQLite"""
+        with self._lock:
+            if message_id not in self._load_bloom():
+                self.stats["bloom_negative"] += 1
+                return False
+            self.stats["lookups"] += 1
+            return self._db.execute(
+                "SELECT 1 FROM processed WHERE message_id = ?", (message_id,)
+            ).fetchone() is not None
+
+    def unseen(self, message_ids: Iterable[str]) -> List[bool]:
+        """seen() negated for many IDs, under one lock acquisition"""
+        with self._lock:
+            bloom = self._load_bloom()
+            flags = []
+            for message_id in message_ids:
+                if message_id not in bloom:
+                    self.stats["bloom_negative"] += 1
+                    flags.append(True)
+                    continue
+                self.stats["lookups"] += 1
+                flags.append(self._db.execute(
+                    "SELECT 1 FROM processed WHERE message_id = ?", (message_id,)
+                ).fetchone() is None)
+            return flags
+
+    def claim(self, message_id: str) -> bool:
+        """Record message_id as being processed; False if it already was (by anyone, ever)"""
+        with self._lock:
+            bloom = self._load_bloom()
+            cursor = self._db.execute(
+                "INSERT OR IGNORE INTO processed (message_id, status, claimed_at) VALUES (?, 'claimed', ?)",
+                (message_id, time.time())
+            )
+            if cursor.rowcount == 1:
+                bloom.add(message_id)
+                self.stats["claimed"] += 1
+                return True
+            self.stats["duplicates"] += 1
+            return False
+
+    def complete(self, message_id: str, action: Optional[str] = None):
+        """Mark a claimed message done, recording what the workflow decided"""
+        with self._lock:
+            self._db.execute(
+                "UPDATE processed SET status = 'done', action = ?, completed_at = ? WHERE message_id = ?",
+                (action, time.time(), message_id)
+            )
+
+    def fail(self, message_id: str):
+        """Mark a claimed message failed; like done it is not picked up again until released"""
+        with self._lock:
+            self._db.execute(
+                "UPDATE processed SET status = 'failed', completed_at = ? WHERE message_id = ?",
+                (time.time(), message_id)
+            )
+
+    def release(self, message_ids: List[str]) -> int:
+        """Forget messages so they are processed again; returns how many were removed.
+
+        Their IDs stay in the Bloom filter until the next restart, which only costs
+        an extra SQLite lookup.
+        """
+        with self._lock:
+            cursor = self._db.executemany(
+                "DELETE FROM processed WHERE message_id = ?", [(message_id,) for message_id in message_ids]
+            )
+            return cursor.rowcount
+
+    def release_stale_claims(self, before: float) -> int:
+        """Forget claims made before `before` that never finished, e.g. by a process that crashed"""
+        with self._lock:
+            cursor = self._db.execute(
+                "DELETE FROM processed WHERE status = 'claimed' AND claimed_at < ?", (before,)
+            )
+            return cursor.rowcount
+
+    def get(self, message_id: str) -> Optional[Dict]:
+        with self._lock:
+            cursor = self._db.execute("SELECT * FROM processed WHERE message_id = ?", (message_id,))
+            row = cursor.fetchone()
+            return dict(zip([column[0] for column in cursor.description], row)) if row else None
+
+    def list(self, status: Optional[str] = None, limit: int = 100) -> List[Dict]:
+        with self._lock:
+            where, params = ("WHERE status = ?", (status,)) if status else ("", ())
+            cursor = self._db.execute(
+                f"SELECT * FROM processed {where} ORDER BY claimed_at DESC LIMIT ?", (*params, limit)
+            )
+            names = [column[0] for column in cursor.description]
+            return [dict(zip(names, row)) for row in cursor.fetchall()]
+
+    def counts(self) -> Dict[str, int]:
+        with self._lock:
+            return dict(self._db.execute("SELECT status, COUNT(*) FROM processed GROUP BY status").fetchall())
+
+    @property
+    def bloom(self) -> ScalableBloomFilter:
+        with self._lock:
+            return self._load_bloom()
+
+    def close(self):
+        with self._lock:
+            self._db.close()
+
+    def _load_bloom(self) -> ScalableBloomFilter:
+        """Build the filter from every stored ID on first use (caller holds the lock)"""
+        if self._bloom is None:
+            bloom = ScalableBloomFilter(self.capacity, self.error_rate)
+            cursor = self._db.execute("SELECT message_id FROM processed")
+            while True:
+                rows = cursor.fetchmany(self.LOAD_CHUNK)
+                if not rows:
+                    break
+                bloom.add_many([message_id for (message_id,) in rows])
+            self._bloom = bloom
+        return self._bloom
+
+
+_message_ledger: Optional[MessageLedger] = None
+_message_ledger_lock = threading.Lock()
+
+
+def get_message_ledger() -> MessageLedger:
+    """Process-wide ledger configured from the environment"""
+    global _message_ledger
+    if _message_ledger is None:
+        with _message_ledger_lock:
+            if _message_ledger is None:
+                _message_ledger = MessageLedger.from_env()
+    return _message_ledger
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Inspect the processed-message ledger")
+    parser.add_argument("--status", choices=STATUSES)
+    parser.add_argument("--message-id", help="Show one entry")
+    parser.add_argument("--release", nargs="+", metavar="MESSAGE_ID",
+                        help="Forget these messages so they are processed again")
+    parser.add_argument("-n", "--limit", type=int, default=20)
+    args = parser.parse_args()
+
+    ledger = MessageLedger.from_env()
+    if args.release:
+        print(f"Released {ledger.release(args.release)} message(s)")
+        return
+    entries = [entry for entry in [ledger.get(args.message_id)] if entry] if args.message_id \
+        else ledger.list(status=args.status, limit=args.limit)
+    for entry in entries:
+        claimed = time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(entry["claimed_at"]))
+        print(f"{claimed}  {entry['status']:<8} {entry['action'] or '-':<17} {entry['message_id']}")
+    print(f"{len(entries)} entr{'y' if len(entries) == 1 else 'ies'}; totals by status: {ledger.counts()}")
+
+
+if __name__ == "__main__":
+    main()
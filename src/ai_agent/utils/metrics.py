@@ -0,0 +1,243 @@
+"""
+Pipeline instrumentation: histograms, gauges and counters exported in the
+Prometheus text format, plus one JSONL trace line per workflow run.
+
+Off unless AGENT_METRICS=1. When off, instrument_node() returns nodes
+unwrapped and timed() hands back a shared no-op context manager, so call
+sites pay one attribute check.
+"""
+import asyncio
+import bisect
+import contextvars
+import functools
+import json
+import os
+import threading
+import time
+import uuid
+from contextlib import contextmanager, nullcontext
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+DEFAULT_PROMETHEUS_PATH = os.path.abspath(
+    os.path.join(os.path.dirname(__file__), '../../../data/metrics.prom')
+)
+DEFAULT_TRACE_PATH = os.path.abspath(
+    os.path.join(os.path.dirname(__file__), '../../../data/traces.jsonl')
+)
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+HELP = {
+    "agent_node_seconds": "Wall time per workflow node",
+    "agent_workflow_run_seconds": "Wall time per workflow run",
+    "agent_batch_classify_seconds": "Up-front batched classification per Gmail batch",
+    "agent_llm_request_seconds": "LLM request latency per provider, to the last token",
+    "agent_llm_ttft_seconds": "Time to first streamed token per provider",
+    "agent_llm_errors_total": "Failed LLM requests per provider",
+    "agent_imap_seconds": "IMAP command latency",
+    "agent_imap_messages_total": "Messages fetched over IMAP",
+    "agent_imap_bytes_total": "Bytes received for IMAP FETCH responses per fetch phase",
+    "agent_queue_depth": "Items waiting in a work queue",
+    "agent_workflow_runs_in_flight": "Workflow runs currently executing",
+}
+
+_NOOP = nullcontext()
+_current_trace: contextvars.ContextVar = contextvars.ContextVar("agent_run_trace", default=None)
+
+Labels = Tuple[Tuple[str, str], ...]
+
+
+class Histogram:
+    def __init__(self, buckets: Tuple[float, ...] = DEFAULT_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+
+class MetricsRegistry:
+    def __init__(self, enabled: bool = False, prometheus_path: str = DEFAULT_PROMETHEUS_PATH,
+                 trace_path: Optional[str] = DEFAULT_TRACE_PATH):
+        self.enabled = enabled
+        self.prometheus_path = prometheus_path
+        self.trace_path = trace_path
+        self._lock = threading.Lock()
+        self._histograms: Dict[str, Dict[Labels, Histogram]] = {}
+        self._gauges: Dict[str, Dict[Labels, float]] = {}
+        self._counters: Dict[str, Dict[Labels, float]] = {}
+
+    @classmethod
+    def from_env(cls) -> "MetricsRegistry":
+        return cls(
+            enabled=os.getenv("AGENT_METRICS", "").lower() in ("1", "true", "yes"),
+            prometheus_path=os.getenv("AGENT_METRICS_PATH", DEFAULT_PROMETHEUS_PATH),
+            trace_path=os.getenv("AGENT_TRACE_PATH", DEFAULT_TRACE_PATH) or None
+        )
+
+    def observe(self, name: str, value: float, **labels):
+        """Add a sample to a histogram and to the current run's trace"""
+        if not self.enabled:
+            return
+        key = _labels(labels)
+        with self._lock:
+            series = self._histograms.setdefault(name, {})
+            histogram = series.get(key)
+            if histogram is None:
+                histogram = series[key] = Histogram()
+            histogram.observe(value)
+        trace = _current_trace.get()
+        if trace is not None:
+            trace["spans"].append({
+                "metric": name, **labels,
+                "start": round(time.perf_counter() - value - trace["_started"], 6),
+                "seconds": round(value, 6),
+            })
+
+    def set_gauge(self, name: str, value: float, **labels):
+        if self.enabled:
+            with self._lock:
+                self._gauges.setdefault(name, {})[_labels(labels)] = value
+
+    def add_gauge(self, name: str, amount: float, **labels):
+        if self.enabled:
+            key = _labels(labels)
+            with self._lock:
+                series = self._gauges.setdefault(name, {})
+                series[key] = series.get(key, 0) + amount
+
+    def inc(self, name: str, amount: float = 1, **labels):
+        if self.enabled:
+            key = _labels(labels)
+            with self._lock:
+                series = self._counters.setdefault(name, {})
+                series[key] = series.get(key, 0) + amount
+
+    def timed(self, name: str, **labels):
+        """Context manager observing its wall time into histogram `name`"""
+        if not self.enabled:
+            return _NOOP
+        return self._timed(name, labels)
+
+    @contextmanager
+    def _timed(self, name: str, labels: Dict[str, Any]) -> Iterator[None]:
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - started, **labels)
+
+    @contextmanager
+    def run_trace(self, **attributes) -> Iterator[Optional[Dict[str, Any]]]:
+        """Collect every sample observed inside the block into one trace record.
+
+        The yielded dict can be annotated while the run executes; it is
+        appended to the JSONL trace file when the block exits.
+        """
+        if not self.enabled:
+            yield None
+            return
+        trace = {"run_id": uuid.uuid4().hex, "started_at": time.time(), **attributes, "spans": []}
+        trace["_started"] = time.perf_counter()
+        token = _current_trace.set(trace)
+        try:
+            yield trace
+        finally:
+            _current_trace.reset(token)
+            seconds = time.perf_counter() - trace.pop("_started")
+            trace["seconds"] = round(seconds, 6)
+            self.observe("agent_workflow_run_seconds", seconds, input_mode=str(attributes.get("input_mode")))
+            self._write_trace(trace)
+
+    def _write_trace(self, trace: Dict[str, Any]):
+        if not self.trace_path:
+            return
+        line = json.dumps(trace, default=str) + "\n"
+        with self._lock:
+            os.makedirs(os.path.dirname(self.trace_path), exist_ok=True)
+            with open(self.trace_path, "a") as f:
+                f.write(line)
+
+    def render_prometheus(self) -> str:
+        lines: List[str] = []
+        with self._lock:
+            for name, series in sorted(self._histograms.items()):
+                _header(lines, name, "histogram")
+                for labels, histogram in sorted(series.items()):
+                    cumulative = 0
+                    for bound, count in zip(histogram.buckets + (float("inf"),), histogram.counts):
+                        cumulative += count
+                        le = "+Inf" if bound == float("inf") else repr(bound)
+                        lines.append(f"{name}_bucket{_render(labels + (('le', le),))} {cumulative}")
+                    lines.append(f"{name}_sum{_render(labels)} {histogram.sum:.6f}")
+                    lines.append(f"{name}_count{_render(labels)} {histogram.count}")
+            for kind, metrics in (("gauge", self._gauges), ("counter", self._counters)):
+                for name, series in sorted(metrics.items()):
+                    _header(lines, name, kind)
+                    for labels, value in sorted(series.items()):
+                        lines.append(f"{name}{_render(labels)} {value:g}")
+        return "\n".join(lines) + "\n"
+
+    def export_prometheus(self, path: Optional[str] = None):
+        """Atomically rewrite the Prometheus text file (node_exporter textfile format)"""
+        if not self.enabled:
+            return
+        path = path or self.prometheus_path
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "w") as f:
+            f.write(self.render_prometheus())
+        os.replace(tmp_path, path)
+
+
+def _labels(labels: Dict[str, Any]) -> Labels:
+    return tuple(sorted((key, str(value)) for key, value in labels.items()))
+
+
+def _render(labels: Labels) -> str:
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{key}="{_escape(value)}"' for key, value in labels) + "}"
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _header(lines: List[str], name: str, kind: str):
+    if name in HELP:
+        lines.append(f"# HELP {name} {HELP[name]}")
+    lines.append(f"# TYPE {name} {kind}")
+
+
+def instrument_node(name: str, node: Callable) -> Callable:
+    """Time a LangGraph node into agent_node_seconds; returns the node itself when disabled"""
+    registry = get_metrics()
+    if not registry.enabled:
+        return node
+
+    if asyncio.iscoroutinefunction(node):
+        @functools.wraps(node)
+        async def timed_node(state):
+            with registry.timed("agent_node_seconds", node=name):
+                return await node(state)
+    else:
+        @functools.wraps(node)
+        def timed_node(state):
+            with registry.timed("agent_node_seconds", node=name):
+                return node(state)
+    return timed_node
+
+
+_metrics: Optional[MetricsRegistry] = None
+
+
+def get_metrics() -> MetricsRegistry:
+    """Process-wide registry configured from the environment"""
+    global _metrics
+    if _metrics is None:
+        _metrics = MetricsRegistry.from_env()
+    return _metrics
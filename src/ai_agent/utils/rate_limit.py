@@ -0,0 +1,416 @@
+"""
+Client-side flow control for LLM provider calls.
+
+Every provider gets one ProviderLimiter, shared by worker threads (sync
+calls) and the event loop (async calls):
+
+- token buckets for requests/min and tokens/min keep us under the account's
+  limits instead of finding them through 429s. A request reserves its prompt
+  estimate plus max_tokens, the way providers count it against the limit;
+- an AIMD concurrency limit grows by one slot per window of successes and
+  halves on a 429/overload response (at most once per cooldown), between
+  min_concurrency and max_concurrency;
+- 429s, 5xx and connection errors are retried with full-jitter exponential
+  backoff, never sooner than the provider's Retry-After;
+- a circuit breaker opens after failure_threshold consecutive failed calls;
+  while open, calls fail immediately with LLMUnavailableError. After
+  reset_seconds one probe call is let through and decides whether it closes.
+
+Calls that cannot be served raise LLMUnavailableError; there is no fallback
+text. Requests the provider rejects on their own merits (a 400, a prompt too
+long for the model) are not retried and raise LLMRequestError instead, since
+sending them again later would fail the same way.
+"""
+import asyncio
+import email.utils
+import itertools
+import os
+import random
+import threading
+import time
+from collections import deque
+from typing import AsyncIterator, Awaitable, Callable, Deque, Iterator, Optional, Tuple, TypeVar
+
+from .metrics import get_metrics
+
+T = TypeVar("T")
+
+# Statuses that mean "slow down"; Anthropic uses 529 for overload
+OVERLOAD_STATUSES = {429, 503, 529}
+RETRY_STATUSES = {408, 409, 500, 502, 504} | OVERLOAD_STATUSES
+# Errors that say nothing about this request, only about the provider
+BREAKER_STATUSES = {401, 403}
+# Status-less transport failures, matched by class name so no SDK has to be imported
+TRANSIENT_ERRORS = {"APIConnectionError", "APITimeoutError", "TransportError", "ServiceUnavailable",
+                    "DeadlineExceeded", "ConnectionError", "TimeoutError"}
+
+SUCCESS, OVERLOAD, ERROR = "success", "overload", "error"
+
+
+class LLMUnavailableError(RuntimeError):
+    """The provider could not serve the request: retries ran out, or its circuit is open"""
+
+    def __init__(self, provider: str, message: str, retry_after: Optional[float] = None):
+        super().__init__(f"{provider}: {message}")
+        self.provider = provider
+        self.retry_after = retry_after
+
+
+class LLMRequestError(RuntimeError):
+    """The provider answered, but rejected this request (e.g. 400 or prompt too long); retrying won't help"""
+
+    def __init__(self, provider: str, message: str):
+        super().__init__(f"{provider}: {message}")
+        self.provider = provider
+
+
+def error_status(error: BaseException) -> Optional[int]:
+    """HTTP status of an SDK error (OpenAI, Anthropic and Google errors all carry one), if any"""
+    for status in (getattr(error, "status_code", None),
+                   getattr(getattr(error, "response", None), "status_code", None),
+                   getattr(error, "code", None)):
+        if isinstance(status, int):
+            return status
+    return None
+
+
+def retry_after(error: BaseException) -> Optional[float]:
+    """Seconds the provider asked us to wait (retry-after-ms, or Retry-After in seconds or as a date)"""
+    headers = getattr(getattr(error, "response", None), "headers", None)
+    if headers is None:
+        return None
+    try:
+        if headers.get("retry-after-ms"):
+            return max(0.0, float(headers["retry-after-ms"]) / 1000)
+        value = headers.get("retry-after")
+        if not value:
+            return None
+        try:
+            return max(0.0, float(value))
+        except ValueError:
+            return max(0.0, email.utils.parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+def is_transient(error: BaseException) -> bool:
+    status = error_status(error)
+    if status is not None:
+        return status in RETRY_STATUSES
+    return any(cls.__name__ in TRANSIENT_ERRORS for cls in type(error).__mro__)
+
+
+def _outcome(error: BaseException) -> str:
+    return OVERLOAD if error_status(error) in OVERLOAD_STATUSES else ERROR
+
+
+class TokenBucket:
+    """rate tokens/s up to capacity. reserve() may run into debt and returns how long to wait,
+    so callers are admitted in arrival order without polling."""
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = max(1.0, capacity)
+        self.tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def reserve(self, amount: float = 1) -> float:
+        with self._lock:
+            now = time.monotonic()
+            self.tokens = min(self.capacity, self.tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            self.tokens -= amount
+            return max(0.0, -self.tokens / self.rate)
+
+
+class AdaptiveConcurrency:
+    """Concurrency limit adjusted by AIMD, usable from threads and event loops alike"""
+
+    def __init__(self, initial: int, minimum: int = 1, maximum: int = 20,
+                 decrease_factor: float = 0.5, cooldown: float = 1.0, name: str = ""):
+        self.minimum = max(1, minimum)
+        self.maximum = max(self.minimum, maximum)
+        self.limit = float(min(self.maximum, max(self.minimum, initial)))
+        self.decrease_factor = decrease_factor
+        self.cooldown = cooldown
+        self.name = name
+        self.in_flight = 0
+        self._decreased_at = 0.0
+        self._lock = threading.Lock()
+        self._cond = threading.Condition(self._lock)
+        self._async_waiters: Deque[Tuple[asyncio.AbstractEventLoop, asyncio.Future]] = deque()
+
+    def acquire(self):
+        with self._cond:
+            while not self._try_acquire():
+                self._cond.wait()
+
+    async def aacquire(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            with self._lock:
+                if self._try_acquire():
+                    return
+                waiter = loop.create_future()
+                self._async_waiters.append((loop, waiter))
+            try:
+                await waiter
+            except asyncio.CancelledError:
+                with self._lock:
+                    if waiter.done():
+                        self._wake()  # pass the wakeup on to the next waiter
+                    else:
+                        self._async_waiters.remove((loop, waiter))
+                raise
+
+    def release(self, outcome: Optional[str] = None):
+        """Free a slot; SUCCESS grows the limit, OVERLOAD shrinks it, anything else leaves it"""
+        with self._lock:
+            self.in_flight -= 1
+            previous = self.limit
+            if outcome == SUCCESS:
+                self.limit = min(self.maximum, self.limit + 1 / self.limit)
+            elif outcome == OVERLOAD and time.monotonic() - self._decreased_at >= self.cooldown:
+                # One 429 burst is one signal: requests already in flight don't shrink it again
+                self._decreased_at = time.monotonic()
+                self.limit = max(self.minimum, self.limit * self.decrease_factor)
+            limit = self.limit
+            self._wake()
+        if int(limit) != int(previous):
+            get_metrics().set_gauge("agent_llm_concurrency_limit", int(limit), provider=self.name)
+
+    def _try_acquire(self) -> bool:
+        if self.in_flight < int(self.limit):
+            self.in_flight += 1
+            return True
+        return False
+
+    def _wake(self):
+        """Wake one waiter per free slot (caller holds the lock); woken waiters re-check the limit"""
+        free = int(self.limit) - self.in_flight
+        while free > 0 and self._async_waiters:
+            loop, waiter = self._async_waiters.popleft()
+            loop.call_soon_threadsafe(_set_done, waiter)
+            free -= 1
+        if free > 0:
+            self._cond.notify(free)
+
+
+def _set_done(future: asyncio.Future):
+    if not future.done():
+        future.set_result(None)
+
+
+class CircuitBreaker:
+    def __init__(self, name: str, failure_threshold: int = 5, reset_seconds: float = 30.0):
+        self.name = name
+        self.failure_threshold = max(1, failure_threshold)
+        self.reset_seconds = reset_seconds
+        self.state = "closed"
+        self.failures = 0
+        self._opened_at = 0.0
+        # When the half-open probe was let through; None while no probe is out
+        self._probe_started: Optional[float] = None
+        self._lock = threading.Lock()
+
+    def admit(self):
+        """Raise LLMUnavailableError unless a call may go to the provider now"""
+        with self._lock:
+            if self.state == "open":
+                remaining = self._opened_at + self.reset_seconds - time.monotonic()
+                if remaining > 0:
+                    raise LLMUnavailableError(self.name, f"circuit open, retrying in {remaining:.0f}s", remaining)
+                self.state, self._probe_started = "half_open", None
+            if self.state == "half_open":
+                now = time.monotonic()
+                # A probe that never reported back (e.g. cancelled) is replaced after reset_seconds
+                if self._probe_started is not None and now - self._probe_started < self.reset_seconds:
+                    raise LLMUnavailableError(self.name, "circuit half-open, probe in flight", self.reset_seconds)
+                self._probe_started = now
+
+    def is_open(self) -> bool:
+        with self._lock:
+            return self.state == "open" and time.monotonic() < self._opened_at + self.reset_seconds
+
+    def record_success(self):
+        with self._lock:
+            self.failures = 0
+            self._probe_started = None
+            if self.state == "closed":
+                return
+            self.state = "closed"
+        print(f"{self.name}: circuit closed")
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            self._probe_started = None
+            if self.state == "open" or (self.state == "closed" and self.failures < self.failure_threshold):
+                return
+            self.state = "open"
+            self._opened_at = time.monotonic()
+        print(f"{self.name}: circuit open for {self.reset_seconds:.0f}s after {self.failures} failed call(s)")
+        get_metrics().inc("agent_llm_circuit_open_total", provider=self.name)
+
+
+class ProviderLimiter:
+    # Seconds of the per-minute budgets that may be spent in one burst
+    BURST_SECONDS = 10
+
+    def __init__(self, provider: str, rpm: float = 0, tpm: float = 0, max_concurrency: int = 20,
+                 min_concurrency: int = 1, initial_concurrency: Optional[int] = None, max_retries: int = 4,
+                 base_delay: float = 0.5, max_delay: float = 30.0, failure_threshold: int = 5,
+                 reset_seconds: float = 30.0):
+        self.provider = provider
+        self.requests = TokenBucket(rpm / 60, rpm / 60 * self.BURST_SECONDS) if rpm > 0 else None
+        self.tokens = TokenBucket(tpm / 60, tpm / 60 * self.BURST_SECONDS) if tpm > 0 else None
+        self.concurrency = AdaptiveConcurrency(initial_concurrency or max_concurrency, min_concurrency,
+                                               max_concurrency, name=provider)
+        self.breaker = CircuitBreaker(provider, failure_threshold, reset_seconds)
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+
+    @classmethod
+    def from_env(cls, provider: str, max_concurrency: int = 20, name: Optional[str] = None) -> "ProviderLimiter":
+        """Limits from LLM_<PROVIDER>_RPM etc., falling back to LLM_RPM etc.; 0 means unlimited.
+
+        name (default: provider) labels the limiter's metrics and errors.
+        """
+        def setting(name: str, default: str) -> str:
+            return os.getenv(f"LLM_{provider.upper()}_{name}", os.getenv(f"LLM_{name}", default))
+
+        return cls(
+            name or provider,
+            rpm=float(setting("RPM", "0")),
+            tpm=float(setting("TPM", "0")),
+            max_concurrency=int(setting("MAX_CONCURRENCY", str(max_concurrency))),
+            min_concurrency=int(setting("MIN_CONCURRENCY", "1")),
+            max_retries=int(setting("MAX_RETRIES", "4")),
+            base_delay=float(setting("RETRY_BASE_DELAY", "0.5")),
+            max_delay=float(setting("RETRY_MAX_DELAY", "30")),
+            failure_threshold=int(setting("BREAKER_FAILURES", "5")),
+            reset_seconds=float(setting("BREAKER_RESET_SECONDS", "30"))
+        )
+
+    def call(self, function: Callable[[], T], tokens: float = 0) -> T:
+        """function() with limits, retries and the breaker applied"""
+        self.breaker.admit()
+        for attempt in itertools.count():
+            self.concurrency.acquire()
+            outcome, error = None, None
+            try:
+                time.sleep(self._throttle(tokens))
+                result = function()
+                outcome = SUCCESS
+            except Exception as e:
+                outcome, error = _outcome(e), e
+            finally:
+                self.concurrency.release(outcome)
+            if error is None:
+                self.breaker.record_success()
+                return result
+            time.sleep(self._retry_delay(error, attempt))
+
+    async def acall(self, function: Callable[[], Awaitable[T]], tokens: float = 0) -> T:
+        """Async counterpart of call()"""
+        self.breaker.admit()
+        for attempt in itertools.count():
+            await self.concurrency.aacquire()
+            outcome, error = None, None
+            try:
+                await asyncio.sleep(self._throttle(tokens))
+                result = await function()
+                outcome = SUCCESS
+            except Exception as e:
+                outcome, error = _outcome(e), e
+            finally:
+                self.concurrency.release(outcome)
+            if error is None:
+                self.breaker.record_success()
+                return result
+            await asyncio.sleep(self._retry_delay(error, attempt))
+
+    def stream(self, open_stream: Callable[[], Iterator[str]], tokens: float = 0) -> Iterator[str]:
+        """Chunks of open_stream(); retried only until the first chunk has been handed out"""
+        self.breaker.admit()
+        for attempt in itertools.count():
+            self.concurrency.acquire()
+            outcome, error, started = None, None, False
+            try:
+                time.sleep(self._throttle(tokens))
+                for chunk in open_stream():
+                    started = True
+                    yield chunk
+                outcome = SUCCESS
+            except Exception as e:
+                outcome, error = _outcome(e), e
+            finally:
+                self.concurrency.release(outcome)
+            if error is None:
+                self.breaker.record_success()
+                return
+            time.sleep(self._retry_delay(error, attempt, retryable=not started))
+
+    async def astream(self, open_stream: Callable[[], AsyncIterator[str]], tokens: float = 0) -> AsyncIterator[str]:
+        """Async counterpart of stream()"""
+        self.breaker.admit()
+        for attempt in itertools.count():
+            await self.concurrency.aacquire()
+            outcome, error, started = None, None, False
+            try:
+                await asyncio.sleep(self._throttle(tokens))
+                async for chunk in open_stream():
+                    started = True
+                    yield chunk
+                outcome = SUCCESS
+            except Exception as e:
+                outcome, error = _outcome(e), e
+            finally:
+                self.concurrency.release(outcome)
+            if error is None:
+                self.breaker.record_success()
+                return
+            await asyncio.sleep(self._retry_delay(error, attempt, retryable=not started))
+
+    def _throttle(self, tokens: float) -> float:
+        """Seconds to wait before sending, once a concurrency slot is held.
+
+        Rate budgets are reserved only after the slot, so requests leave spaced
+        out even when many slots free up at once.
+        """
+        wait = 0.0
+        if self.requests is not None:
+            wait = self.requests.reserve(1)
+        if self.tokens is not None and tokens:
+            wait = max(wait, self.tokens.reserve(tokens))
+        if wait > 0:
+            get_metrics().observe("agent_llm_throttle_seconds", wait, provider=self.provider)
+        return wait
+
+    def _retry_delay(self, error: BaseException, attempt: int, retryable: bool = True) -> float:
+        """Backoff before the next attempt, or LLMUnavailableError if there is none"""
+        metrics = get_metrics()
+        status = error_status(error)
+        wait = retry_after(error)
+        if status in OVERLOAD_STATUSES:
+            metrics.inc("agent_llm_rate_limited_total", provider=self.provider)
+
+        transient = is_transient(error)
+        if retryable and transient and attempt < self.max_retries and not self.breaker.is_open():
+            delay = random.uniform(0, min(self.max_delay, self.base_delay * 2 ** attempt))
+            if wait is not None:
+                delay = max(delay, wait)
+            metrics.inc("agent_llm_retries_total", provider=self.provider, reason=status or type(error).__name__)
+            return delay
+
+        attempts = f" after {attempt + 1} attempts" if attempt else ""
+        detail = f"{type(error).__name__}{attempts}: {error}"
+        if transient or status in BREAKER_STATUSES:
+            # Bad credentials fail every request alike, so they count as the provider being unavailable
+            self.breaker.record_failure()
+            raise LLMUnavailableError(self.provider, detail, wait) from error
+        # e.g. a 400 for this prompt: the provider itself answered fine
+        self.breaker.record_success()
+        raise LLMRequestError(self.provider, detail) from error
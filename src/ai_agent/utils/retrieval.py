@@ -0,0 +1,283 @@
+"""
+BM25 passage retrieval over a directory of runbooks, RCAs and templates.
+
+Documents are split into paragraph-sized passages and indexed into a
+term-major sparse matrix of precomputed BM25 weights. The index is a
+directory of .npy arrays plus a small JSON vocabulary; arrays are
+memory-mapped on load so opening a large index costs little more than
+reading the vocabulary.
+
+Each save writes a new version subdirectory and then atomically points the
+CURRENT file at it, so files a loaded index has mapped are never
+overwritten (truncating a mapped file kills the reader with SIGBUS).
+
+    PYTHONPATH=src python -m ai_agent.utils.retrieval build <docs_dir> <index_dir>
+    PYTHONPATH=src python -m ai_agent.utils.retrieval search <index_dir> "database outage"
+"""
+import argparse
+import hashlib
+import json
+import os
+import re
+import shutil
+import tempfile
+from collections import Counter
+from dataclasses import dataclass
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+import numpy as np
+
+DOC_EXTENSIONS = (".md", ".txt", ".rst")
+PASSAGE_CHARS = 800
+BM25_K1 = 1.2
+BM25_B = 0.75
+INDEX_VERSION = 1
+ARRAY_NAMES = ("indptr", "doc_ids", "weights", "text_offsets", "text", "passage_sources")
+# Names the version subdirectory holding the live index
+CURRENT_FILE = "CURRENT"
+
+_TOKEN_RE = re.compile(r'\w+')
+_PARAGRAPH_RE = re.compile(r'\n\s*\n')
+
+
+def tokenize(text: str) -> List[str]:
+    return _TOKEN_RE.findall(text.lower())
+
+
+@dataclass
+class Passage:
+    text: str
+    source: str
+    score: float = 0.0
+
+
+def iter_documents(docs_dir: str) -> Iterator[Tuple[str, str]]:
+    """Yield (relative path, text) for every document under docs_dir, in sorted order"""
+    for root, dirs, files in os.walk(docs_dir):
+        dirs.sort()
+        for name in sorted(files):
+            if name.lower().endswith(DOC_EXTENSIONS):
+                path = os.path.join(root, name)
+                with open(path, encoding="utf-8", errors="replace") as f:
+                    yield os.path.relpath(path, docs_dir), f.read()
+
+
+def hash_documents(docs_dir: str) -> str:
+    """Content hash of every document, the value an index built from docs_dir records"""
+    digest = hashlib.sha1()
+    for source, text in iter_documents(docs_dir):
+        digest.update(source.encode("utf-8"))
+        digest.update(text.encode("utf-8"))
+    return digest.hexdigest()
+
+
+def split_passages(text: str, max_chars: int = PASSAGE_CHARS) -> List[str]:
+    """Group consecutive paragraphs into passages of at most max_chars"""
+    passages = []
+    current = ""
+    for paragraph in _PARAGRAPH_RE.split(text):
+        paragraph = paragraph.strip()
+        if not paragraph:
+            continue
+        if current and len(current) + len(paragraph) + 2 > max_chars:
+            passages.append(current)
+            current = paragraph
+        else:
+            current = f"{current}\n\n{paragraph}" if current else paragraph
+    if current:
+        passages.append(current)
+    return passages
+
+
+class BM25Index:
+    """Sparse BM25 index: per term, the passages containing it and their weights"""
+
+    def __init__(self, vocab: Dict[str, int], indptr: np.ndarray, doc_ids: np.ndarray,
+                 weights: np.ndarray, text_offsets: np.ndarray, text: np.ndarray,
+                 passage_sources: np.ndarray, sources: List[str], docs_hash: Optional[str] = None):
+        self.vocab = vocab
+        self.indptr = indptr
+        self.doc_ids = doc_ids
+        self.weights = weights
+        self.text_offsets = text_offsets
+        self.text = text
+        self.passage_sources = passage_sources
+        self.sources = sources
+        self.docs_hash = docs_hash
+        self.path: Optional[str] = None  # directory the arrays are mapped from, once loaded
+
+    def __len__(self) -> int:
+        return len(self.passage_sources)
+
+    @classmethod
+    def build(cls, passages: Iterable[Tuple[str, str]], k1: float = BM25_K1, b: float = BM25_B) -> "BM25Index":
+        """Index (source, passage text) pairs"""
+        vocab: Dict[str, int] = {}
+        sources: List[str] = []
+        source_ids: Dict[str, int] = {}
+        passage_sources: List[int] = []
+        encoded: List[bytes] = []
+        term_ids: List[int] = []
+        passage_ids: List[int] = []
+        term_freqs: List[int] = []
+        lengths: List[int] = []
+
+        for passage_id, (source, text) in enumerate(passages):
+            if source not in source_ids:
+                source_ids[source] = len(sources)
+                sources.append(source)
+            passage_sources.append(source_ids[source])
+            encoded.append(text.encode("utf-8"))
+
+            counts = Counter(tokenize(text))
+            lengths.append(sum(counts.values()))
+            for token, count in counts.items():
+                term_ids.append(vocab.setdefault(token, len(vocab)))
+                passage_ids.append(passage_id)
+                term_freqs.append(count)
+
+        terms = np.asarray(term_ids, dtype=np.int32)
+        docs = np.asarray(passage_ids, dtype=np.int32)
+        tf = np.asarray(term_freqs, dtype=np.float32)
+        doc_len = np.asarray(lengths, dtype=np.float32)
+
+        order = np.lexsort((docs, terms))
+        terms, docs, tf = terms[order], docs[order], tf[order]
+        postings_per_term = np.bincount(terms, minlength=len(vocab))
+        indptr = np.zeros(len(vocab) + 1, dtype=np.int64)
+        np.cumsum(postings_per_term, out=indptr[1:])
+        df = postings_per_term.astype(np.float32)
+
+        count = len(doc_len)
+        avgdl = float(doc_len.mean()) if count else 0.0
+        idf = np.log1p((count - df + 0.5) / (df + 0.5))
+        norm = k1 * (1 - b + b * doc_len[docs] / (avgdl or 1.0))
+        weights = (idf[terms] * tf * (k1 + 1) / (tf + norm)).astype(np.float32)
+
+        text_offsets = np.zeros(count + 1, dtype=np.int64)
+        np.cumsum([len(chunk) for chunk in encoded], out=text_offsets[1:])
+        text = np.frombuffer(b"".join(encoded), dtype=np.uint8)
+
+        return cls(vocab, indptr, docs, weights, text_offsets, text,
+                   np.asarray(passage_sources, dtype=np.int32), sources)
+
+    @classmethod
+    def from_directory(cls, docs_dir: str, max_chars: int = PASSAGE_CHARS) -> "BM25Index":
+        digest = hashlib.sha1()
+
+        def passages():
+            for source, text in iter_documents(docs_dir):
+                digest.update(source.encode("utf-8"))
+                digest.update(text.encode("utf-8"))
+                for passage in split_passages(text, max_chars):
+                    yield source, passage
+
+        index = cls.build(passages())
+        index.docs_hash = digest.hexdigest()
+        return index
+
+    @property
+    def nbytes(self) -> int:
+        """Size of the index arrays, mapped or in memory"""
+        return sum(getattr(self, name).nbytes for name in ARRAY_NAMES)
+
+    def save(self, index_dir: str) -> str:
+        """Write a new version under index_dir and make it current; returns the version's directory"""
+        os.makedirs(index_dir, exist_ok=True)
+        version_dir = tempfile.mkdtemp(prefix="v-", dir=index_dir)
+        for name in ARRAY_NAMES:
+            np.save(os.path.join(version_dir, f"{name}.npy"), getattr(self, name))
+        meta = {"version": INDEX_VERSION, "docs_hash": self.docs_hash, "sources": self.sources, "vocab": self.vocab}
+        with open(os.path.join(version_dir, "meta.json"), "w") as f:
+            json.dump(meta, f)
+        tmp_path = os.path.join(index_dir, f"{CURRENT_FILE}.{os.getpid()}.tmp")
+        with open(tmp_path, "w") as f:
+            f.write(os.path.basename(version_dir))
+        os.replace(tmp_path, os.path.join(index_dir, CURRENT_FILE))
+        return version_dir
+
+    @classmethod
+    def load(cls, index_dir: str) -> "BM25Index":
+        """Open the current version of a saved index; the arrays are memory-mapped, not read"""
+        path = current_index_path(index_dir)
+        with open(os.path.join(path, "meta.json")) as f:
+            meta = json.load(f)
+        if meta.get("version") != INDEX_VERSION:
+            raise ValueError(f"Unsupported index version {meta.get('version')} in {path}")
+        arrays = {
+            name: np.load(os.path.join(path, f"{name}.npy"), mmap_mode="r")
+            for name in ARRAY_NAMES
+        }
+        index = cls(meta["vocab"], sources=meta["sources"], docs_hash=meta.get("docs_hash"), **arrays)
+        index.path = path
+        return index
+
+    def search(self, query: str, k: int = 10, min_score: float = 0.0) -> List[Passage]:
+        """Top-k passages by BM25 score, best first; ties keep passage order"""
+        term_ids = {self.vocab[token] for token in tokenize(query) if token in self.vocab}
+        if not term_ids or k <= 0:
+            return []
+
+        scores = np.zeros(len(self), dtype=np.float32)
+        for term_id in term_ids:
+            start, end = self.indptr[term_id], self.indptr[term_id + 1]
+            scores[self.doc_ids[start:end]] += self.weights[start:end]
+
+        candidates = np.flatnonzero(scores > min_score)
+        if len(candidates) > k:
+            candidates = candidates[np.argpartition(-scores[candidates], k - 1)[:k]]
+        candidates = candidates[np.lexsort((candidates, -scores[candidates]))]
+        return [self.passage(int(doc_id), float(scores[doc_id])) for doc_id in candidates]
+
+    def passage(self, doc_id: int, score: float = 0.0) -> Passage:
+        start, end = self.text_offsets[doc_id], self.text_offsets[doc_id + 1]
+        return Passage(
+            text=bytes(self.text[start:end]).decode("utf-8"),
+            source=self.sources[self.passage_sources[doc_id]],
+            score=score,
+        )
+
+
+def current_index_path(index_dir: str) -> str:
+    """The version directory CURRENT points at, or index_dir itself for an unversioned index"""
+    try:
+        with open(os.path.join(index_dir, CURRENT_FILE)) as f:
+            return os.path.join(index_dir, f.read().strip())
+    except FileNotFoundError:
+        return index_dir
+
+
+def index_exists(index_dir: str) -> bool:
+    return os.path.exists(os.path.join(current_index_path(index_dir), "meta.json"))
+
+
+def remove_index_version(path: str):
+    """Delete a version directory that is no longer current; unversioned indexes are left alone"""
+    index_dir = os.path.dirname(path)
+    if os.path.basename(path).startswith("v-") and current_index_path(index_dir) != path:
+        shutil.rmtree(path, ignore_errors=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build or query a BM25 context index")
+    commands = parser.add_subparsers(dest="command", required=True)
+    build = commands.add_parser("build", help="Index a directory of documents")
+    build.add_argument("docs_dir")
+    build.add_argument("index_dir")
+    search = commands.add_parser("search", help="Query a saved index")
+    search.add_argument("index_dir")
+    search.add_argument("query")
+    search.add_argument("-k", type=int, default=5)
+    args = parser.parse_args()
+
+    if args.command == "build":
+        index = BM25Index.from_directory(args.docs_dir)
+        index.save(args.index_dir)
+        print(f"Indexed {len(index)} passages from {len(index.sources)} documents into {args.index_dir}")
+    else:
+        for passage in BM25Index.load(args.index_dir).search(args.query, args.k):
+            print(f"{passage.score:.3f}  {passage.source}: {passage.text[:100]!r}")
+
+
+if __name__ == "__main__":
+    main()
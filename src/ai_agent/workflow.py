@@ -1,25 +1,44 @@
-from typing import Dict, Any
+import asyncio
+import re
+import threading
+from collections import OrderedDict
+from typing import Awaitable, Callable, Dict, Any, List, Optional, Set
 from langgraph.graph import StateGraph, END
-from .state import AgentState, ActionType
-from .nodes.receive_message import receive_message_node
-from .nodes.classify_action import classify_action_node
+from .state import WorkflowState, ActionType, Message
+from .nodes.receive_message import (
+    receive_message_node, commit_gmail_sync, fetch_gmail_bodies, fetch_new_gmail_messages, is_ledgered
+)
+from .nodes.classify_action import aclassify_action_node, aclassify_scraped_batch
 from .nodes.retrieve_context import retrieve_context_node
-from .nodes.gmail_draft import gmail_draft_node
-from .nodes.meeting_draft import meeting_draft_node
+from .nodes.gmail_draft import agmail_draft_node
+from .nodes.meeting_draft import ameeting_draft_node
 from .nodes.no_op import no_op_node
 from .nodes.save_draft import save_draft_node
+from .utils.llm_client import LLMUnavailableError
+from .utils.message_ledger import get_message_ledger
+from .utils.metrics import get_metrics, instrument_node
+
+# Runs one workflow from its initial state, e.g. run_workflow or a scheduler submission
+WorkflowRunner = Callable[[WorkflowState], Awaitable[WorkflowState]]
+
+_MSG_ID_RE = re.compile(r'<[^<>\s]+>')
+
+# The graph's shape never changes, so it is compiled once per process
+_compiled_workflow = None
+_compile_lock = threading.Lock()
 
 
 def create_workflow() -> StateGraph:
-    workflow = StateGraph(dict)
+    workflow = StateGraph(WorkflowState)
     
-    workflow.add_node("receive_message", receive_message_node)
-    workflow.add_node("classify_action", classify_action_node)
-    workflow.add_node("retrieve_context", retrieve_context_node)
-    workflow.add_node("gmail_draft", gmail_draft_node)
-    workflow.add_node("meeting_draft", meeting_draft_node)
-    workflow.add_node("no_op", no_op_node)
-    workflow.add_node("save_draft", save_draft_node)
+    # Nodes are timed into agent_node_seconds when AGENT_METRICS=1, and left bare otherwise
+    workflow.add_node("receive_message", instrument_node("receive_message", receive_message_node))
+    workflow.add_node("classify_action", instrument_node("classify_action", aclassify_action_node))
+    workflow.add_node("retrieve_context", instrument_node("retrieve_context", retrieve_context_node))
+    workflow.add_node("gmail_draft", instrument_node("gmail_draft", agmail_draft_node))
+    workflow.add_node("meeting_draft", instrument_node("meeting_draft", ameeting_draft_node))
+    workflow.add_node("no_op", instrument_node("no_op", no_op_node))
+    workflow.add_node("save_draft", instrument_node("save_draft", save_draft_node))
     
     workflow.set_entry_point("receive_message")
     
@@ -47,36 +66,218 @@ def create_workflow() -> StateGraph:
     
     return workflow.compile()
 
-def _empty_input_message_handler(state: Dict[str, Any]) -> str:
-    agent_state = AgentState.from_dict(state)
-    if agent_state.input_message is None:
+
+def get_compiled_workflow():
+    """Return the process-wide compiled workflow, compiling it on first use"""
+    global _compiled_workflow
+    if _compiled_workflow is None:
+        with _compile_lock:
+            if _compiled_workflow is None:
+                _compiled_workflow = create_workflow()
+    return _compiled_workflow
+
+
+def _empty_input_message_handler(state: WorkflowState) -> str:
+    if state.get("input_message") is None:
         return "no_op"
     else:
         return "classify_action"
 
-def _route_to_action_handler(state: Dict[str, Any]) -> str:
-    agent_state = AgentState.from_dict(state)
+def _route_to_action_handler(state: WorkflowState) -> str:
+    action_type = state.get("action_type")
     
-    if agent_state.action_type == ActionType.EMAIL_REPLY:
+    if action_type == ActionType.EMAIL_REPLY:
         return "gmail_draft"
-    elif agent_state.action_type == ActionType.SCHEDULE_MEETING:
+    elif action_type == ActionType.SCHEDULE_MEETING:
         return "meeting_draft"
     else:
         return "no_op"
 
 
-async def run_workflow(initial_state: Dict[str, Any] = None) -> Dict[str, Any]:
+async def run_workflow(initial_state: WorkflowState = None) -> WorkflowState:
     if initial_state is None:
         initial_state = {}
     
-    app = create_workflow()
+    app = get_compiled_workflow()
     
     print("Starting AI Agent Workflow...")
     print("-" * 50)
     
-    final_state = await app.ainvoke(initial_state)
+    sync_point = None
+    if initial_state.get("input_mode") == "gmail" and initial_state.get("gmail_message") is None:
+        # Single-message run: fetched here so the claim and the sync watermark can follow its outcome
+        messages, sync_point = await asyncio.to_thread(fetch_new_gmail_messages, 1)
+        if messages:
+            initial_state = {**initial_state, "gmail_message": messages[0]}
+    
+    metrics = get_metrics()
+    metrics.add_gauge("agent_workflow_runs_in_flight", 1)
+    try:
+        with metrics.run_trace(input_mode=initial_state.get("input_mode")) as trace:
+            try:
+                final_state = await app.ainvoke(initial_state)
+            except LLMUnavailableError:
+                # Nothing was drafted, so the message must not count as processed
+                await asyncio.to_thread(_release_claim, initial_state)
+                raise
+            except asyncio.CancelledError:
+                # e.g. a drain timeout; released right away, as awaiting would be cancelled too
+                _release_claim(initial_state)
+                raise
+            except Exception:
+                # Would fail the same way next time (e.g. the provider rejected the prompt)
+                await asyncio.to_thread(_record_failed, initial_state)
+                raise
+            _record_processed(final_state)
+            # A run that raised leaves the watermark alone, so its message is fetched again
+            await asyncio.to_thread(commit_gmail_sync, sync_point)
+            if trace is not None:
+                trace["action_type"] = getattr(final_state.get("action_type"), "value", None)
+                trace["draft_stats"] = final_state.get("draft_stats")
+    finally:
+        metrics.add_gauge("agent_workflow_runs_in_flight", -1)
     
     print("\nWorkflow completed successfully!")
-    print(f"Final state keys: {list(final_state.values())}")
+    print(f"Final state keys: {list(final_state.keys())}")
+    
+    return final_state
+
+
+def _record_processed(final_state: WorkflowState):
+    message = final_state.get("input_message")
+    if message is not None and is_ledgered(message):
+        action_type = final_state.get("action_type")
+        get_message_ledger().complete(message.message_id, getattr(action_type, "value", None))
+
+
+def _record_failed(initial_state: WorkflowState):
+    message = initial_state.get("gmail_message")
+    if message is not None and is_ledgered(message):
+        get_message_ledger().fail(message.message_id)
+
+
+def _release_claim(initial_state: WorkflowState):
+    message = initial_state.get("gmail_message")
+    if message is not None and is_ledgered(message):
+        get_message_ledger().release([message.message_id])
+
+
+async def run_workflow_batch(messages: List[Message], concurrency: int = 4,
+                             runner: Optional[WorkflowRunner] = None) -> List[Dict[str, Any]]:
+    """Run one workflow per pre-fetched Gmail message, at most `concurrency` at a time.
+    
+    Messages from the same thread run sequentially in the given order; different
+    threads run concurrently. Messages already in the processed-message ledger
+    are dropped before any LLM call and get {"duplicate": True}; the rest are
+    classified up front with batched LLM calls. Bodies still on the server
+    after a headers-first fetch are then downloaded only for messages
+    classified EMAIL_REPLY. Each run goes through runner (default
+    run_workflow), which lets the daemon's scheduler decide when it starts.
+    Messages the LLM provider could not serve get {"deferred": True} and are
+    not recorded as processed, so the caller can retry them later; runs that
+    fail otherwise get {"failed": True} and their messages are marked failed
+    in the ledger. Final states are returned in input order.
+    """
+    metrics = get_metrics()
+    # The batch gets its own trace record; each run inside it still writes its own
+    with metrics.run_trace(input_mode="gmail_batch", messages=len(messages)):
+        return await _run_batch(messages, concurrency, metrics, runner or run_workflow)
+
+
+async def _run_batch(messages: List[Message], concurrency: int, metrics,
+                     runner: WorkflowRunner) -> List[Dict[str, Any]]:
+    known = await _known_messages(messages, metrics)
+    new = [index for index in range(len(messages)) if index not in known]
+    results: List[Dict[str, Any]] = [{"duplicate": True} for _ in messages]
+    for index, result in zip(new, await _run_new([messages[index] for index in new], concurrency, metrics, runner)):
+        results[index] = result
+    return results
+
+
+async def _known_messages(messages: List[Message], metrics) -> Set[int]:
+    """Indexes of messages already in the ledger.
+    
+    receive_message_node is what claims a message; this check only keeps
+    known ones out of batch classification.
+    """
+    ledgered = [index for index, message in enumerate(messages) if is_ledgered(message)]
+    if not ledgered:
+        return set()
+    unseen = await asyncio.to_thread(get_message_ledger().unseen,
+                                     [messages[index].message_id for index in ledgered])
+    known = {index for index, is_new in zip(ledgered, unseen) if not is_new}
+    if known:
+        print(f"Skipping {len(known)} already processed message(s)")
+        metrics.inc("agent_duplicate_messages_total", len(known))
+    return known
+
+
+async def _run_new(messages: List[Message], concurrency: int, metrics,
+                   runner: WorkflowRunner) -> List[Dict[str, Any]]:
+    metrics.set_gauge("agent_queue_depth", len(messages), queue="gmail")
+    if not messages:
+        return []
+    try:
+        with metrics.timed("agent_batch_classify_seconds"):
+            classifications = await aclassify_scraped_batch(messages)
+    except LLMUnavailableError as e:
+        print(f"Batch classification failed: {e}, deferring {len(messages)} message(s)")
+        metrics.inc("agent_deferred_messages_total", len(messages))
+        return [{"deferred": True} for _ in messages]
+    
+    # Headers-first fetch: download the bodies of every reply-bound message in one go
+    replies = [index for index, (action_type, _) in enumerate(classifications)
+               if action_type == ActionType.EMAIL_REPLY and messages[index].body_part]
+    if replies:
+        fetched = await asyncio.to_thread(fetch_gmail_bodies, [messages[index] for index in replies])
+        messages = list(messages)
+        for index, message in zip(replies, fetched):
+            messages[index] = message
+    
+    semaphore = asyncio.Semaphore(max(1, concurrency))
+    results: List[Dict[str, Any]] = [None] * len(messages)
+    
+    threads: "OrderedDict[str, List[int]]" = OrderedDict()
+    for index, message in enumerate(messages):
+        threads.setdefault(_thread_key(message), []).append(index)
+    
+    async def run_thread(indexes: List[int]):
+        for index in indexes:
+            async with semaphore:
+                metrics.add_gauge("agent_queue_depth", -1, queue="gmail")
+                try:
+                    action_type, confidence = classifications[index]
+                    results[index] = await runner({
+                        "input_mode": "gmail",
+                        "gmail_message": messages[index],
+                        "action_type": action_type,
+                        "action_confidence": confidence
+                    })
+                except LLMUnavailableError as e:
+                    print(f"LLM unavailable for message {index}, deferring it: {e}")
+                    metrics.inc("agent_deferred_messages_total")
+                    results[index] = {"deferred": True}
+                except Exception as e:
+                    print(f"Workflow failed for message {index}: {e}")
+                    metrics.inc("agent_failed_messages_total")
+                    results[index] = {"failed": True}
+    
+    await asyncio.gather(*(run_thread(indexes) for indexes in threads.values()))
+    return results
+
+
+def _thread_key(message: Message) -> str:
+    """Conversation key: the thread root's Message-ID.
     
-    return final_state
\ No newline at end of file
+    The root is the first ID in References, else In-Reply-To; a message with
+    neither starts a thread and is its own root. Without any IDs, falls back
+    to the subject without reply/forward prefixes.
+    """
+    for header in ("References", "In-Reply-To"):
+        ids = _MSG_ID_RE.findall(message.headers.get(header) or '')
+        if ids:
+            return ids[0]
+    if message.message_id:
+        return message.message_id.strip()
+    subject = re.sub(r'^\s*((re|fwd?|aw)\s*:\s*)+', '', message.subject or '', flags=re.IGNORECASE)
+    return subject.strip().lower() or (message.sender or '').lower()